@@ -0,0 +1,91 @@
+import threading
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+# Worker threads shared by every session
+MAX_WORKERS = 2
+
+# Names include the dashboard filters, so only the most recently used results are kept
+DEFAULT_MAX_RESULTS = 64
+
+# The latest completed value of a result (None before the first), the data version it was
+# computed for, whether a value for a newer version is being computed, and the error of a
+# failed computation for the requested version
+Snapshot = namedtuple('Snapshot', ['value', 'version', 'refreshing', 'error'])
+
+
+class BackgroundResults:
+    """Expensive results computed on a thread pool and served stale-while-revalidate
+
+    get() never blocks. It returns the last completed value of a named
+    result and, when that value is not for the requested data version,
+    starts computing one. Requests for a version that is already being
+    computed, from any session, share that job instead of starting another.
+    A finished job only replaces the stored value when it was started after
+    the job that produced it, so a slow job for an old version cannot
+    overwrite a newer result. Results and errors are kept for at most
+    max_results names, evicting the least recently used.
+    """
+
+    def __init__(self, max_workers=MAX_WORKERS, max_results=DEFAULT_MAX_RESULTS):
+        self.max_results = max_results
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="background-results")
+        self._lock = threading.Lock()
+        # (name, version) -> running future
+        self._jobs = {}
+        # name -> (job sequence, version, value)
+        self._results = OrderedDict()
+        # name -> (version, exception) of the last failed job
+        self._errors = OrderedDict()
+        self._sequence = 0
+        self.submitted = 0
+        self.coalesced = 0
+
+    def get(self, name, version, compute):
+        """Snapshot of name, submitting compute() when no value or job exists for version"""
+        with self._lock:
+            sequence, computed_version, value = self._results.get(name, (0, None, None))
+            if sequence:
+                self._results.move_to_end(name)
+            if sequence and computed_version == version:
+                return Snapshot(value, version, False, None)
+            failed_version, error = self._errors.get(name, (None, None))
+            if error is not None and failed_version == version:
+                # A failed version is not retried until the data moves on
+                return Snapshot(value, computed_version, False, error)
+            key = (name, version)
+            if key in self._jobs:
+                self.coalesced += 1
+            else:
+                self._sequence += 1
+                self.submitted += 1
+                self._jobs[key] = self._executor.submit(self._run, name, version, self._sequence, compute)
+        return Snapshot(value, computed_version, True, None)
+
+    def _run(self, name, version, sequence, compute):
+        try:
+            value = compute()
+        except Exception as error:
+            with self._lock:
+                self._errors[name] = (version, error)
+                self._errors.move_to_end(name)
+                while len(self._errors) > self.max_results:
+                    self._errors.popitem(last=False)
+                del self._jobs[(name, version)]
+            return
+        with self._lock:
+            if self._results.get(name, (0,))[0] < sequence:
+                self._results[name] = (sequence, version, value)
+                self._results.move_to_end(name)
+                while len(self._results) > self.max_results:
+                    self._results.popitem(last=False)
+            self._errors.pop(name, None)
+            del self._jobs[(name, version)]
+
+    def running(self, name, version):
+        """Whether a job for name at version has not finished yet"""
+        with self._lock:
+            return (name, version) in self._jobs
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
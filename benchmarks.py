@@ -0,0 +1,283 @@
+import argparse
+import base64
+import json
+import os
+import platform
+import re
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from client_store import ClientStore
+from duplicates import find_duplicates
+from exports import available_formats, export_clients
+from funnel_core import (
+    DEFAULT_FUNNEL_STAGES, DEFAULT_STAGE_COLORS, ClientQuery, average_deal_chart, dashboard_deal_value_chart,
+    dashboard_funnel_chart, stage_distribution_chart,
+)
+from pipeline_cube import PipelineCube
+from search_index import ClientSearchIndex
+from stage_aggregates import StageAggregates
+from stage_index import StageIndex
+from synthetic_pipeline import DEFAULT_CUSTOM_STAGES, OWNERS, REGIONS, SEGMENTS, generate_clients, iter_clients
+
+SIZES = {'1k': 1_000, '100k': 100_000, '1m': 1_000_000, '10m': 10_000_000}
+
+STAGE_ORDER = DEFAULT_FUNNEL_STAGES + DEFAULT_CUSTOM_STAGES
+
+# The trigram index keeps every document in memory; above this size searches are timed through SQL only
+MAX_SEARCH_INDEX_ROWS = 1_000_000
+
+BATCH_SIZE = 1_000
+PAGE_SIZE = 25
+SEARCH_TERM = "summit"
+
+# A number as written into a label, thousands separators and decimals included
+NUMBER_TEXT = re.compile(r'\d(?:[\d,.]*\d)?')
+
+
+
+def _git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class BenchmarkRun:
+    """Timings for one pipeline size, one record per operation"""
+
+    def __init__(self, rows, repeat):
+        self.rows = rows
+        self.repeat = repeat
+        self.results = []
+
+    def measure(self, operation, func, repeat=None, **extra):
+        """Time func over repeat calls (the run's default when None) and return its last result"""
+        repeat = self.repeat if repeat is None else repeat
+        samples = []
+        result = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = func()
+            samples.append((time.perf_counter() - start) * 1000)
+        self.results.append({
+            'rows': self.rows,
+            'operation': operation,
+            'repeat': repeat,
+            'median_ms': round(statistics.median(samples), 3),
+            'min_ms': round(min(samples), 3),
+            **extra,
+        })
+        print(f"{self.rows:>12,}  {operation:<28} {statistics.median(samples):>12.2f} ms", flush=True)
+        return result
+
+
+def run_size(rows, workdir, seed=0, repeat=5, max_search_index_rows=MAX_SEARCH_INDEX_ROWS, figures_only=False):
+    """Load a synthetic pipeline of the given size and time every benchmarked operation
+
+    With figures_only, only the load, the aggregates and the figures are measured.
+    """
+    run = BenchmarkRun(rows, repeat)
+    rng = np.random.default_rng(seed)
+    store = ClientStore(os.path.join(workdir, f"clients_{rows}.db"))
+    try:
+        run.measure("load", lambda: sum(store.add_clients(chunk) for chunk in iter_clients(rows, seed=seed)),
+                    repeat=1)
+
+        # Derived structures, built once each as the dashboards build them
+        aggregates = run.measure("aggregate.build", lambda: StageAggregates(store), repeat=1)
+        if not figures_only:
+            run_operations(run, store, aggregates, rng, seed, max_search_index_rows)
+        run_figures(run, aggregates)
+    finally:
+        store.close()
+    return run.results
+
+
+def run_operations(run, store, aggregates, rng, seed, max_search_index_rows):
+    """Index builds, aggregation, filtering, search, mutations and exports"""
+    rows = run.rows
+    stage_index = run.measure("stage_index.build", lambda: StageIndex(store), repeat=1)
+    search_index = None
+    if rows <= max_search_index_rows:
+        search_index = run.measure("search_index.build", lambda: ClientSearchIndex(store), repeat=1)
+
+    # Aggregation
+    run.measure("aggregate.sql_group_by", store.stage_summary)
+    run.measure("aggregate.summary", lambda: aggregates.summary(STAGE_ORDER))
+
+    # Dimension slicing from the cube
+    cube = run.measure("cube.build", lambda: PipelineCube(store), repeat=1)
+    filters = {'owner': list(OWNERS[:2]), 'region': list(REGIONS[:3]), 'segment': list(SEGMENTS[:4])}
+    run.measure("cube.slice", lambda: cube.slice(filters).summary(STAGE_ORDER))
+
+    # Stage filtering, counting the matches and fetching the first page
+    stages = ["Negotiation", "Closed Won"]
+    run.measure("filter.stage_ids", lambda: stage_index.ids("Negotiation"))
+    run.measure("filter.sql_page", lambda: ClientQuery(store, stages).page(0, PAGE_SIZE, STAGE_ORDER))
+
+    # Search
+    run.measure("search.sql_page", lambda: ClientQuery(store, STAGE_ORDER, SEARCH_TERM).page(0, PAGE_SIZE),
+                repeat=1 if rows > max_search_index_rows else None)
+    if search_index is not None:
+        run.measure("search.index_page", lambda: ClientQuery(
+            store, STAGE_ORDER, SEARCH_TERM, stage_index=stage_index, search_index=search_index
+        ).page(0, PAGE_SIZE))
+
+    # Mutations, with every index subscribed as in the apps; small pipelines get smaller
+    # batches so deletes never run out of distinct clients
+    batch_size = max(1, min(BATCH_SIZE, rows // (4 * run.repeat)))
+    new_clients = generate_clients(batch_size, seed=seed, start_id=rows)
+    run.measure("add.single", lambda: store.add_client("Benchmark Co", "Research", "Bench Mark",
+                                                         "bench@example.com", 10_000))
+    run.measure("add.batch", lambda: store.add_clients(new_clients), batch_size=batch_size)
+
+    # Distinct ids so every update moves a client and every delete finds one
+    targets = iter(rng.permutation(np.arange(1, rows + 1))[:run.repeat * (2 + 2 * batch_size)].tolist())
+    run.measure("update.single", lambda: store.update_stage(next(targets), "Interested"))
+    run.measure("update.batch", lambda: store.update_stages(
+        [next(targets) for _ in range(batch_size)], "Order Stage"
+    ), batch_size=batch_size)
+    run.measure("delete.single", lambda: store.delete_client(next(targets)))
+    run.measure("delete.batch", lambda: store.apply_changes(
+        deletes=[next(targets) for _ in range(batch_size)]
+    ), batch_size=batch_size)
+
+    # Duplicate scan over every client; candidate pairs should grow linearly with the rows
+    scan = run.measure("duplicates.scan", lambda: find_duplicates(store), repeat=1)
+    run.results[-1].update(candidates=scan.candidates, groups=len(scan.groups))
+
+    # Export of the whole table
+    for export_format in available_formats():
+        def export():
+            with export_clients(store, export_format) as exported:
+                return exported.seek(0, os.SEEK_END)
+        size = run.measure(f"export.{export_format.lower().replace(' ', '_')}", export, repeat=1)
+        run.results[-1]['bytes'] = size
+
+
+def run_figures(run, aggregates):
+    """Build every figure the dashboards render, with their builders, and serialize it as it is sent to the browser"""
+    counts = aggregates.counts()
+    values = aggregates.values()
+    stats_df = aggregates.summary(STAGE_ORDER).reset_index()
+    colors = DEFAULT_STAGE_COLORS
+    figures = {
+        "funnel": lambda: dashboard_funnel_chart(counts, STAGE_ORDER, colors),
+        "funnel_clickable": lambda: dashboard_funnel_chart(counts, STAGE_ORDER, colors, clickable=True),
+        "deal_value": lambda: dashboard_deal_value_chart(values, colors),
+        "deal_value_clickable": lambda: dashboard_deal_value_chart(values, colors, clickable=True),
+        "average_deal": lambda: average_deal_chart(stats_df, colors),
+        "stage_distribution": lambda: stage_distribution_chart(stats_df, colors),
+    }
+    for name, build in figures.items():
+        payload = run.measure(f"figure.{name}", lambda: build().to_json())
+        run.results[-1]['bytes'] = len(payload)
+        run.results[-1]['shape_bytes'] = len(json.dumps(_zero_numbers(json.loads(payload))))
+
+
+def _zero_numbers(value):
+    """JSON value with every number, including those written into labels, replaced by 0"""
+    if isinstance(value, dict):
+        if 'bdata' in value:
+            # Plotly packs arrays whose values fit a typed array and writes the rest as lists
+            return [0] * np.frombuffer(base64.b64decode(value['bdata']), dtype=value['dtype']).size
+        return {key: _zero_numbers(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_zero_numbers(item) for item in value]
+    if isinstance(value, str):
+        return NUMBER_TEXT.sub('0', value)
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return 0
+    return value
+
+
+def payload_growth(results):
+    """(operation, smallest, largest shape bytes) for every figure whose payload changed with the pipeline
+
+    Figures are built from per-stage aggregates, so apart from how their
+    numbers are written a figure's JSON must be the same size at every
+    pipeline size.
+    """
+    sizes = {}
+    for result in results:
+        if result['operation'].startswith("figure."):
+            sizes.setdefault(result['operation'], []).append(result['shape_bytes'])
+    return [
+        (operation, min(payloads), max(payloads))
+        for operation, payloads in sizes.items() if min(payloads) != max(payloads)
+    ]
+
+
+def parse_size(value):
+    key = value.lower()
+    if key in SIZES:
+        return SIZES[key]
+    try:
+        return int(key.replace('_', ''))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"unknown size {value!r}; use {', '.join(SIZES)} or a row count")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time dashboard operations on synthetic pipelines")
+    parser.add_argument("--sizes", nargs="+", type=parse_size, default=list(SIZES.values()),
+                        help="pipeline sizes such as 1k 100k 1m 10m")
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--workdir", default=None, help="directory for the temporary databases")
+    parser.add_argument("--max-search-index-rows", type=int, default=MAX_SEARCH_INDEX_ROWS)
+    parser.add_argument("--figures-only", action="store_true", help="only load the pipelines and time the figures")
+    parser.add_argument("--check-payloads", action="store_true",
+                        help="exit with an error if a figure's JSON changes size with the pipeline")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="funnel_bench_", dir=args.workdir)
+    started = datetime.now(timezone.utc)
+    results = []
+    try:
+        for rows in args.sizes:
+            results += run_size(rows, workdir, seed=args.seed, repeat=args.repeat,
+                                max_search_index_rows=args.max_search_index_rows, figures_only=args.figures_only)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        'meta': {
+            'started': started.isoformat(timespec='seconds'),
+            'revision': _git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'pandas': pd.__version__,
+            'numpy': np.__version__,
+            'sqlite': sqlite3.sqlite_version,
+            'seed': args.seed,
+            'repeat': args.repeat,
+            'argv': sys.argv[1:],
+        },
+        'results': results,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {len(results)} results to {args.output}")
+
+    if args.check_payloads:
+        grown = payload_growth(results)
+        for operation, smallest, largest in grown:
+            print(f"{operation}: payload changed from {smallest:,} to {largest:,} bytes", file=sys.stderr)
+        if grown:
+            sys.exit(1)
+        print(f"Figure payloads kept their size across {len(args.sizes)} sizes")
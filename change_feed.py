@@ -0,0 +1,73 @@
+import threading
+from collections import deque, namedtuple
+from contextlib import contextmanager
+
+# Compact record of one client mutation, numbered in publish order
+Delta = namedtuple('Delta', ['seq', 'op', 'client_id', 'stage', 'old_stage', 'deal_value'])
+
+# Deltas kept for readers that fall behind; older cursors must reload
+MAX_DELTAS = 10_000
+
+
+class ChangeFeed:
+    """In-process feed of client deltas
+
+    Every committed store mutation is published as numbered deltas into a
+    bounded ring. Readers that poll (such as browser sessions between reruns)
+    keep a cursor and pull only the deltas after it. A writer can record the
+    sequence numbers of its own deltas to tell them apart from other writers'.
+    """
+
+    def __init__(self, max_deltas=MAX_DELTAS):
+        self._lock = threading.Lock()
+        self._deltas = deque(maxlen=max_deltas)
+        self._seq = 0
+        self._local = threading.local()
+
+    def attach(self, store):
+        """Publish every change made through store"""
+        store.subscribe(self.publish)
+
+    def publish(self, changes):
+        """Store listener that numbers a batch of changes and adds them to the ring"""
+        with self._lock:
+            start = self._seq
+            deltas = [
+                Delta(start + offset + 1, change.op, change.client_id, change.stage,
+                      change.old_stage, change.deal_value)
+                for offset, change in enumerate(changes)
+            ]
+            self._deltas.extend(deltas)
+            self._seq += len(deltas)
+        recorded = getattr(self._local, 'recorded', None)
+        if recorded is not None:
+            recorded.extend(delta.seq for delta in deltas)
+
+    @contextmanager
+    def recording(self):
+        """Collect the sequence numbers of the deltas published by the calling thread in the block
+
+        Store listeners run in the thread that made the change, so these are
+        exactly the deltas of the writes made inside the block.
+        """
+        recorded = []
+        self._local.recorded = recorded
+        try:
+            yield recorded
+        finally:
+            self._local.recorded = None
+
+    @property
+    def cursor(self):
+        """Sequence number of the latest published delta"""
+        return self._seq
+
+    def since(self, cursor):
+        """Deltas published after cursor, or None when they are no longer held"""
+        with self._lock:
+            if cursor >= self._seq:
+                return []
+            if not self._deltas or self._deltas[0].seq > cursor + 1:
+                return None
+            skip = cursor + 1 - self._deltas[0].seq
+            return [self._deltas[i] for i in range(skip, len(self._deltas))]
@@ -0,0 +1,112 @@
+import os
+from collections import namedtuple
+from datetime import date
+
+import pandas as pd
+
+# Rows read, validated and inserted per batch
+IMPORT_CHUNK_SIZE = 50_000
+
+REQUIRED_COLUMNS = ['Client Name', 'Stage', 'Contact Person', 'Deal Value']
+OPTIONAL_COLUMNS = ['Email', 'Last Updated', 'Owner', 'Region', 'Segment', 'Quarter']
+
+EMAIL_PATTERN = r"[^@\s]+@[^@\s]+\.[^@\s]+"
+QUARTER_PATTERN = r"\d{4}-Q[1-4]"
+
+ImportResult = namedtuple('ImportResult', ['imported', 'rejected', 'errors'])
+
+
+def _file_format(source, file_format):
+    if file_format:
+        return file_format.lower()
+    name = source if isinstance(source, str) else getattr(source, 'name', '')
+    extension = os.path.splitext(name)[1].lower().lstrip('.')
+    return {'xls': 'excel', 'xlsx': 'excel', 'pq': 'parquet'}.get(extension, extension)
+
+
+def read_chunks(source, file_format=None, chunk_size=IMPORT_CHUNK_SIZE):
+    """Yield the rows of a CSV, Parquet or Excel file as string frames of at most chunk_size rows"""
+    file_format = _file_format(source, file_format)
+    if file_format == 'csv':
+        yield from pd.read_csv(source, chunksize=chunk_size, dtype=str, keep_default_na=False)
+    elif file_format == 'parquet':
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(source).iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas().astype(str).replace({'None': '', 'nan': '', 'NaT': ''})
+    elif file_format == 'excel':
+        # Excel workbooks cannot be read incrementally, so only the validation is chunked
+        sheet = pd.read_excel(source, dtype=str, keep_default_na=False)
+        for start in range(0, len(sheet), chunk_size):
+            yield sheet.iloc[start:start + chunk_size]
+    else:
+        raise ValueError(f"Unsupported import format: {file_format!r}")
+
+
+def validate_clients(chunk, stages):
+    """Split a raw chunk into clean rows and a frame of rejected rows with their reasons"""
+    chunk = chunk.rename(columns=lambda column: str(column).strip())
+    missing = [column for column in REQUIRED_COLUMNS if column not in chunk]
+    if missing:
+        raise ValueError(f"Missing required columns: {', '.join(missing)}")
+    chunk = chunk.reindex(columns=REQUIRED_COLUMNS + OPTIONAL_COLUMNS, fill_value='')
+    text = chunk.fillna('').astype(str).apply(lambda column: column.str.strip())
+
+    # Match stages case-insensitively onto their canonical names
+    canonical = {stage.casefold(): stage for stage in stages}
+    stage = text['Stage'].str.casefold().map(canonical)
+    deal_value = pd.to_numeric(text['Deal Value'].str.replace(r"[$,]", "", regex=True), errors='coerce')
+    last_updated = pd.to_datetime(text['Last Updated'].where(text['Last Updated'] != ''),
+                                  errors='coerce', format='mixed')
+
+    checks = {
+        'Missing client name': text['Client Name'] == '',
+        'Missing contact person': text['Contact Person'] == '',
+        'Unknown stage': stage.isna(),
+        'Invalid email': (text['Email'] != '') & ~text['Email'].str.fullmatch(EMAIL_PATTERN),
+        'Invalid deal value': deal_value.isna() | (deal_value < 0),
+        'Invalid last updated date': (text['Last Updated'] != '') & last_updated.isna(),
+        'Invalid quarter': (text['Quarter'] != '') & ~text['Quarter'].str.upper().str.fullmatch(QUARTER_PATTERN),
+    }
+    failed = pd.DataFrame(checks)
+    bad = failed.any(axis=1)
+
+    clean = pd.DataFrame({
+        'Client Name': text['Client Name'],
+        'Stage': stage,
+        'Contact Person': text['Contact Person'],
+        'Email': text['Email'],
+        'Deal Value': deal_value.fillna(0).round().astype('int64'),
+        'Last Updated': last_updated.fillna(pd.Timestamp(date.today())),
+        'Owner': text['Owner'],
+        'Region': text['Region'],
+        'Segment': text['Segment'],
+        'Quarter': text['Quarter'].str.upper(),
+    })[~bad]
+
+    errors = chunk[bad].copy()
+    reasons = failed[bad]
+    errors.insert(0, 'Error', reasons.apply(lambda row: '; '.join(reasons.columns[row]), axis=1)
+                  if len(reasons) else pd.Series(dtype=str))
+    return clean, errors
+
+
+def import_clients(store, source, stages, file_format=None, chunk_size=IMPORT_CHUNK_SIZE):
+    """Validate and append clients from a file in batches, collecting bad rows instead of aborting"""
+    imported = 0
+    errors = []
+    row_offset = 0
+    for chunk in read_chunks(source, file_format, chunk_size):
+        chunk = chunk.reset_index(drop=True)
+        clean, rejected = validate_clients(chunk, stages)
+        if len(clean):
+            imported += store.add_clients(clean)
+        if len(rejected):
+            # Report 1-based data row numbers from the source file
+            rejected.insert(0, 'Row', rejected.index + row_offset + 1)
+            errors.append(rejected)
+        row_offset += len(chunk)
+    errors = pd.concat(errors, ignore_index=True) if errors else pd.DataFrame(
+        columns=['Row', 'Error', *REQUIRED_COLUMNS, *OPTIONAL_COLUMNS]
+    )
+    return ImportResult(imported, len(errors), errors)
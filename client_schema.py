@@ -0,0 +1,82 @@
+import argparse
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401
+    # Arrow-backed strings store one contiguous buffer instead of a Python object per cell
+    COMPACT_STRING = pd.StringDtype('pyarrow')
+except ImportError:
+    COMPACT_STRING = object
+
+STRING_COLUMNS = ['Client Name', 'Contact Person', 'Email']
+# Optional slicing dimensions; few distinct values each, so they are stored as categories
+DIMENSION_COLUMNS = ['Owner', 'Region', 'Segment', 'Quarter']
+
+
+def stage_dtype(stage_order, observed=()):
+    """Ordered categorical for Stage, with unknown observed stages appended after stage_order"""
+    categories = list(dict.fromkeys(stage_order))
+    known = set(categories)
+    categories += sorted(stage for stage in set(observed) if stage not in known)
+    return pd.CategoricalDtype(categories=categories, ordered=True)
+
+
+def normalize_clients(df, stage_order=()):
+    """Convert a client frame to the compact column layout"""
+    df = df.copy()
+    observed = df['Stage'].dropna().unique() if len(df) else ()
+    df['Stage'] = df['Stage'].astype(object).astype(stage_dtype(stage_order, observed))
+    df['Last Updated'] = pd.to_datetime(df['Last Updated'])
+    df['Deal Value'] = df['Deal Value'].fillna(0).astype('int64')
+    for column in STRING_COLUMNS:
+        df[column] = df[column].fillna('').astype(COMPACT_STRING)
+    for column in DIMENSION_COLUMNS:
+        if column in df:
+            df[column] = df[column].fillna('').astype('category')
+    return df
+
+
+def memory_report(df, stage_order=()):
+    """Bytes per row for each column before and after normalization"""
+    raw = df.copy()
+    for column in [*STRING_COLUMNS, 'Stage']:
+        raw[column] = raw[column].astype(object)
+    raw['Last Updated'] = pd.Series(pd.to_datetime(raw['Last Updated']).dt.date, index=raw.index, dtype=object)
+    compact = normalize_clients(df, stage_order)
+    rows = max(len(df), 1)
+    report = pd.DataFrame({
+        'Raw Bytes/Row': raw.memory_usage(deep=True, index=False) / rows,
+        'Compact Bytes/Row': compact.memory_usage(deep=True, index=False) / rows,
+    })
+    report.loc['Total'] = report.sum()
+    report['Saving'] = 1 - report['Compact Bytes/Row'] / report['Raw Bytes/Row']
+    return report.round(3)
+
+
+def _sample_frame(n_rows, stage_order, seed=0):
+    """Plain object-dtype client frame used by the command-line report"""
+    rng = np.random.default_rng(seed)
+    ids = np.arange(n_rows).astype(str).astype(object)
+    return pd.DataFrame({
+        'Client Name': 'Client ' + ids,
+        'Stage': np.asarray(stage_order, dtype=object)[rng.integers(0, len(stage_order), n_rows)],
+        'Contact Person': 'Contact ' + ids,
+        'Email': 'contact' + ids + '@example.com',
+        'Deal Value': rng.integers(5_000, 500_000, n_rows),
+        'Last Updated': pd.Timestamp('2024-01-01') + pd.to_timedelta(rng.integers(0, 365, n_rows), unit='D'),
+    })
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Report per-row memory of the client table")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    stages = [
+        "Research", "Initial Contact", "First Presentation", "Interested",
+        "Multiple Presentations", "Order Stage", "Negotiation", "Closed Won", "Closed Lost",
+    ]
+    print(f"Memory report for {args.rows:,} rows")
+    print(memory_report(_sample_frame(args.rows, stages), stages).to_string())
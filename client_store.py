@@ -0,0 +1,648 @@
+import sqlite3
+import threading
+from collections import namedtuple
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from client_schema import normalize_clients
+from stage_registry import StageRegistry
+
+# Dashboard column names keyed by their SQLite column; stages are stored as registry codes
+COLUMNS = {
+    'client_name': 'Client Name',
+    'stage_code': 'Stage',
+    'contact_person': 'Contact Person',
+    'email': 'Email',
+    'deal_value': 'Deal Value',
+    'last_updated': 'Last Updated',
+    'owner': 'Owner',
+    'region': 'Region',
+    'segment': 'Segment',
+    'quarter': 'Quarter',
+}
+
+# Optional columns the pipeline can be sliced by; quarter defaults to the quarter of Last Updated
+DIMENSIONS = ['owner', 'region', 'segment', 'quarter']
+
+CLIENTS_TABLE = """
+CREATE TABLE IF NOT EXISTS clients (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    client_name TEXT NOT NULL,
+    stage_code INTEGER NOT NULL REFERENCES stages (code),
+    contact_person TEXT NOT NULL DEFAULT '',
+    email TEXT NOT NULL DEFAULT '',
+    deal_value INTEGER NOT NULL DEFAULT 0,
+    last_updated TEXT NOT NULL,
+    version INTEGER NOT NULL DEFAULT 1,
+    owner TEXT NOT NULL DEFAULT '',
+    region TEXT NOT NULL DEFAULT '',
+    segment TEXT NOT NULL DEFAULT '',
+    quarter TEXT NOT NULL DEFAULT '',
+    crm_id TEXT
+)
+"""
+
+# Last cursor reached by each external source the store is synced from
+SYNC_STATE_TABLE = """
+CREATE TABLE IF NOT EXISTS sync_state (
+    source TEXT PRIMARY KEY,
+    cursor TEXT NOT NULL,
+    synced_at TEXT NOT NULL
+)
+"""
+
+# Staging table for one batch of CRM rows, merged into clients with set-based statements
+CRM_BATCH_TABLE = """
+CREATE TEMP TABLE IF NOT EXISTS crm_batch (
+    crm_id TEXT PRIMARY KEY,
+    client_name TEXT NOT NULL,
+    stage_code INTEGER NOT NULL,
+    contact_person TEXT NOT NULL,
+    email TEXT NOT NULL,
+    deal_value INTEGER NOT NULL,
+    last_updated TEXT NOT NULL,
+    owner TEXT NOT NULL,
+    region TEXT NOT NULL,
+    segment TEXT NOT NULL,
+    quarter TEXT NOT NULL
+)
+"""
+
+# Year and quarter of an ISO date column, e.g. 2025-Q3
+QUARTER_SQL = "substr(last_updated, 1, 4) || '-Q' || ((CAST(substr(last_updated, 6, 2) AS INTEGER) + 2) / 3)"
+
+INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_clients_stage_code ON clients (stage_code);
+CREATE INDEX IF NOT EXISTS idx_clients_name ON clients (client_name COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS idx_clients_updated ON clients (last_updated);
+CREATE INDEX IF NOT EXISTS idx_clients_cube ON clients (stage_code, owner, region, segment, quarter, deal_value);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_clients_crm_id ON clients (crm_id) WHERE crm_id IS NOT NULL;
+"""
+
+# Columns written when a client is inserted, in insert tuple order
+CLIENT_FIELDS = ['client_name', 'stage_code', 'contact_person', 'email', 'deal_value', 'last_updated', *DIMENSIONS]
+
+# Fields a client search matches, through the search index or SQL
+SEARCH_COLUMNS = ['client_name', 'contact_person', 'email']
+
+# Fields a merged client takes from its duplicates when its own are blank
+MERGE_FIELDS = ['contact_person', 'email', 'owner', 'region', 'segment']
+
+# SQLite caps the number of bound parameters per statement
+MAX_PARAMS = 900
+
+# A single row mutation passed to store listeners; op is 'add', 'update', 'edit' or 'delete'.
+# dims holds the row's DIMENSIONS values after the change. A stage move ('update') sets Last
+# Updated to today and so moves the quarter with it, as every write deriving the quarter does;
+# old_dims then holds the values before the move. An 'edit' rewrites other fields as well (stage
+# may stay the same); old_deal_value and old_dims then hold the values before it. They are None
+# for every other op.
+Change = namedtuple('Change', ['op', 'client_id', 'stage', 'old_stage', 'deal_value', 'dims',
+                               'old_deal_value', 'old_dims'], defaults=[None, None, None, None])
+
+
+def quarter_label(dates):
+    """Year and quarter of each date, e.g. 2025-Q3"""
+    dates = pd.to_datetime(pd.Series(dates))
+    return dates.dt.year.astype(str) + '-Q' + dates.dt.quarter.astype(str)
+
+
+class ConflictError(Exception):
+    """Raised when an edit was based on a row version that has since changed"""
+
+    def __init__(self, client_ids):
+        self.client_ids = sorted(client_ids)
+        super().__init__(f"{len(self.client_ids)} clients were changed since they were read")
+
+
+def _escape_like(term):
+    """Escape LIKE wildcards so the search term matches literally"""
+    return term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+class ClientStore:
+    """SQLite-backed client table shared by the dashboard pages
+
+    Rows store the stage as a code from the stage registry (self.stages);
+    every method takes and returns stage names.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        # Bumped on every mutation so derived results can be memoized
+        self.version = 0
+        self._lock = threading.RLock()
+        self._listeners = []
+        # Streamlit serves sessions from several threads, access is serialized by the lock
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        if path != ':memory:':
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        self.stages = StageRegistry(self._conn, self._lock)
+        self._conn.execute(CLIENTS_TABLE)
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(clients)")}
+        if 'version' not in columns:
+            # Databases created before rows carried a version
+            self._conn.execute("ALTER TABLE clients ADD COLUMN version INTEGER NOT NULL DEFAULT 1")
+        if 'quarter' not in columns:
+            # Databases created before the slicing dimensions
+            with self._conn:
+                for dimension in DIMENSIONS:
+                    if dimension not in columns:
+                        self._conn.execute(f"ALTER TABLE clients ADD COLUMN {dimension} TEXT NOT NULL DEFAULT ''")
+                self._conn.execute(f"UPDATE clients SET quarter = {QUARTER_SQL}")
+        if 'crm_id' not in columns:
+            # Databases created before the CRM sync
+            self._conn.execute("ALTER TABLE clients ADD COLUMN crm_id TEXT")
+        if 'stage' in columns:
+            self._migrate_stage_names()
+        self._conn.executescript(INDEXES)
+        self._conn.execute(SYNC_STATE_TABLE)
+
+    def _migrate_stage_names(self):
+        """Rebuild a clients table that stored stage names as one that stores stage codes"""
+        for (stage,) in self._conn.execute("SELECT DISTINCT stage FROM clients").fetchall():
+            self.stages.ensure(stage)
+        self._conn.execute("BEGIN")
+        try:
+            self._conn.execute("DROP INDEX IF EXISTS idx_clients_stage")
+            self._conn.execute("ALTER TABLE clients RENAME TO clients_by_stage_name")
+            self._conn.execute(CLIENTS_TABLE)
+            self._conn.execute(
+                "INSERT INTO clients (id, client_name, stage_code, contact_person, email, deal_value, "
+                "last_updated, version, owner, region, segment, quarter, crm_id) "
+                "SELECT c.id, c.client_name, s.code, c.contact_person, c.email, c.deal_value, c.last_updated, "
+                "c.version, c.owner, c.region, c.segment, c.quarter, c.crm_id "
+                "FROM clients_by_stage_name c JOIN stages s ON s.name = c.stage"
+            )
+            # Keep AUTOINCREMENT from handing out the ids of clients deleted before the migration
+            self._conn.execute(
+                "UPDATE sqlite_sequence SET seq = MAX(seq, COALESCE("
+                "(SELECT seq FROM sqlite_sequence WHERE name = 'clients_by_stage_name'), 0)) "
+                "WHERE name = 'clients'"
+            )
+            self._conn.execute("DROP TABLE clients_by_stage_name")
+            self._conn.commit()
+        except BaseException:
+            self._conn.rollback()
+            raise
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def subscribe(self, listener, load=None):
+        """Call listener(changes) with a list of Change tuples after every committed mutation
+
+        load, if given, runs under the store lock just before the listener is
+        registered so an index can build its initial state without missing a change.
+        """
+        with self._lock:
+            if load is not None:
+                load()
+            self._listeners.append(listener)
+
+    def _notify(self, changes):
+        for listener in self._listeners:
+            listener(changes)
+
+    def _where(self, stages=None, search=None):
+        """Build the WHERE clause shared by the list and count queries"""
+        clauses = []
+        params = []
+        if stages is not None:
+            stages = list(stages)
+            if not stages:
+                return " WHERE 0", []
+            codes = self.stages.codes(stages)
+            if not codes:
+                return " WHERE 0", []
+            clauses.append(f"stage_code IN ({', '.join('?' * len(codes))})")
+            params.extend(codes)
+        search = (search or '').strip()
+        if search:
+            # The same fields the search index covers, so both paths find the same clients
+            pattern = f"%{_escape_like(search)}%"
+            clauses.append("(" + " OR ".join(f"{column} LIKE ? ESCAPE '\\'" for column in SEARCH_COLUMNS) + ")")
+            params.extend([pattern] * len(SEARCH_COLUMNS))
+        if not clauses:
+            return "", []
+        return " WHERE " + " AND ".join(clauses), params
+
+    # Mutations
+
+    def add_client(self, client_name, stage, contact_person, email, deal_value, last_updated=None,
+                   owner='', region='', segment='', quarter=None):
+        """Insert a client and return its id"""
+        last_updated = last_updated or date.today()
+        dims = (owner or '', region or '', segment or '', quarter or quarter_label([last_updated])[0])
+        with self._lock:
+            code = self.stages.ensure(stage)
+            with self._conn:
+                cursor = self._conn.execute(
+                    "INSERT INTO clients (client_name, stage_code, contact_person, email, deal_value, last_updated, "
+                    "owner, region, segment, quarter) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (client_name, code, contact_person, email, int(deal_value), str(last_updated), *dims)
+                )
+                self.version += 1
+            self._notify([Change('add', cursor.lastrowid, stage, None, int(deal_value), dims)])
+        return cursor.lastrowid
+
+    def _rows(self, df, key=None, new_stages=True):
+        """Insert tuples in CLIENT_FIELDS order for a frame with dashboard column names
+
+        With key, each tuple starts with that column's value. Stages are
+        registered as needed, so this is called under the lock; with
+        new_stages=False an unknown stage raises ValueError instead.
+        """
+        records = df.reindex(columns=list(COLUMNS.values())).copy()
+        last_updated = pd.to_datetime(records['Last Updated']).fillna(pd.Timestamp(date.today()))
+        records['Last Updated'] = last_updated.dt.strftime('%Y-%m-%d')
+        # Object arrays: iterating Arrow-backed strings row by row is several times slower
+        for column in ('Client Name', 'Stage', 'Contact Person', 'Email'):
+            records[column] = records[column].to_numpy(dtype=object)
+        for dimension in DIMENSIONS:
+            column = COLUMNS[dimension]
+            records[column] = records[column].fillna('').astype(str).to_numpy(dtype=object)
+        quarters = quarter_label(last_updated).to_numpy(dtype=object)
+        records['Quarter'] = np.where(records['Quarter'] != '', records['Quarter'], quarters)
+        # Codes are resolved once per distinct stage, not once per row
+        stages = pd.unique(records['Stage'].astype(object))
+        if not new_stages:
+            unknown = sorted(set(stages) - set(self.stages.names()), key=str)
+            if unknown:
+                raise ValueError(f"Unknown stages: {', '.join(map(str, unknown))}")
+        codes = {stage: self.stages.ensure(stage) for stage in stages}
+        rows = [
+            (name, codes[stage], contact, email, int(value), updated, *dims)
+            for name, stage, contact, email, value, updated, *dims in records.itertuples(index=False)
+        ]
+        if key is not None:
+            rows = [(value, *row) for value, row in zip(df[key].astype(str).to_numpy(dtype=object).tolist(), rows)]
+        return rows
+
+    def add_clients(self, df):
+        """Insert a frame of clients (dashboard column names) in one transaction"""
+        with self._lock:
+            rows = self._rows(df)
+            with self._conn:
+                last_id = self._conn.execute("SELECT COALESCE(MAX(id), 0) FROM clients").fetchone()[0]
+                self._conn.executemany(
+                    f"INSERT INTO clients ({', '.join(CLIENT_FIELDS)}) VALUES ({', '.join('?' * len(CLIENT_FIELDS))})",
+                    rows
+                )
+                added = self._added_since(last_id)
+                self.version += 1
+            self._notify(added)
+        return len(rows)
+
+    def _added_since(self, last_id):
+        """'add' changes for the rows inserted after last_id"""
+        name = self.stages.name
+        return [
+            Change('add', client_id, name(code), None, value, tuple(dims))
+            for client_id, code, value, *dims in self._conn.execute(
+                f"SELECT id, stage_code, deal_value, {', '.join(DIMENSIONS)} FROM clients WHERE id > ?", (last_id,)
+            )
+        ]
+
+    def upsert_clients(self, df, deleted=(), source=None, cursor=None):
+        """Merge a batch of CRM clients keyed by their 'CRM ID' column in one transaction
+
+        Rows with a new CRM id are inserted, rows whose fields differ from the
+        stored client are rewritten, and clients whose CRM id is in deleted
+        are removed. When source is given its sync cursor is saved in the
+        same transaction, so a batch and the cursor past it land together.
+        A remote system cannot add funnel stages: ValueError is raised,
+        before anything is written, if a row's stage is not registered.
+        Returns (added, updated, deleted) counts.
+        """
+        fields = ', '.join(CLIENT_FIELDS)
+        with self._lock:
+            rows = self._rows(df, key='CRM ID', new_stages=False) if len(df) else []
+            with self._conn:
+                self._conn.execute(CRM_BATCH_TABLE)
+                self._conn.execute("DELETE FROM crm_batch")
+                self._conn.executemany(
+                    f"INSERT OR REPLACE INTO crm_batch (crm_id, {fields}) "
+                    f"VALUES ({', '.join('?' * (len(CLIENT_FIELDS) + 1))})",
+                    rows
+                )
+                differs = " OR ".join(f"c.{field} IS NOT b.{field}" for field in CLIENT_FIELDS)
+                edited = self._conn.execute(
+                    f"SELECT c.id, c.stage_code, c.deal_value, {', '.join('c.' + d for d in DIMENSIONS)}, "
+                    f"b.stage_code, b.deal_value, {', '.join('b.' + d for d in DIMENSIONS)} "
+                    f"FROM crm_batch b JOIN clients c ON c.crm_id = b.crm_id WHERE {differs}"
+                ).fetchall()
+                self._conn.execute(
+                    f"UPDATE clients AS c SET ({fields}) = ({', '.join('b.' + f for f in CLIENT_FIELDS)}), "
+                    f"version = c.version + 1 FROM crm_batch b WHERE c.crm_id = b.crm_id AND ({differs})"
+                )
+                last_id = self._conn.execute("SELECT COALESCE(MAX(id), 0) FROM clients").fetchone()[0]
+                self._conn.execute(
+                    f"INSERT INTO clients (crm_id, {fields}) SELECT crm_id, {fields} FROM crm_batch b "
+                    "WHERE NOT EXISTS (SELECT 1 FROM clients c WHERE c.crm_id = b.crm_id)"
+                )
+                name = self.stages.name
+                n = len(DIMENSIONS)
+                changes = []
+                for client_id, old_code, old_value, *rest in edited:
+                    old_dims, (code, value), dims = rest[:n], rest[n:n + 2], rest[n + 2:]
+                    changes.append(Change('edit', client_id, name(code), name(old_code), value, tuple(dims),
+                                          old_value, tuple(old_dims)))
+                changes += self._added_since(last_id)
+                deleted = [str(crm_id) for crm_id in deleted]
+                for start in range(0, len(deleted), MAX_PARAMS):
+                    chunk = deleted[start:start + MAX_PARAMS]
+                    removed = self._conn.execute(
+                        f"DELETE FROM clients WHERE crm_id IN ({', '.join('?' * len(chunk))}) "
+                        f"RETURNING id, stage_code, deal_value, {', '.join(DIMENSIONS)}",
+                        chunk
+                    ).fetchall()
+                    changes += [
+                        Change('delete', client_id, None, name(code), value, tuple(dims))
+                        for client_id, code, value, *dims in removed
+                    ]
+                if source is not None:
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO sync_state (source, cursor, synced_at) VALUES (?, ?, ?)",
+                        (source, str(cursor), pd.Timestamp.now(tz='UTC').isoformat())
+                    )
+                if changes:
+                    self.version += 1
+            if changes:
+                self._notify(changes)
+        counts = {op: 0 for op in ('add', 'edit', 'delete')}
+        for change in changes:
+            counts[change.op] += 1
+        return counts['add'], counts['edit'], counts['delete']
+
+    def sync_cursor(self, source):
+        """Cursor saved by the last upsert_clients batch from source, or None before the first"""
+        rows = self._query("SELECT cursor FROM sync_state WHERE source = ?", (source,))
+        return rows[0][0] if rows else None
+
+    def update_stage(self, client_id, stage):
+        """Move a client to a new stage"""
+        self.update_stages([client_id], stage)
+
+    def update_stages(self, client_ids, stage):
+        """Move many clients to one stage in a single transaction and return how many moved"""
+        return self.apply_changes(moves={client_id: stage for client_id in client_ids})
+
+    def delete_client(self, client_id):
+        self.apply_changes(deletes=[client_id])
+
+    def apply_changes(self, moves=None, deletes=(), expected_versions=None):
+        """Apply stage moves ({client_id: stage}) and deletes in one transaction
+
+        Moved clients are dated today, in today's quarter. Ids that no longer
+        exist and moves to a client's current stage are skipped. When
+        expected_versions ({client_id: row version}) is given, nothing is
+        written and ConflictError is raised if any of those rows has changed
+        or been deleted since it was read. Returns the number of rows changed.
+        """
+        deletes = sorted({int(client_id) for client_id in deletes})
+        deleted = set(deletes)
+        moves = {
+            int(client_id): stage for client_id, stage in (moves or {}).items()
+            if int(client_id) not in deleted
+        }
+        today = date.today()
+        # Moved clients take today's quarter along with today's date
+        quarter = quarter_label([today])[0]
+        with self._lock:
+            codes = {stage: self.stages.ensure(stage) for stage in set(moves.values())}
+            with self._conn:
+                current = self._current_rows(sorted(moves) + deletes)
+                self._check_versions(current, expected_versions)
+                changes = []
+                for client_id, stage in moves.items():
+                    if client_id not in current or current[client_id][0] == stage:
+                        continue
+                    old_stage, value, _, dims = current[client_id]
+                    new_dims = tuple(quarter if dimension == 'quarter' else member
+                                     for dimension, member in zip(DIMENSIONS, dims))
+                    changes.append(Change('update', client_id, stage, old_stage, value, new_dims, old_dims=dims))
+                changes += [
+                    Change('delete', client_id, None, current[client_id][0], current[client_id][1],
+                           current[client_id][3])
+                    for client_id in deletes if client_id in current
+                ]
+                self._conn.executemany(
+                    "UPDATE clients SET stage_code = ?, last_updated = ?, quarter = ?, version = version + 1 WHERE id = ?",
+                    [(codes[change.stage], str(today), quarter, change.client_id)
+                     for change in changes if change.op == 'update']
+                )
+                self._conn.executemany(
+                    "DELETE FROM clients WHERE id = ?",
+                    [(change.client_id,) for change in changes if change.op == 'delete']
+                )
+                if changes:
+                    self.version += 1
+            if changes:
+                self._notify(changes)
+        return len(changes)
+
+    def merge_clients(self, keep_id, duplicate_ids, expected_versions=None):
+        """Fold duplicate clients into keep_id and delete them in one transaction
+
+        Blank contact, email, owner, region and segment fields of the kept
+        client are filled from the duplicates, taking the first non-blank
+        value in id order; its stage and deal value are left alone.
+        expected_versions is checked as in apply_changes. Returns the number
+        of duplicates deleted.
+        """
+        keep_id = int(keep_id)
+        duplicate_ids = sorted({int(client_id) for client_id in duplicate_ids} - {keep_id})
+        with self._lock:
+            with self._conn:
+                current = self._current_rows([keep_id, *duplicate_ids])
+                self._check_versions(current, expected_versions)
+                if keep_id not in current:
+                    return 0
+                duplicate_ids = [client_id for client_id in duplicate_ids if client_id in current]
+                ids = [keep_id, *duplicate_ids]
+                fields = {}
+                for start in range(0, len(ids), MAX_PARAMS):
+                    chunk = ids[start:start + MAX_PARAMS]
+                    fields.update(
+                        (client_id, values) for client_id, *values in self._conn.execute(
+                            f"SELECT id, {', '.join(MERGE_FIELDS)} FROM clients "
+                            f"WHERE id IN ({', '.join('?' * len(chunk))})",
+                            chunk
+                        )
+                    )
+                kept = fields[keep_id]
+                filled = [
+                    value or next((fields[client_id][i] for client_id in duplicate_ids if fields[client_id][i]), '')
+                    for i, value in enumerate(kept)
+                ]
+                changes = []
+                if filled != kept:
+                    self._conn.execute(
+                        f"UPDATE clients SET {', '.join(field + ' = ?' for field in MERGE_FIELDS)}, "
+                        "version = version + 1 WHERE id = ?",
+                        (*filled, keep_id)
+                    )
+                    stage, value, _, dims = current[keep_id]
+                    merged = dict(zip(MERGE_FIELDS, filled))
+                    new_dims = tuple(merged.get(dimension, old) for dimension, old in zip(DIMENSIONS, dims))
+                    changes.append(Change('edit', keep_id, stage, stage, value, new_dims, value, dims))
+                self._conn.executemany("DELETE FROM clients WHERE id = ?", [(client_id,) for client_id in duplicate_ids])
+                changes += [
+                    Change('delete', client_id, None, current[client_id][0], current[client_id][1],
+                           current[client_id][3])
+                    for client_id in duplicate_ids
+                ]
+                if changes:
+                    self.version += 1
+            if changes:
+                self._notify(changes)
+        return len(duplicate_ids)
+
+    @staticmethod
+    def _check_versions(current, expected_versions):
+        """Raise ConflictError for expected row versions that no longer match the current rows"""
+        if expected_versions:
+            conflicts = [
+                int(client_id) for client_id, version in expected_versions.items()
+                if int(client_id) not in current or current[int(client_id)][2] != version
+            ]
+            if conflicts:
+                raise ConflictError(conflicts)
+
+    def _current_rows(self, client_ids):
+        """(stage, deal value, row version, dimension values) for each existing id"""
+        rows = {}
+        name = self.stages.name
+        for start in range(0, len(client_ids), MAX_PARAMS):
+            chunk = client_ids[start:start + MAX_PARAMS]
+            rows.update(
+                (client_id, (name(code), value, version, tuple(dims)))
+                for client_id, code, value, version, *dims in self._conn.execute(
+                    f"SELECT id, stage_code, deal_value, version, {', '.join(DIMENSIONS)} FROM clients "
+                    f"WHERE id IN ({', '.join('?' * len(chunk))})",
+                    chunk
+                )
+            )
+        return rows
+
+    # Queries
+
+    def is_empty(self):
+        return not self._query("SELECT 1 FROM clients LIMIT 1")
+
+    def count_clients(self, stages=None, search=None):
+        where, params = self._where(stages, search)
+        return self._query(f"SELECT COUNT(*) FROM clients{where}", params)[0][0]
+
+    def stage_summary(self, stages=None):
+        """Count, total, average, max and min deal value per stage in a single grouped scan"""
+        where, params = self._where(stages)
+        rows = self._query(
+            "SELECT stage_code, COUNT(*), SUM(deal_value), AVG(deal_value), MAX(deal_value), MIN(deal_value) "
+            f"FROM clients{where} GROUP BY stage_code",
+            params
+        )
+        name = self.stages.name
+        return [(name(code), *stats) for code, *stats in rows]
+
+    def cube_summary(self):
+        """Count, total, max and min deal value per stage and combination of DIMENSIONS values"""
+        dimensions = ', '.join(DIMENSIONS)
+        rows = self._query(
+            f"SELECT stage_code, {dimensions}, COUNT(*), SUM(deal_value), MAX(deal_value), MIN(deal_value) "
+            f"FROM clients GROUP BY stage_code, {dimensions}"
+        )
+        name = self.stages.name
+        return [(name(code), *rest) for code, *rest in rows]
+
+    def cell_extremes(self, stage, dims):
+        """Largest and smallest deal value among clients in a stage with the given DIMENSIONS values"""
+        code = self.stages.code(stage)
+        where = " AND ".join(f"{dimension} = ?" for dimension in DIMENSIONS)
+        return self._query(
+            f"SELECT MAX(deal_value), MIN(deal_value) FROM clients WHERE stage_code = ? AND {where}",
+            (code, *dims)
+        )[0]
+
+    def row_versions(self, client_ids):
+        """Current row version of each given client, for optimistic edit checks"""
+        with self._lock:
+            return {client_id: version for client_id, (_, _, version, _)
+                    in self._current_rows(sorted(int(client_id) for client_id in client_ids)).items()}
+
+    def client_ids(self, stages=None, search=None):
+        """Ids of all clients matching the list filters"""
+        where, params = self._where(stages, search)
+        return [row[0] for row in self._query(f"SELECT id FROM clients{where} ORDER BY id", params)]
+
+    def search_fields(self, client_ids=None):
+        """(id, client name, contact person, email) rows for building the search index"""
+        sql = f"SELECT id, {', '.join(SEARCH_COLUMNS)} FROM clients"
+        if client_ids is None:
+            return self._query(sql + " ORDER BY id")
+        client_ids = sorted(int(client_id) for client_id in client_ids)
+        rows = []
+        for start in range(0, len(client_ids), MAX_PARAMS):
+            chunk = client_ids[start:start + MAX_PARAMS]
+            rows += self._query(f"{sql} WHERE id IN ({', '.join('?' * len(chunk))}) ORDER BY id", chunk)
+        return rows
+
+    def stage_memberships(self):
+        """All (id, stage) pairs, used to build in-memory indexes"""
+        name = self.stages.name
+        return [(client_id, name(code)) for client_id, code in self._query("SELECT id, stage_code FROM clients")]
+
+    def stage_snapshot(self):
+        """All (id, stage, last updated) rows, used to seed the stage event log"""
+        name = self.stages.name
+        return [
+            (client_id, name(code), updated)
+            for client_id, code, updated in self._query("SELECT id, stage_code, last_updated FROM clients ORDER BY id")
+        ]
+
+    def fetch_clients(self, stages=None, search=None, limit=None, offset=0, stage_order=()):
+        """Return matching clients as a compact frame indexed by client id"""
+        where, params = self._where(stages, search)
+        sql = f"SELECT id, {', '.join(COLUMNS)} FROM clients{where} ORDER BY id"
+        if limit is not None:
+            sql += " LIMIT ? OFFSET ?"
+            params = params + [int(limit), int(offset)]
+        return self._frame(self._query(sql, params), stage_order)
+
+    def iter_clients(self, chunk_size=50_000, stage_order=()):
+        """Yield every client in id order as compact frames of at most chunk_size rows"""
+        last_id = 0
+        while True:
+            rows = self._query(
+                f"SELECT id, {', '.join(COLUMNS)} FROM clients WHERE id > ? ORDER BY id LIMIT ?",
+                (last_id, int(chunk_size))
+            )
+            if not rows:
+                return
+            last_id = rows[-1][0]
+            yield self._frame(rows, stage_order)
+
+    def fetch_clients_by_ids(self, client_ids, stage_order=()):
+        """Return the given clients, in id order, without scanning the table"""
+        client_ids = sorted(int(client_id) for client_id in client_ids)
+        rows = []
+        for start in range(0, len(client_ids), MAX_PARAMS):
+            chunk = client_ids[start:start + MAX_PARAMS]
+            rows += self._query(
+                f"SELECT id, {', '.join(COLUMNS)} FROM clients WHERE id IN ({', '.join('?' * len(chunk))}) ORDER BY id",
+                chunk
+            )
+        return self._frame(rows, stage_order)
+
+    def _frame(self, rows, stage_order):
+        df = pd.DataFrame.from_records(rows, columns=['Client ID', *COLUMNS.values()])
+        df['Stage'] = self.stages.names_for(df['Stage'].to_numpy())
+        return normalize_clients(df.set_index('Client ID'), stage_order)
@@ -0,0 +1,196 @@
+import argparse
+import json
+import threading
+import time
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+from synthetic_pipeline import generate_clients
+
+# Largest page the stand-in serves, whatever limit is asked for
+MAX_PAGE_SIZE = 10_000
+DEFAULT_PAGE_SIZE = 1_000
+
+# JSON field of each account and the synthetic pipeline column it is generated from
+ACCOUNT_COLUMNS = {
+    'name': 'Client Name',
+    'stage': 'Stage',
+    'contact': 'Contact Person',
+    'email': 'Email',
+    'amount': 'Deal Value',
+    'updated_at': 'Last Updated',
+    'owner': 'Owner',
+    'region': 'Region',
+    'segment': 'Segment',
+}
+
+
+class CrmStandIn:
+    """In-memory CRM serving the accounts changed since a cursor as paged JSON
+
+    Stands in for the CRM's accounts API so the sync can be developed and
+    benchmarked without one. Every account carries a revision taken from a
+    global counter whenever it is created, changed or deleted; a cursor is
+    the last revision a reader has seen. Deleted accounts are kept as
+    tombstones so readers behind them still learn about the delete.
+
+        GET /accounts?cursor=<cursor>&limit=<n>
+        {"accounts": [{"id": ..., "deleted": false, ...}], "next_cursor": "...", "has_more": true}
+
+    failure_rate answers that share of requests with a 503 to exercise retries.
+    """
+
+    def __init__(self, accounts=0, seed=0, failure_rate=0.0):
+        self.failure_rate = failure_rate
+        self.requests = 0
+        self._seed = seed
+        self._rng = np.random.default_rng(seed)
+        self._lock = threading.Lock()
+        self._columns = {'id': np.array([], dtype=object)}
+        self._columns.update({field: np.array([], dtype=object) for field in ACCOUNT_COLUMNS})
+        self._columns['amount'] = np.array([], dtype='int64')
+        self._deleted = np.array([], dtype=bool)
+        self._revision = np.array([], dtype='int64')
+        self._last_revision = 0
+        self._order = None
+        self.add_accounts(accounts)
+
+    def __len__(self):
+        return int((~self._deleted).sum())
+
+    def _touch(self, rows):
+        """Give rows fresh revisions, in row order"""
+        self._revision[rows] = np.arange(self._last_revision + 1, self._last_revision + 1 + len(rows))
+        self._last_revision += len(rows)
+        self._order = None
+
+    def add_accounts(self, count):
+        """Create count synthetic accounts"""
+        if not count:
+            return
+        with self._lock:
+            start = len(self._revision)
+            clients = generate_clients(count, seed=self._seed, start_id=start)
+            # Oldest first, so the initial revisions follow the accounts' update dates
+            clients = clients.sort_values('Last Updated', kind='stable')
+            new = {'id': np.array([f"ACC-{i:08d}" for i in range(start, start + count)], dtype=object)}
+            for field, column in ACCOUNT_COLUMNS.items():
+                values = clients[column]
+                if field == 'updated_at':
+                    values = values.dt.strftime('%Y-%m-%d')
+                new[field] = values.to_numpy(dtype='int64' if field == 'amount' else object)
+            for field, values in new.items():
+                self._columns[field] = np.concatenate([self._columns[field], values])
+            self._deleted = np.concatenate([self._deleted, np.zeros(count, dtype=bool)])
+            self._revision = np.concatenate([self._revision, np.zeros(count, dtype='int64')])
+            self._touch(np.arange(start, start + count))
+
+    def _sample(self, count):
+        live = np.flatnonzero(~self._deleted)
+        return np.sort(self._rng.choice(live, size=min(count, len(live)), replace=False))
+
+    def modify_accounts(self, count, stages=None):
+        """Move count random accounts to another stage and change their deal value"""
+        with self._lock:
+            rows = self._sample(count)
+            stages = np.array(stages or sorted(set(self._columns['stage'].tolist())), dtype=object)
+            self._columns['stage'][rows] = stages[self._rng.integers(0, len(stages), len(rows))]
+            amount = self._columns['amount']
+            amount[rows] = np.maximum(amount[rows] * self._rng.uniform(0.8, 1.25, len(rows)) // 500 * 500, 500)
+            self._columns['updated_at'][rows] = str(date.today())
+            self._touch(rows)
+            return len(rows)
+
+    def delete_accounts(self, count):
+        """Delete count random accounts, leaving tombstones"""
+        with self._lock:
+            rows = self._sample(count)
+            self._deleted[rows] = True
+            self._touch(rows)
+            return len(rows)
+
+    def page(self, cursor=None, limit=DEFAULT_PAGE_SIZE):
+        """Accounts whose revision is after cursor, oldest change first"""
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+        after = int(cursor) if cursor else 0
+        with self._lock:
+            if self._order is None:
+                self._order = np.argsort(self._revision, kind='stable')
+            order = self._order
+            revisions = self._revision[order]
+            start = int(np.searchsorted(revisions, after, side='right'))
+            rows = order[start:start + limit]
+            fields = ['id', *ACCOUNT_COLUMNS]
+            columns = [self._columns[field][rows].tolist() for field in fields]
+            accounts = [dict(zip(fields, values)) for values in zip(*columns)]
+            for account, deleted in zip(accounts, self._deleted[rows].tolist()):
+                account['deleted'] = deleted
+            next_cursor = int(revisions[start + len(rows) - 1]) if len(rows) else after
+            return {
+                'accounts': accounts,
+                'next_cursor': str(next_cursor),
+                'has_more': start + len(rows) < len(order),
+            }
+
+    def serve(self, port=0, host="127.0.0.1"):
+        """Serve the accounts API at http://host:port/accounts from a daemon thread and return the server"""
+        crm = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlparse(self.path)
+                if url.path != '/accounts':
+                    self.send_error(404)
+                    return
+                crm.requests += 1
+                if crm.failure_rate and crm._rng.random() < crm.failure_rate:
+                    self.send_error(503, "Injected failure")
+                    return
+                query = parse_qs(url.query)
+                try:
+                    body = crm.page(query.get('cursor', [None])[0], query.get('limit', [DEFAULT_PAGE_SIZE])[0])
+                except ValueError:
+                    self.send_error(400, "Bad cursor or limit")
+                    return
+                body = json.dumps(body).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, name="crm-standin", daemon=True).start()
+        return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve synthetic CRM accounts for the dashboard's CRM sync")
+    parser.add_argument("--accounts", type=int, default=10_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="share of requests answered with a 503")
+    parser.add_argument("--churn", type=int, default=0, help="accounts changed every --interval seconds")
+    parser.add_argument("--interval", type=float, default=10.0)
+    args = parser.parse_args()
+
+    crm = CrmStandIn(args.accounts, seed=args.seed, failure_rate=args.failure_rate)
+    server = crm.serve(args.port)
+    print(f"Serving {len(crm):,} accounts at http://127.0.0.1:{server.server_address[1]}/accounts")
+    try:
+        while True:
+            time.sleep(args.interval)
+            if args.churn:
+                # Mostly edits, with a few new and deleted accounts
+                changed = crm.modify_accounts(args.churn)
+                crm.add_accounts(max(1, args.churn // 10))
+                crm.delete_accounts(max(1, args.churn // 50))
+                print(f"Changed {changed:,} accounts; now {len(crm):,}")
+    except KeyboardInterrupt:
+        server.shutdown()
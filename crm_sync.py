@@ -0,0 +1,227 @@
+import json
+import random
+import threading
+import time
+from collections import namedtuple
+from urllib.error import HTTPError, URLError
+from urllib.parse import urlencode
+from urllib.request import urlopen
+
+import pandas as pd
+
+# Dashboard column filled from each JSON field of a CRM account
+ACCOUNT_FIELDS = {
+    'id': 'CRM ID',
+    'name': 'Client Name',
+    'stage': 'Stage',
+    'contact': 'Contact Person',
+    'email': 'Email',
+    'amount': 'Deal Value',
+    'updated_at': 'Last Updated',
+    'owner': 'Owner',
+    'region': 'Region',
+    'segment': 'Segment',
+}
+
+# Accounts requested per page; each page is merged into the store in one transaction
+PAGE_SIZE = 5_000
+REQUEST_TIMEOUT = 30
+
+# Failed requests are retried after BACKOFF seconds, doubling up to MAX_BACKOFF, with jitter
+MAX_RETRIES = 5
+BACKOFF = 0.5
+MAX_BACKOFF = 30.0
+RETRY_STATUSES = {408, 429, 500, 502, 503, 504}
+
+DEFAULT_SOURCE = 'crm'
+
+# Rejected accounts kept from a run for review; the report still counts every one
+MAX_REJECTED_ROWS = 1_000
+REJECTED_COLUMNS = ['CRM ID', 'Client Name', 'Stage', 'Error']
+
+# Progress of a sync run, or its totals once finished
+SyncReport = namedtuple('SyncReport', [
+    'rows', 'added', 'updated', 'deleted', 'skipped', 'rejected', 'batches', 'retries', 'seconds', 'rows_per_second',
+    'cursor',
+])
+SyncStatus = namedtuple('SyncStatus', ['running', 'report', 'error'])
+
+
+class CrmClient:
+    """Pages of CRM accounts changed since a cursor, fetched over HTTP with retries
+
+    Timeouts, dropped connections and 408, 429 and 5xx responses are
+    retried with exponential backoff and jitter (honouring Retry-After);
+    other errors, or running out of retries, raise the last error.
+    """
+
+    def __init__(self, base_url, page_size=PAGE_SIZE, timeout=REQUEST_TIMEOUT, max_retries=MAX_RETRIES,
+                 backoff=BACKOFF, max_backoff=MAX_BACKOFF, sleep=time.sleep):
+        self.base_url = base_url.rstrip('/')
+        self.page_size = page_size
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self._sleep = sleep
+        self.retries = 0
+
+    def fetch_page(self, cursor=None):
+        """(accounts, next cursor, whether more pages follow) for the accounts changed after cursor"""
+        query = {'limit': self.page_size}
+        if cursor is not None:
+            query['cursor'] = cursor
+        page = self._get(f"{self.base_url}/accounts?{urlencode(query)}")
+        return page['accounts'], page['next_cursor'], bool(page['has_more'])
+
+    def _get(self, url):
+        for attempt in range(self.max_retries + 1):
+            try:
+                with urlopen(url, timeout=self.timeout) as response:
+                    return json.load(response)
+            except HTTPError as error:
+                if error.code not in RETRY_STATUSES or attempt == self.max_retries:
+                    raise
+                delay = self._delay(attempt, error.headers.get('Retry-After'))
+            except (URLError, TimeoutError, ConnectionError):
+                if attempt == self.max_retries:
+                    raise
+                delay = self._delay(attempt)
+            self.retries += 1
+            self._sleep(delay)
+
+    def _delay(self, attempt, retry_after=None):
+        if retry_after is not None and retry_after.isdigit():
+            return min(float(retry_after), self.max_backoff)
+        return min(self.backoff * 2 ** attempt, self.max_backoff) * random.uniform(0.5, 1.0)
+
+
+def accounts_frame(accounts, stages):
+    """Split a page of accounts into a frame to upsert, deleted CRM ids, a skipped count and rejected accounts
+
+    The upserts have dashboard column names. Accounts without an id, name or stage, or with a non-numeric amount, are
+    skipped. Stages are matched case-insensitively onto the registered
+    stages; accounts in any other stage are rejected rather than adding the
+    CRM's stage to the funnel.
+    """
+    frame = pd.DataFrame.from_records(accounts, columns=[*ACCOUNT_FIELDS, 'deleted'])
+    deleted = frame['deleted'].fillna(False).astype(bool)
+    ids = frame['id'].fillna('').astype(str).str.strip()
+    names = frame['name'].fillna('').astype(str).str.strip()
+    crm_stages = frame['stage'].fillna('').astype(str).str.strip()
+    amounts = pd.to_numeric(frame['amount'], errors='coerce')
+    valid = (ids != '') & (names != '') & (crm_stages != '') & amounts.notna()
+    canonical = {stage.casefold(): stage for stage in stages}
+    matched = crm_stages.str.casefold().map(canonical)
+    unknown = valid & ~deleted & matched.isna()
+    keep = valid & ~deleted & ~unknown
+    upserts = frame[keep].rename(columns=ACCOUNT_FIELDS).drop(columns='deleted')
+    upserts = upserts.assign(**{
+        'CRM ID': ids[keep],
+        'Client Name': names[keep],
+        'Stage': matched[keep],
+        'Deal Value': amounts[keep].round().astype('int64'),
+        'Contact Person': upserts['Contact Person'].fillna('').astype(str),
+        'Email': upserts['Email'].fillna('').astype(str),
+        'Last Updated': pd.to_datetime(upserts['Last Updated'], errors='coerce', utc=True).dt.tz_localize(None),
+    })
+    rejected = pd.DataFrame({
+        'CRM ID': ids[unknown],
+        'Client Name': names[unknown],
+        'Stage': crm_stages[unknown],
+        'Error': 'Unknown stage',
+    }, columns=REJECTED_COLUMNS)
+    deleted_ids = ids[deleted & (ids != '')].tolist()
+    skipped = int((~valid & ~deleted).sum())
+    return upserts, deleted_ids, skipped, rejected
+
+
+class CrmSync:
+    """Incremental pull of CRM accounts into the client store, off the UI thread
+
+    A run starts from the cursor the store saved for this source and pulls
+    pages of the accounts changed since it. Each page is merged with one
+    upsert_clients call, which saves the cursor past the page in the same
+    transaction, so an interrupted run resumes after the last merged page.
+    start() runs the sync on a daemon thread and status() reports its
+    progress in rows per second while it runs and its totals afterwards.
+    Accounts in stages the store does not know are left out and listed by
+    rejected().
+    """
+
+    def __init__(self, store, client, source=DEFAULT_SOURCE):
+        self.store = store
+        self.client = client
+        self.source = source
+        self._lock = threading.Lock()
+        self._thread = None
+        self._report = None
+        self._error = None
+        self._rejected = []
+
+    def run(self, max_batches=None):
+        """Sync until the CRM has no more changes (or max_batches pages) and return the report"""
+        start = time.perf_counter()
+        retries = self.client.retries
+        totals = dict(rows=0, added=0, updated=0, deleted=0, skipped=0, rejected=0, batches=0)
+        rejected = []
+        kept = 0
+        cursor = self.store.sync_cursor(self.source)
+        has_more = True
+        while has_more and (max_batches is None or totals['batches'] < max_batches):
+            accounts, cursor, has_more = self.client.fetch_page(cursor)
+            upserts, deleted_ids, skipped, page_rejected = accounts_frame(accounts, self.store.stages.names())
+            added, updated, deleted = self.store.upsert_clients(upserts, deleted_ids, self.source, cursor)
+            if len(page_rejected) and kept < MAX_REJECTED_ROWS:
+                rejected.append(page_rejected.head(MAX_REJECTED_ROWS - kept))
+                kept += len(rejected[-1])
+            totals['rows'] += len(accounts)
+            totals['added'] += added
+            totals['updated'] += updated
+            totals['deleted'] += deleted
+            totals['skipped'] += skipped
+            totals['rejected'] += len(page_rejected)
+            totals['batches'] += 1
+            report = self._progress(totals, start, retries, cursor)
+            with self._lock:
+                self._report = report
+                self._rejected = rejected
+            if not accounts:
+                break
+        return self._progress(totals, start, retries, cursor)
+
+    def _progress(self, totals, start, retries, cursor):
+        seconds = time.perf_counter() - start
+        return SyncReport(**totals, retries=self.client.retries - retries, seconds=seconds,
+                          rows_per_second=totals['rows'] / seconds if seconds else 0.0, cursor=cursor)
+
+    def start(self):
+        """Run the sync on a background thread unless one is already running; returns whether it started"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return False
+            self._error = None
+            self._thread = threading.Thread(target=self._run_in_background, name="crm-sync", daemon=True)
+            self._thread.start()
+            return True
+
+    def _run_in_background(self):
+        try:
+            report = self.run()
+        except Exception as error:
+            with self._lock:
+                self._error = error
+            return
+        with self._lock:
+            self._report = report
+
+    def rejected(self):
+        """Accounts of the latest run left out for an unknown stage, up to MAX_REJECTED_ROWS"""
+        with self._lock:
+            rejected = self._rejected
+        return pd.concat(rejected, ignore_index=True) if rejected else pd.DataFrame(columns=REJECTED_COLUMNS)
+
+    def status(self):
+        with self._lock:
+            running = self._thread is not None and self._thread.is_alive()
+            return SyncStatus(running, self._report, self._error)
@@ -0,0 +1,178 @@
+import time
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+# Company name words that say nothing about which company it is
+LEGAL_SUFFIXES = [
+    'inc', 'incorporated', 'ltd', 'limited', 'llc', 'llp', 'plc', 'corp', 'corporation', 'co', 'company',
+    'group', 'holdings', 'gmbh', 'ag', 'sa', 'bv', 'pvt', 'pty',
+]
+# Suffix words are dropped anywhere but at the start of a name
+SUFFIX_PATTERN = r"(?<=\S)\s+(?:" + "|".join(LEGAL_SUFFIXES) + r")\b"
+
+# Shared mailbox providers say nothing about the company either
+FREE_EMAIL_DOMAINS = {
+    'gmail.com', 'googlemail.com', 'yahoo.com', 'hotmail.com', 'outlook.com', 'live.com', 'msn.com',
+    'icloud.com', 'aol.com', 'proton.me', 'protonmail.com', 'gmx.com', 'mail.com',
+}
+
+# Characters of the squashed name shared by every client in a prefix block
+PREFIX_LENGTH = 6
+
+# Blocks with more clients than this are too common a key to tell clients apart and are skipped;
+# it also bounds the candidate pairs to max_block_size - 1 per client, keeping a scan near-linear
+MAX_BLOCK_SIZE = 25
+
+# A pair's score is the larger of its name score, weighted below, and EMAIL_MATCH_SCORE when
+# both clients have the same email address
+NAME_WEIGHT = 0.8
+CONTACT_WEIGHT = 0.1
+DOMAIN_WEIGHT = 0.1
+EMAIL_MATCH_SCORE = 0.9
+DEFAULT_THRESHOLD = 0.75
+
+PAIR_COLUMNS = ['Client ID', 'Duplicate ID', 'Score', 'Name Similarity', 'Same Email', 'Same Contact', 'Same Domain']
+
+# Scored pairs at or above the threshold, the groups of client ids they link (largest score
+# first), how many candidate pairs the blocks produced, and the blocks skipped for their size
+DuplicateScan = namedtuple('DuplicateScan', ['pairs', 'groups', 'candidates', 'skipped_blocks', 'seconds'])
+
+
+def normalize_names(names):
+    """Case-folded company names without punctuation or legal suffixes"""
+    text = pd.Series(names, dtype=object).fillna('').astype(str).str.casefold()
+    text = text.str.replace('&', ' and ', regex=False).str.replace(r"[^\w\s]", " ", regex=True)
+    text = text.str.replace(SUFFIX_PATTERN, " ", regex=True)
+    return text.str.replace(r"\s+", " ", regex=True).str.strip()
+
+
+def normalize_emails(emails):
+    return pd.Series(emails, dtype=object).fillna('').astype(str).str.strip().str.casefold()
+
+
+def email_domains(emails):
+    """Domain of each normalized email, blank for free mail providers and invalid addresses"""
+    domains = emails.str.replace(r"^.*@", "", regex=True)
+    valid = emails.str.contains('@', regex=False) & domains.str.contains('.', regex=False)
+    return domains.where(valid & ~domains.isin(FREE_EMAIL_DOMAINS), '')
+
+
+def block_pairs(keys, max_block_size=MAX_BLOCK_SIZE):
+    """Row pairs (i < j) sharing a non-blank key, and the number of blocks skipped for their size"""
+    codes, _ = pd.factorize(pd.Series(keys).where(lambda key: key != ''))
+    rows = np.flatnonzero(codes >= 0)
+    codes = codes[rows]
+    sizes = np.bincount(codes) if len(codes) else np.array([], dtype='int64')
+    kept = (sizes[codes] >= 2) & (sizes[codes] <= max_block_size)
+    rows, codes = rows[kept], codes[kept]
+    order = np.argsort(codes, kind='stable')
+    rows, codes = rows[order], codes[order]
+    # Rows of a block are adjacent and ascending, so each offset pairs every row with a later one
+    pairs = []
+    for offset in range(1, max_block_size):
+        same = codes[offset:] == codes[:-offset]
+        if not same.any():
+            break
+        pairs.append(np.stack([rows[:-offset][same], rows[offset:][same]], axis=1))
+    pairs = np.concatenate(pairs) if pairs else np.empty((0, 2), dtype='int64')
+    return pairs, int((sizes > max_block_size).sum())
+
+
+def _trigrams(text):
+    text = f"  {text} "
+    return frozenset(text[i:i + 3] for i in range(len(text) - 2))
+
+
+def name_similarity(names, left, right):
+    """Jaccard similarity of the character trigrams of names[left] and names[right]"""
+    rows = np.unique(np.concatenate([left, right]))
+    grams = dict(zip(rows.tolist(), map(_trigrams, names[rows].tolist())))
+    similarity = np.empty(len(left))
+    for i, (a, b) in enumerate(zip(left.tolist(), right.tolist())):
+        ga, gb = grams[a], grams[b]
+        similarity[i] = len(ga & gb) / len(ga | gb)
+    return similarity
+
+
+def _components(left, right):
+    """Groups of values linked by the pairs, as arrays of sorted values"""
+    values = np.unique(np.concatenate([left, right]))
+    left, right = np.searchsorted(values, left), np.searchsorted(values, right)
+    labels = np.arange(len(values))
+    while True:
+        linked = np.minimum(labels[left], labels[right])
+        updated = labels.copy()
+        np.minimum.at(updated, left, linked)
+        np.minimum.at(updated, right, linked)
+        # Jump each label to its own label's label until they settle
+        updated = updated[updated]
+        if np.array_equal(updated, labels):
+            break
+        labels = updated
+    order = np.argsort(labels, kind='stable')
+    bounds = np.flatnonzero(np.diff(labels[order])) + 1
+    return np.split(values[order], bounds)
+
+
+def find_duplicates(store, threshold=DEFAULT_THRESHOLD, max_block_size=MAX_BLOCK_SIZE):
+    """Scan the store for clients that are likely the same company
+
+    Candidate pairs come from blocks of clients sharing a key (the same
+    email, company email domain, normalized name, name prefix or contact
+    person) instead of comparing every client with every other.
+    Candidates are scored on name trigram similarity, matching contact and
+    matching email or domain.
+    """
+    start = time.perf_counter()
+    clients = pd.DataFrame.from_records(store.search_fields(),
+                                        columns=['Client ID', 'Client Name', 'Contact Person', 'Email'])
+    names = normalize_names(clients['Client Name'])
+    emails = normalize_emails(clients['Email'])
+    domains = email_domains(emails)
+    contacts = clients['Contact Person'].fillna('').astype(str).str.strip().str.casefold()
+    squashed = names.str.replace(' ', '', regex=False)
+    prefixes = squashed.str.slice(0, PREFIX_LENGTH).where(squashed.str.len() >= PREFIX_LENGTH, '')
+
+    blocks = [block_pairs(keys, max_block_size) for keys in (emails, domains, names, prefixes, contacts)]
+    pairs = np.concatenate([pairs for pairs, _ in blocks])
+    skipped = sum(skipped for _, skipped in blocks)
+    # Pairs found by several keys are scored once
+    n = max(len(clients), 1)
+    encoded = np.unique(pairs[:, 0].astype('int64') * n + pairs[:, 1])
+    left, right = encoded // n, encoded % n
+
+    names = names.to_numpy(dtype=object)
+    emails, domains, contacts = (values.to_numpy(dtype=object) for values in (emails, domains, contacts))
+    similarity = name_similarity(names, left, right) if len(left) else np.empty(0)
+    same_email = (emails[left] == emails[right]) & (emails[left] != '')
+    same_contact = (contacts[left] == contacts[right]) & (contacts[left] != '')
+    same_domain = (domains[left] == domains[right]) & (domains[left] != '')
+    score = np.maximum(
+        NAME_WEIGHT * similarity + CONTACT_WEIGHT * same_contact + DOMAIN_WEIGHT * (same_domain | same_email),
+        EMAIL_MATCH_SCORE * same_email
+    )
+
+    matched = score >= threshold
+    ids = clients['Client ID'].to_numpy()
+    result = pd.DataFrame({
+        'Client ID': ids[left[matched]],
+        'Duplicate ID': ids[right[matched]],
+        'Score': score[matched].round(3),
+        'Name Similarity': similarity[matched].round(3),
+        'Same Email': same_email[matched],
+        'Same Contact': same_contact[matched],
+        'Same Domain': same_domain[matched],
+    }, columns=PAIR_COLUMNS).sort_values('Score', ascending=False, kind='stable').reset_index(drop=True)
+
+    groups = []
+    if len(result):
+        best = pd.concat([
+            result[['Client ID', 'Score']],
+            result[['Duplicate ID', 'Score']].rename(columns={'Duplicate ID': 'Client ID'}),
+        ]).groupby('Client ID')['Score'].max()
+        groups = _components(result['Client ID'].to_numpy(), result['Duplicate ID'].to_numpy())
+        groups.sort(key=lambda group: (-best.loc[group].max(), group[0]))
+        groups = [group.tolist() for group in groups]
+    return DuplicateScan(result, groups, len(left), skipped, time.perf_counter() - start)
@@ -0,0 +1,188 @@
+import atexit
+import sqlite3
+import threading
+import time
+from array import array
+
+import numpy as np
+import pandas as pd
+
+from client_store import MAX_PARAMS
+
+# Event kinds stored in the kind column
+CREATE, MOVE, DELETE = 0, 1, 2
+EVENT_KINDS = {CREATE: 'create', MOVE: 'move', DELETE: 'delete'}
+
+# Stage code recorded when an event has no source or target stage
+NO_STAGE = -1
+
+# Buffered events are written once either limit is reached
+FLUSH_SIZE = 1_000
+FLUSH_INTERVAL = 5.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS stage_codes (
+    code INTEGER PRIMARY KEY,
+    stage TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS stage_events (
+    event_id INTEGER PRIMARY KEY,
+    ts INTEGER NOT NULL,
+    client_id INTEGER NOT NULL,
+    kind INTEGER NOT NULL,
+    from_code INTEGER NOT NULL,
+    to_code INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_events_ts ON stage_events (ts);
+CREATE INDEX IF NOT EXISTS idx_events_client ON stage_events (client_id, ts);
+"""
+
+EVENT_COLUMNS = ['event_id', 'ts', 'client_id', 'kind', 'from_code', 'to_code']
+
+
+def _now_ms():
+    return time.time_ns() // 1_000_000
+
+
+class StageEventLog:
+    """Append-only log of client create, stage move and delete events
+
+    Events hold integer stage codes and millisecond timestamps. They are
+    buffered in column arrays and written in batches; reads flush the buffer
+    first and return plain NumPy-backed columns for vectorized analytics.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        if path != ':memory:':
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        self._codes = dict(self._conn.execute("SELECT stage, code FROM stage_codes"))
+        self._buffer = {column: array('q') for column in EVENT_COLUMNS[1:]}
+        self._last_flush = time.monotonic()
+        # Buffered events are written at exit unless the log is closed first
+        atexit.register(self.flush)
+
+    def attach(self, store):
+        """Record every change made through store, backfilling create events for an empty log"""
+        store.subscribe(self.record, load=lambda: self._backfill(store))
+
+    def _backfill(self, store):
+        with self._lock:
+            if self._conn.execute("SELECT 1 FROM stage_events LIMIT 1").fetchone():
+                return
+            for client_id, stage, last_updated in store.stage_snapshot():
+                ts = int(pd.Timestamp(last_updated).value // 1_000_000)
+                self._append(ts, client_id, CREATE, NO_STAGE, self.stage_code(stage))
+            self.flush()
+
+    def stage_code(self, stage):
+        """Integer code for a stage name, assigned on first use"""
+        code = self._codes.get(stage)
+        if code is None:
+            with self._lock, self._conn:
+                self._conn.execute(
+                    "INSERT OR IGNORE INTO stage_codes (code, stage) "
+                    "VALUES ((SELECT COALESCE(MAX(code), -1) + 1 FROM stage_codes), ?)",
+                    (stage,)
+                )
+                code = self._conn.execute("SELECT code FROM stage_codes WHERE stage = ?", (stage,)).fetchone()[0]
+                self._codes[stage] = code
+        return code
+
+    def stage_names(self):
+        """Stage name for every code"""
+        with self._lock:
+            return {code: stage for stage, code in self._codes.items()}
+
+    def _append(self, ts, client_id, kind, from_code, to_code):
+        buffer = self._buffer
+        buffer['ts'].append(ts)
+        buffer['client_id'].append(client_id)
+        buffer['kind'].append(kind)
+        buffer['from_code'].append(from_code)
+        buffer['to_code'].append(to_code)
+
+    def record(self, changes):
+        """Store listener that turns a batch of changes into events"""
+        ts = _now_ms()
+        kinds = {'add': CREATE, 'update': MOVE, 'edit': MOVE, 'delete': DELETE}
+        with self._lock:
+            for change in changes:
+                if change.stage == change.old_stage:
+                    # Edits that leave the stage alone are not stage events
+                    continue
+                from_code = self.stage_code(change.old_stage) if change.old_stage is not None else NO_STAGE
+                to_code = self.stage_code(change.stage) if change.stage is not None else NO_STAGE
+                self._append(ts, change.client_id, kinds[change.op], from_code, to_code)
+            if (len(self._buffer['ts']) >= FLUSH_SIZE
+                    or time.monotonic() - self._last_flush >= FLUSH_INTERVAL):
+                self.flush()
+
+    def flush(self):
+        """Write buffered events in one transaction"""
+        with self._lock:
+            buffer = self._buffer
+            if buffer['ts']:
+                rows = zip(buffer['ts'], buffer['client_id'], buffer['kind'],
+                           buffer['from_code'], buffer['to_code'])
+                with self._conn:
+                    self._conn.executemany(
+                        "INSERT INTO stage_events (ts, client_id, kind, from_code, to_code) VALUES (?, ?, ?, ?, ?)",
+                        rows
+                    )
+                self._buffer = {column: array('q') for column in EVENT_COLUMNS[1:]}
+            self._last_flush = time.monotonic()
+
+    def close(self):
+        """Write buffered events and close the log"""
+        with self._lock:
+            self.flush()
+            atexit.unregister(self.flush)
+            self._conn.close()
+
+    def read_events(self, start=None, end=None, client_ids=None, after_event_id=None):
+        """Events in [start, end) for the given clients, ordered by event id
+
+        start and end accept anything pandas can turn into a timestamp.
+        """
+        clauses = []
+        params = []
+        if start is not None:
+            clauses.append("ts >= ?")
+            params.append(int(pd.Timestamp(start).value // 1_000_000))
+        if end is not None:
+            clauses.append("ts < ?")
+            params.append(int(pd.Timestamp(end).value // 1_000_000))
+        if after_event_id is not None:
+            clauses.append("event_id > ?")
+            params.append(int(after_event_id))
+        # Client filters are bound in chunks to stay under SQLite's parameter limit
+        client_chunks = [None]
+        if client_ids is not None:
+            client_ids = sorted({int(client_id) for client_id in client_ids})
+            client_chunks = [client_ids[i:i + MAX_PARAMS] for i in range(0, len(client_ids), MAX_PARAMS)]
+        rows = []
+        with self._lock:
+            self.flush()
+            for chunk in client_chunks:
+                chunk_clauses = list(clauses)
+                chunk_params = list(params)
+                if chunk is not None:
+                    chunk_clauses.append(f"client_id IN ({', '.join('?' * len(chunk))})")
+                    chunk_params.extend(chunk)
+                where = " WHERE " + " AND ".join(chunk_clauses) if chunk_clauses else ""
+                rows += self._conn.execute(
+                    f"SELECT {', '.join(EVENT_COLUMNS)} FROM stage_events{where} ORDER BY event_id", chunk_params
+                ).fetchall()
+        if len(client_chunks) > 1:
+            rows.sort()
+        return self._frame(rows)
+
+    def _frame(self, rows):
+        columns = np.array(rows, dtype='int64').reshape(-1, len(EVENT_COLUMNS)).T
+        events = pd.DataFrame(dict(zip(EVENT_COLUMNS, columns)))
+        events['ts'] = pd.to_datetime(events['ts'], unit='ms')
+        return events.astype({'kind': 'int8', 'from_code': 'int32', 'to_code': 'int32'})
@@ -0,0 +1,109 @@
+import tempfile
+
+from client_schema import DIMENSION_COLUMNS
+
+# Rows fetched from the store per chunk; bounds peak memory of an export
+EXPORT_CHUNK_SIZE = 50_000
+
+EXPORT_FORMATS = {
+    'CSV': ('csv', 'text/csv'),
+    'JSON': ('json', 'application/json'),
+    'Parquet': ('parquet', 'application/vnd.apache.parquet'),
+    'Arrow IPC': ('arrow', 'application/vnd.apache.arrow.file'),
+}
+
+
+def _export_chunks(store, chunk_size):
+    """Client chunks with the id column and plain string stages and dimensions, ready to serialize"""
+    for chunk in store.iter_clients(chunk_size):
+        chunk = chunk.reset_index()
+        for column in ['Stage', *DIMENSION_COLUMNS]:
+            chunk[column] = chunk[column].astype(str)
+        yield chunk
+
+
+def write_csv(store, fileobj, chunk_size=EXPORT_CHUNK_SIZE):
+    """Stream all clients to a binary file object as CSV"""
+    header = True
+    for chunk in _export_chunks(store, chunk_size):
+        fileobj.write(chunk.drop(columns='Client ID').to_csv(index=False, header=header).encode())
+        header = False
+    if header:
+        fileobj.write(",".join(["Client Name", "Stage", "Contact Person", "Email", "Deal Value", "Last Updated",
+                                *DIMENSION_COLUMNS]).encode() + b"\n")
+
+
+def write_json(store, fileobj, chunk_size=EXPORT_CHUNK_SIZE):
+    """Stream all clients to a binary file object as a JSON array of records"""
+    fileobj.write(b"[")
+    first = True
+    for chunk in _export_chunks(store, chunk_size):
+        records = chunk.drop(columns='Client ID').to_json(orient='records', date_format='iso')
+        if not first:
+            fileobj.write(b",")
+        # Splice each chunk's records into the single outer array
+        fileobj.write(records[1:-1].encode())
+        first = False
+    fileobj.write(b"]")
+
+
+def _arrow_schema():
+    import pyarrow as pa
+
+    return pa.schema([
+        ('Client ID', pa.int64()),
+        ('Client Name', pa.string()),
+        ('Stage', pa.string()),
+        ('Contact Person', pa.string()),
+        ('Email', pa.string()),
+        ('Deal Value', pa.int64()),
+        ('Last Updated', pa.timestamp('ns')),
+        *[(column, pa.string()) for column in DIMENSION_COLUMNS],
+    ])
+
+
+def write_parquet(store, fileobj, chunk_size=EXPORT_CHUNK_SIZE):
+    """Stream all clients to a Parquet file, one row group per chunk"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = _arrow_schema()
+    with pq.ParquetWriter(fileobj, schema, compression='zstd') as writer:
+        for chunk in _export_chunks(store, chunk_size):
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+
+
+def write_arrow(store, fileobj, chunk_size=EXPORT_CHUNK_SIZE):
+    """Stream all clients to an Arrow IPC file, one record batch per chunk"""
+    import pyarrow as pa
+
+    schema = _arrow_schema()
+    options = pa.ipc.IpcWriteOptions(compression='zstd')
+    with pa.ipc.new_file(fileobj, schema, options=options) as writer:
+        for chunk in _export_chunks(store, chunk_size):
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+
+
+WRITERS = {
+    'CSV': write_csv,
+    'JSON': write_json,
+    'Parquet': write_parquet,
+    'Arrow IPC': write_arrow,
+}
+
+
+def available_formats():
+    """Export formats usable in this environment; the columnar ones need pyarrow"""
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return ['CSV', 'JSON']
+    return list(EXPORT_FORMATS)
+
+
+def export_clients(store, export_format, chunk_size=EXPORT_CHUNK_SIZE):
+    """Write all clients in the given format to a temporary file and return it rewound"""
+    fileobj = tempfile.TemporaryFile()
+    WRITERS[export_format](store, fileobj, chunk_size)
+    fileobj.seek(0)
+    return fileobj
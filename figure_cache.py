@@ -0,0 +1,60 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+DEFAULT_MAX_FIGURES = 64
+
+
+def content_hash(*parts):
+    """Stable digest of figure inputs: pandas objects by content, everything else by repr"""
+    digest = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        if isinstance(part, (pd.DataFrame, pd.Series)):
+            digest.update(pd.util.hash_pandas_object(part, index=True).to_numpy().tobytes())
+            digest.update(repr(list(part.columns) if isinstance(part, pd.DataFrame) else part.name).encode())
+        elif isinstance(part, dict):
+            digest.update(repr(sorted(part.items())).encode())
+        else:
+            digest.update(repr(part).encode())
+        # Separator so adjacent parts cannot run together
+        digest.update(b'\x00')
+    return digest.hexdigest()
+
+
+class FigureCache:
+    """LRU cache of built Plotly figures keyed on their aggregate data and stage/color configuration
+
+    Figures are never mutated after they are built, so a cached figure can be
+    handed to every session that renders the same data.
+    """
+
+    def __init__(self, max_figures=DEFAULT_MAX_FIGURES):
+        self.max_figures = max_figures
+        self._lock = threading.Lock()
+        self._figures = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, build, *data, config=()):
+        """Return build(*data), reusing the cached figure when data and config are unchanged"""
+        key = (build.__qualname__, content_hash(*data, *config))
+        with self._lock:
+            figure = self._figures.get(key)
+            if figure is not None:
+                self._figures.move_to_end(key)
+                self.hits += 1
+                return figure
+            self.misses += 1
+        figure = build(*data)
+        with self._lock:
+            self._figures[key] = figure
+            self._figures.move_to_end(key)
+            while len(self._figures) > self.max_figures:
+                self._figures.popitem(last=False)
+        return figure
+
+    def clear(self):
+        with self._lock:
+            self._figures.clear()
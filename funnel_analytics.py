@@ -0,0 +1,167 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+from event_log import DELETE, NO_STAGE
+from row_table import RowTable
+
+WON_STAGES = ("Closed Won",)
+LOST_STAGES = ("Closed Lost",)
+
+# Above this share of known clients touched by new events, rebuild instead of patching
+FULL_REFRESH_RATIO = 0.1
+
+STINT_DTYPES = {
+    'client_id': 'int64', 'stage_code': 'int32', 'start': 'datetime64[ms]', 'end': 'datetime64[ms]',
+    'exit_code': 'int32', 'deleted': 'bool', 'open': 'bool',
+}
+REACH_DTYPES = {'client_id': 'int64', 'stage_code': 'int32', 'advanced': 'bool', 'dropped': 'bool', 'current': 'bool'}
+
+CONVERSION_COLUMNS = [
+    'Stage', 'Entered', 'Advanced', 'Dropped', 'Current',
+    'Conversion Rate', 'Drop-off Rate', 'Median Days', 'P90 Days',
+]
+
+
+def progression_order(stage_order, won_stages=WON_STAGES, lost_stages=LOST_STAGES):
+    """Stage order used to decide progress: open stages as listed, then won, then lost"""
+    closing = set(won_stages) | set(lost_stages)
+    return ([stage for stage in stage_order if stage not in closing]
+            + [stage for stage in won_stages if stage in stage_order]
+            + [stage for stage in lost_stages if stage in stage_order])
+
+
+def build_stints(events):
+    """Turn events into one row per stay in a stage
+
+    Each stint has the client, stage code, entry time, exit time (NaT while
+    the client is still there) and the code of the stage it moved to
+    (NO_STAGE when the client was deleted).
+    """
+    events = events.sort_values(['client_id', 'event_id'], kind='stable')
+    same_client = events['client_id'].to_numpy()[1:] == events['client_id'].to_numpy()[:-1]
+    next_ts = events['ts'].shift(-1).where(np.append(same_client, False))
+    next_code = events['to_code'].shift(-1).where(np.append(same_client, False))
+    next_kind = events['kind'].shift(-1).where(np.append(same_client, False))
+
+    entered = (events['to_code'] != NO_STAGE).to_numpy()
+    stints = pd.DataFrame({
+        'client_id': events['client_id'].to_numpy()[entered],
+        'stage_code': events['to_code'].to_numpy()[entered],
+        'start': events['ts'].to_numpy()[entered],
+        'end': next_ts.to_numpy()[entered],
+        'exit_code': next_code.fillna(NO_STAGE).astype('int32').to_numpy()[entered],
+        'deleted': (next_kind == DELETE).to_numpy()[entered],
+    })
+    stints['open'] = stints['end'].isna()
+    return stints
+
+
+def reach_table(stints, positions, lost_codes):
+    """Per (client, stage) flags: advanced to a later open or won stage, or dropped out"""
+    if stints.empty:
+        return pd.DataFrame(columns=['client_id', 'stage_code', 'advanced', 'dropped', 'current'])
+    position = stints['stage_code'].map(positions).fillna(-1).to_numpy()
+    # Lost stages never count as progress
+    progress = np.where(np.isin(stints['stage_code'], lost_codes), -1, position)
+    # Highest position reached strictly after each stint: a reversed cummax per client, shifted by one
+    clients = stints['client_id'].to_numpy()[::-1]
+    reached = pd.Series(progress[::-1]).groupby(clients).cummax()
+    future_max = reached.groupby(clients).shift(1).fillna(-1).to_numpy()[::-1]
+
+    flags = pd.DataFrame({
+        'client_id': stints['client_id'].to_numpy(),
+        'stage_code': stints['stage_code'].to_numpy(),
+        'advanced': future_max > position,
+        'dropped': stints['deleted'].to_numpy() | np.isin(stints['exit_code'], lost_codes),
+        'current': stints['open'].to_numpy(),
+    })
+    reach = flags.groupby(['client_id', 'stage_code'], sort=False).agg(
+        advanced=('advanced', 'any'), dropped=('dropped', 'any'), current=('current', 'any')
+    ).reset_index()
+    reach['dropped'] &= ~reach['advanced']
+    return reach
+
+
+class FunnelAnalytics:
+    """Stage-to-stage conversion, drop-off and time-in-stage from the stage event log
+
+    Stints and per-client reach flags are cached in row tables keyed by
+    client; a refresh only reads events after the last one seen, tombstones
+    the rows of the clients they touch and appends their rebuilt rows.
+    """
+
+    def __init__(self, event_log):
+        self.event_log = event_log
+        self._lock = threading.Lock()
+        self._last_event_id = 0
+        self._stints = None
+        self._clients = 0
+        self._order = None
+        self._reach = None
+
+    def refresh(self, stage_order):
+        """Pull new events and update the cached stints; returns the number of new events"""
+        order = progression_order(stage_order)
+        with self._lock:
+            new_events = self.event_log.read_events(after_event_id=self._last_event_id)
+            if new_events.empty and order == self._order:
+                return 0
+            touched = new_events['client_id'].unique()
+            if self._stints is None or len(touched) > FULL_REFRESH_RATIO * max(self._clients, 1):
+                stints = build_stints(self.event_log.read_events())
+                self._stints = RowTable(STINT_DTYPES, key='client_id')
+                self._stints.append(stints)
+                self._clients = stints['client_id'].nunique()
+                self._reach = None
+            elif len(touched):
+                # Rebuild only the touched clients from their complete history
+                rebuilt = build_stints(self.event_log.read_events(client_ids=touched))
+                self._clients += rebuilt['client_id'].nunique() - self._stints.remove(touched)
+                self._stints.append(rebuilt)
+            if len(new_events):
+                self._last_event_id = int(new_events['event_id'].iloc[-1])
+
+            codes = {stage: code for code, stage in self.event_log.stage_names().items()}
+            positions = {codes[stage]: i for i, stage in enumerate(order) if stage in codes}
+            lost_codes = [codes[stage] for stage in LOST_STAGES if stage in codes]
+            if self._reach is None or order != self._order:
+                self._reach = RowTable(REACH_DTYPES, key='client_id')
+                self._reach.append(reach_table(self._stints.frame(), positions, lost_codes))
+            elif len(touched):
+                self._reach.remove(touched)
+                self._reach.append(reach_table(rebuilt, positions, lost_codes))
+            self._order = order
+            return len(new_events)
+
+    def stage_conversion(self, stage_order):
+        """Per-stage entered, advanced and dropped clients with rates and time-in-stage quantiles"""
+        self.refresh(stage_order)
+        with self._lock:
+            reach = self._reach.frame()
+            stints = self._stints.frame()
+            order = self._order
+        names = self.event_log.stage_names()
+
+        counts = reach.groupby('stage_code').agg(
+            Entered=('client_id', 'size'),
+            Advanced=('advanced', 'sum'),
+            Dropped=('dropped', 'sum'),
+            Current=('current', 'sum'),
+        )
+        # Time in stage only counts completed stays
+        closed = stints[~stints['open']]
+        days = (closed['end'] - closed['start']).dt.total_seconds() / 86_400
+        by_stage = days.groupby(closed['stage_code'])
+        quantiles = pd.DataFrame({'Median Days': by_stage.median(), 'P90 Days': by_stage.quantile(0.9)})
+
+        table = counts.join(quantiles, how='left')
+        table.index = table.index.map(names)
+        table = table.reindex([stage for stage in order if stage in table.index])
+        table['Conversion Rate'] = table['Advanced'] / table['Entered']
+        table['Drop-off Rate'] = table['Dropped'] / table['Entered']
+        # Closing stages have nowhere further to go
+        closing = [stage for stage in (*WON_STAGES, *LOST_STAGES) if stage in table.index]
+        table.loc[closing, ['Conversion Rate', 'Drop-off Rate']] = np.nan
+        return table.rename_axis('Stage').reset_index().reindex(columns=CONVERSION_COLUMNS)
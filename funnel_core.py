@@ -0,0 +1,268 @@
+import hashlib
+import os
+import sys
+import time
+from collections import namedtuple
+
+# Only the standard library is imported up front; pandas comes in with the
+# store modules and plotly is imported by the chart builders on first use.
+
+DEFAULT_FUNNEL_STAGES = [
+    "Research",
+    "Initial Contact",
+    "First Presentation",
+    "Interested",
+    "Multiple Presentations",
+    "Order Stage",
+    "Negotiation",
+    "Closed Won",
+    "Closed Lost"
+]
+
+DEFAULT_STAGE_COLORS = {
+    "Research": "#FF6B6B",
+    "Initial Contact": "#4ECDC4",
+    "First Presentation": "#45B7D1",
+    "Interested": "#96CEB4",
+    "Multiple Presentations": "#FFEAA7",
+    "Order Stage": "#DDA0DD",
+    "Negotiation": "#98D8C8",
+    "Closed Won": "#6BCF7F",
+    "Closed Lost": "#FF7675"
+}
+
+WON_STAGE = "Closed Won"
+
+PipelineMetrics = namedtuple('PipelineMetrics', ['total_clients', 'total_value', 'closed_won', 'conversion_rate'])
+
+
+def stage_color(stage, colors):
+    """Color for a stage, derived from its name when none is assigned"""
+    color = colors.get(stage)
+    if color is None:
+        color = f"#{hashlib.md5(stage.encode()).hexdigest()[:6]}"
+    return color
+
+
+# Aggregations
+
+def pipeline_metrics(aggregates, won_stage=WON_STAGE):
+    """Headline totals for the dashboard; conversion_rate is a percentage, or None without clients"""
+    total_clients = aggregates.total_clients()
+    closed_won = int(aggregates.counts().get(won_stage, 0))
+    conversion_rate = closed_won / total_clients * 100 if total_clients else None
+    return PipelineMetrics(total_clients, aggregates.total_value(), closed_won, conversion_rate)
+
+
+# Filtering
+
+class ClientQuery:
+    """Clients in the given stages matching a search term
+
+    With a search index, the term is looked up in it and narrowed to the
+    stages through the stage index; otherwise the store counts and pages the
+    matches itself. Only the requested page of rows is ever fetched.
+    """
+
+    def __init__(self, store, stages, search=None, stage_index=None, search_index=None):
+        self.store = store
+        self.stages = list(stages)
+        self.search = (search or '').strip() or None
+        if self.search and search_index is not None and stage_index is not None:
+            self.matching_ids = stage_index.filter(search_index.search(self.search), self.stages)
+            self.total = len(self.matching_ids)
+        else:
+            # Matching ids are only materialized when an index produced them
+            self.matching_ids = None
+            self.total = store.count_clients(stages=self.stages, search=self.search)
+
+    def page(self, offset, limit, stage_order=()):
+        """One page of the matching clients as a frame indexed by client id"""
+        if self.matching_ids is not None:
+            return self.store.fetch_clients_by_ids(self.matching_ids[offset:offset + limit], stage_order=stage_order)
+        return self.store.fetch_clients(stages=self.stages, search=self.search, limit=limit, offset=offset,
+                                        stage_order=stage_order)
+
+    def ids(self):
+        """Ids of every matching client"""
+        if self.matching_ids is not None:
+            return self.matching_ids
+        return self.store.client_ids(stages=self.stages, search=self.search)
+
+
+# Charts
+#
+# Every chart is built from a per-stage aggregate, so its JSON payload grows with
+# the number of stages rather than the number of clients.
+
+def _per_stage(stages):
+    """Reject chart input that has more than one row per stage, i.e. raw client rows"""
+    if not stages.is_unique:
+        raise ValueError("chart input must be aggregated to one row per stage")
+
+
+def deal_value_chart(stage_values, colors, title, hovertemplate=None):
+    """Bar chart of total deal value per stage from a stage-indexed series"""
+    import plotly.express as px
+
+    _per_stage(stage_values.index)
+    stage_values = stage_values.rename_axis('Stage').reset_index(name='Deal Value')
+    fig = px.bar(
+        stage_values,
+        x='Stage',
+        y='Deal Value',
+        color='Stage',
+        color_discrete_map=colors,
+        title=title
+    )
+    fig.update_layout(
+        xaxis_tickangle=-45,
+        height=400,
+        showlegend=False
+    )
+    fig.update_traces(texttemplate='$%{y:,.0f}', textposition='outside')
+    if hovertemplate:
+        fig.update_traces(hovertemplate=hovertemplate)
+    return fig
+
+
+def average_deal_chart(stats_df, colors):
+    """Bar chart of average deal value per stage from a stage summary table"""
+    import plotly.express as px
+
+    _per_stage(stats_df['Stage'])
+    fig = px.bar(
+        stats_df[['Stage', 'Avg Value']],
+        x='Stage',
+        y='Avg Value',
+        labels={'Avg Value': 'Deal Value'},
+        title="Average Deal Value by Stage",
+        color='Stage',
+        color_discrete_map=colors
+    )
+    fig.update_layout(xaxis_tickangle=-45, showlegend=False)
+    return fig
+
+
+def stage_distribution_chart(stats_df, colors):
+    """Pie chart of clients per stage from a stage summary table"""
+    import plotly.express as px
+
+    _per_stage(stats_df['Stage'])
+    return px.pie(
+        stats_df[['Stage', 'Client Count']],
+        names='Stage',
+        values='Client Count',
+        title="Client Distribution by Stage",
+        color='Stage',
+        color_discrete_map=colors
+    )
+
+
+def funnel_chart(stage_counts, stage_order, colors, title, hovertemplate=None, labels=None):
+    """Funnel of client counts over the stages in stage_order from a stage-indexed series
+
+    labels optionally maps stages to the text shown for them on the axis.
+    """
+    import plotly.graph_objects as go
+
+    _per_stage(stage_counts.index)
+    stages = [stage for stage in stage_order if stage in stage_counts.index]
+    fig = go.Figure(
+        go.Funnel(
+            y=[labels.get(stage, stage) for stage in stages] if labels else stages,
+            x=[int(stage_counts[stage]) for stage in stages],
+            textinfo="value+percent initial",
+            marker=dict(color=[stage_color(stage, colors) for stage in stages]),
+            connector=dict(line=dict(color="royalblue", dash="solid", width=2))
+        ),
+        layout=dict(title=title, height=600, font=dict(size=12))
+    )
+    if hovertemplate:
+        fig.update_traces(hovertemplate=hovertemplate)
+    return fig
+
+
+# Dashboard figures
+#
+# The funnel and deal value charts as the apps render them; benchmarks.py builds these
+# same figures to check their payloads. Clickable charts open a stage when clicked.
+
+def dashboard_funnel_chart(stage_counts, stage_order, colors, clickable=False):
+    """Funnel over every stage in stage_order, including stages without clients"""
+    _per_stage(stage_counts.index)
+    stage_counts = stage_counts.reindex(list(stage_order), fill_value=0)
+    if clickable:
+        # Each stage is labelled with its client count
+        labels = {stage: f"{stage}<br>({int(count)} clients)" for stage, count in stage_counts.items()}
+        return funnel_chart(stage_counts, stage_order, colors,
+                            "Pre-Sales Funnel Overview (Click on any stage to view clients)",
+                            hovertemplate="<b>%{y}</b><br>Click to view clients<extra></extra>", labels=labels)
+    return funnel_chart(stage_counts, stage_order, colors, "Pre-Sales Funnel Overview")
+
+
+def dashboard_deal_value_chart(stage_values, colors, clickable=False):
+    """Total deal value per stage"""
+    if clickable:
+        return deal_value_chart(
+            stage_values, colors, "Total Deal Value by Stage (Click bars to view clients)",
+            hovertemplate="<b>%{x}</b><br>Total Value: $%{y:,.0f}<br>Click to view clients<extra></extra>"
+        )
+    return deal_value_chart(stage_values, colors, "Total Deal Value by Stage")
+
+
+# Cold start
+
+class StartupTimer:
+    """Milliseconds from a start time to named points of a run; each point keeps its first mark"""
+
+    def __init__(self, start=None):
+        self.start = time.perf_counter() if start is None else start
+        self.marks = {}
+
+    def mark(self, name):
+        self.marks.setdefault(name, round((time.perf_counter() - self.start) * 1000, 1))
+        return self.marks[name]
+
+
+def measure_cold_start(start, db_path):
+    """Time a headless first paint: imports, first aggregate query and the funnel figure's JSON"""
+    timer = StartupTimer(start)
+    from client_store import ClientStore
+    from stage_aggregates import StageAggregates
+    timer.mark("imports")
+    aggregates = StageAggregates(ClientStore(db_path))
+    counts = aggregates.counts()
+    timer.mark("first query")
+    import plotly.graph_objects  # noqa: F401
+    timer.mark("plotly import")
+    # The figure JSON is what a browser receives for its first chart
+    dashboard_funnel_chart(counts, DEFAULT_FUNNEL_STAGES, DEFAULT_STAGE_COLORS).to_json()
+    timer.mark("first paint")
+    return timer.marks
+
+
+if __name__ == "__main__":
+    # Only the command line needs these, so the apps never import them
+    import argparse
+    import json
+    import subprocess
+
+    parser = argparse.ArgumentParser(description="Report headless cold-start timings of the funnel engine")
+    parser.add_argument("--cold-start", action="store_true", help="measure in a fresh interpreter")
+    parser.add_argument("--db", default=os.environ.get("FUNNEL_DB_PATH", "presales_funnel.db"))
+    args = parser.parse_args()
+
+    if args.cold_start:
+        # A child interpreter has nothing imported yet, so its timings are a true cold start
+        code = (
+            "import time; start = time.perf_counter(); import json, funnel_core; "
+            f"print(json.dumps(funnel_core.measure_cold_start(start, {os.path.abspath(args.db)!r})))"
+        )
+        child = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True,
+                               cwd=os.path.dirname(os.path.abspath(__file__)))
+        marks = json.loads(child.stdout.strip().splitlines()[-1])
+    else:
+        marks = measure_cold_start(time.perf_counter(), args.db)
+    for name, elapsed_ms in marks.items():
+        print(f"{name:>14}: {elapsed_ms:8.1f} ms")
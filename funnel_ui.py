@@ -0,0 +1,401 @@
+import functools
+import math
+import os
+from collections import namedtuple
+
+import pandas as pd
+import streamlit as st
+
+from client_store import COLUMNS, DIMENSIONS, ClientStore, ConflictError
+from stage_aggregates import StageAggregates
+from pipeline_cube import PipelineCube
+from stage_index import StageIndex
+from search_index import ClientSearchIndex
+from event_log import StageEventLog
+from funnel_analytics import FunnelAnalytics
+from figure_cache import FigureCache
+from background_results import BackgroundResults
+from crm_sync import CrmClient, CrmSync
+from duplicates import find_duplicates
+from perf_metrics import SpanMetrics
+
+# Streamlit resources, widgets and helpers shared by both dashboards. Each app
+# calls configure() with its database and sample data before opening anything.
+
+# Client lists only build widgets for the visible page
+PAGE_SIZE_OPTIONS = [10, 25, 50, 100]
+DEFAULT_PAGE_SIZE = 25
+# Groups of likely duplicate clients listed for merging at a time
+DUPLICATE_GROUPS_SHOWN = 10
+
+# Set FUNNEL_COLD_START=1 to report import and first paint timings
+COLD_START = bool(os.environ.get("FUNNEL_COLD_START"))
+# Section timings can be written in Prometheus text format to a file and/or served on a local port
+METRICS_FILE = os.environ.get("FUNNEL_METRICS_FILE")
+METRICS_PORT = os.environ.get("FUNNEL_METRICS_PORT")
+# Seconds between checks for finished background analytics while a page waits on them
+BACKGROUND_POLL_INTERVAL = 1
+# Accounts API of the CRM to sync clients from, e.g. http://127.0.0.1:8765 for crm_standin.py
+CRM_URL = os.environ.get("FUNNEL_CRM_URL")
+
+# The app's client database, the sample clients seeding it when empty and the custom
+# stages registered with a new database
+AppSettings = namedtuple('AppSettings', ['db_path', 'sample_clients', 'custom_stage_colors'])
+settings = None
+
+
+def configure(db_path, sample_clients, custom_stage_colors=None):
+    """Point the shared resources at the app's database; call before any get_* function"""
+    global settings
+    settings = AppSettings(db_path, sample_clients, dict(custom_stage_colors or {}))
+
+
+@st.cache_resource
+def open_client_store(path):
+    """Open the client store at path, seeding it with the app's sample data on first run"""
+    store = ClientStore(path)
+    if store.is_empty():
+        for stage, color in settings.custom_stage_colors.items():
+            store.stages.ensure(stage, color)
+        store.add_clients(settings.sample_clients)
+    return store
+
+
+def get_client_store():
+    return open_client_store(settings.db_path)
+
+
+@st.cache_resource
+def get_stage_aggregates():
+    """Stage statistics shared by every page, recomputed only after the data changes"""
+    return StageAggregates(get_client_store())
+
+
+@st.cache_resource
+def get_pipeline_cube():
+    """Stage by owner, region, segment and quarter statistics, kept current by the store's change notifications"""
+    return PipelineCube(get_client_store())
+
+
+@st.cache_resource
+def get_stage_index():
+    """Stage to client id index, kept current by the store's change notifications"""
+    return StageIndex(get_client_store())
+
+
+@st.cache_resource
+def get_search_index():
+    """Trigram index over client name, contact person and email"""
+    return ClientSearchIndex(get_client_store())
+
+
+@st.cache_resource
+def get_event_log():
+    """Append-only stage event log attached to the client store, kept in a sibling file"""
+    event_log = StageEventLog(os.path.splitext(settings.db_path)[0] + "_events.db")
+    event_log.attach(get_client_store())
+    return event_log
+
+
+@st.cache_resource
+def get_funnel_analytics():
+    """Conversion analytics refreshed incrementally from the event log"""
+    return FunnelAnalytics(get_event_log())
+
+
+@st.cache_resource
+def get_span_metrics():
+    """Latency histograms of page sections and helpers, shared by every session"""
+    metrics = SpanMetrics()
+    if METRICS_PORT:
+        metrics.serve(int(METRICS_PORT))
+    return metrics
+
+
+@st.cache_resource
+def get_cold_start_report():
+    """Timings of the first run in this process, filled in by that run"""
+    return {}
+
+
+@st.cache_resource
+def get_figure_cache():
+    """LRU cache of built charts shared by every session"""
+    return FigureCache()
+
+
+@st.cache_resource
+def get_background_results():
+    """Worker threads computing heavy analytics once per data version for every session"""
+    return BackgroundResults()
+
+
+@st.cache_resource
+def get_crm_sync():
+    """Incremental CRM sync into the client store, shared by every session"""
+    return CrmSync(get_client_store(), CrmClient(CRM_URL))
+
+
+# Pipeline slicing
+
+def dimension_filters():
+    """Members picked in the sidebar slicers by dimension; dimensions left empty are not filtered"""
+    return {dimension: st.session_state[f"slice_{dimension}"] for dimension in DIMENSIONS
+            if st.session_state.get(f"slice_{dimension}")}
+
+
+def slice_key():
+    """Hashable form of dimension_filters()"""
+    return tuple((dimension, tuple(values)) for dimension, values in dimension_filters().items())
+
+
+def get_pipeline_slice():
+    """Stage statistics for the sidebar slicers, answered from the cube when any are set"""
+    filters = dimension_filters()
+    if not filters:
+        return get_stage_aggregates()
+    return get_pipeline_cube().slice(filters)
+
+
+def render_dimension_filters():
+    """Sidebar slicers for the metrics, funnel, deal value chart and statistics"""
+    cube = get_pipeline_cube()
+    with st.sidebar.expander("🔎 Slice Pipeline", expanded=bool(dimension_filters())):
+        for dimension in DIMENSIONS:
+            key = f"slice_{dimension}"
+            # Keep picked members selectable after their last client is gone
+            options = sorted(set(cube.members(dimension)) | set(st.session_state.get(key, [])))
+            st.multiselect(COLUMNS[dimension], options, key=key, format_func=lambda member: member or "Unassigned")
+        st.caption("Stage cards and client lists are not sliced.")
+
+
+def create_pagination_controls(total_rows, key):
+    """Render page size and page selectors and return the (offset, limit) of the visible page"""
+    col1, col2, col3 = st.columns([1, 1, 2])
+
+    with col1:
+        page_size = st.selectbox("Rows per page", PAGE_SIZE_OPTIONS,
+                                 index=PAGE_SIZE_OPTIONS.index(DEFAULT_PAGE_SIZE),
+                                 key=f"page_size_{key}")
+
+    page_count = max(1, math.ceil(total_rows / page_size))
+    # Clamp a page left over from a larger result set before the widget is created
+    if st.session_state.get(f"page_{key}", 1) > page_count:
+        st.session_state[f"page_{key}"] = page_count
+
+    with col2:
+        page_number = st.number_input("Page", min_value=1, max_value=page_count, value=1, step=1,
+                                      key=f"page_{key}")
+
+    offset = (page_number - 1) * page_size
+    with col3:
+        st.caption(f"Showing {min(offset + 1, total_rows)}–{min(offset + page_size, total_rows)} "
+                   f"of {total_rows:,} clients")
+
+    return offset, page_size
+
+
+# Timing
+
+def span(name):
+    """Time a block into the shared histograms and this session's latest timings"""
+    return get_span_metrics().span(name, sink=st.session_state.setdefault("span_timings", {}))
+
+
+def traced(name=None):
+    """Decorator timing every call of a helper as a span"""
+    def decorator(func):
+        span_name = name or func.__name__
+
+        @functools.wraps(func)
+        def run(*args, **kwargs):
+            with span(span_name):
+                return func(*args, **kwargs)
+        return run
+    return decorator
+
+
+def render_debug_panel():
+    """Optional sidebar panel with this session's latest span timings and rolling percentiles across sessions"""
+    if not st.sidebar.toggle("Debug timings", key="debug_timings",
+                             help="Time each page section and chart helper"):
+        return
+    metrics = get_span_metrics()
+    with st.sidebar.expander("⏱ Section timings", expanded=True):
+        st.caption("This session, latest run of each section (ms)")
+        st.dataframe(pd.Series(st.session_state.get("span_timings", {}), name="ms").round(1),
+                     use_container_width=True)
+        st.caption("All sessions, rolling")
+        snapshot = metrics.snapshot()
+        if snapshot:
+            st.dataframe(pd.DataFrame(snapshot).set_index("Span"), use_container_width=True)
+        st.download_button("Download Prometheus metrics", data=metrics.prometheus_text,
+                           file_name="funnel_metrics.prom", mime="text/plain", key="download_span_metrics")
+
+
+def report_startup(startup):
+    """Mark the end of the run on the app's startup timer and, in cold-start mode, show the timings in the sidebar"""
+    startup.mark("full run")
+    if not COLD_START:
+        return
+    first_run = get_cold_start_report()
+    if not first_run:
+        first_run.update(startup.marks)
+        print("Cold start: " + ", ".join(f"{name} {elapsed_ms:.1f} ms" for name, elapsed_ms in first_run.items()),
+              flush=True)
+    with st.sidebar.expander("🚀 Cold start"):
+        st.dataframe(pd.DataFrame({"First run (ms)": first_run, "This run (ms)": startup.marks}),
+                     use_container_width=True)
+
+
+# Background results
+
+def background(name, version, compute, waiting):
+    """Latest result of compute for name, recomputed off the script thread when version has moved on
+
+    Jobs still running are added to waiting so the page can poll for them.
+    """
+    snapshot = get_background_results().get(name, version, get_span_metrics().timed(f"background_{name[0]}")(compute))
+    if snapshot.refreshing:
+        waiting.append((name, version))
+    return snapshot
+
+
+def show_refresh_state(snapshot, label):
+    """Caption a background result that is being recomputed or failed to refresh"""
+    if snapshot.error is not None:
+        st.warning(f"Could not refresh {label}: {snapshot.error}")
+    elif snapshot.refreshing:
+        if snapshot.value is None:
+            st.info(f"⏳ Computing {label}…")
+        else:
+            st.caption(f"⏳ Refreshing {label}; showing the previous result until it is ready.")
+
+
+@st.fragment(run_every=BACKGROUND_POLL_INTERVAL)
+def poll_background_results(waiting):
+    """Rerun the page once every background job it is waiting for has finished"""
+    results = get_background_results()
+    if not any(results.running(name, version) for name, version in waiting):
+        st.rerun()
+
+
+# CRM sync
+
+def describe_sync(report):
+    return (f"{report.rows:,} accounts in {report.batches:,} batches "
+            f"({report.added:,} added, {report.updated:,} updated, {report.deleted:,} deleted, "
+            f"{report.skipped:,} skipped, {report.rejected:,} rejected) at {report.rows_per_second:,.0f} rows/s, {report.retries:,} retries")
+
+
+@st.fragment(run_every=BACKGROUND_POLL_INTERVAL)
+def watch_crm_sync():
+    """Show a running sync's progress and rerun the page when it finishes"""
+    status = get_crm_sync().status()
+    if not status.running:
+        st.rerun()
+    if status.report is None:
+        st.info("⏳ Syncing…")
+    else:
+        st.info(f"⏳ Syncing: {describe_sync(status.report)}")
+
+
+def render_crm_sync():
+    """Start a CRM sync, which runs on a background thread, and show how the last one went"""
+    if not CRM_URL:
+        st.caption("Set FUNNEL_CRM_URL to the CRM accounts API to sync clients from it. To try it out, "
+                   "run `python crm_standin.py` and set FUNNEL_CRM_URL=http://127.0.0.1:8765.")
+        return
+    sync = get_crm_sync()
+    st.caption(f"Pulls the accounts changed in {CRM_URL} since the last sync, matched to clients by CRM id.")
+    if st.button("Sync now", key="crm_sync", disabled=sync.status().running):
+        sync.start()
+    status = sync.status()
+    if status.running:
+        watch_crm_sync()
+    elif status.error is not None:
+        st.error(f"Sync failed: {status.error}")
+    elif status.report is not None:
+        st.success(f"Synced {describe_sync(status.report)}")
+        if status.report.rejected:
+            st.warning(f"{status.report.rejected:,} accounts were left out because their stage is not in the funnel. "
+                       "Add the stage or fix it in the CRM, then sync again.")
+            st.dataframe(sync.rejected(), use_container_width=True)
+
+
+# Edits
+
+def seen_row_versions(client_ids):
+    """Row versions of the clients as this session last displayed them
+
+    The click that triggers an edit is handled in the rerun after the rep saw
+    the row, so edits are checked against the remembered version rather than
+    the one this rerun reads.
+    """
+    current = get_client_store().row_versions(client_ids)
+    seen = st.session_state.setdefault("seen_versions", {})
+    shown = {client_id: seen.get(client_id, version) for client_id, version in current.items()}
+    seen.update(current)
+    st.session_state.setdefault("drawn_versions", {}).update(current)
+    return shown
+
+
+def forget_undrawn_versions():
+    """Keep only the row versions drawn since the last full run; call at the top of each full run"""
+    st.session_state.seen_versions = st.session_state.get("drawn_versions", {})
+    st.session_state.drawn_versions = {}
+
+
+def warn_conflict(error):
+    st.toast(f"⚠️ {len(error.client_ids)} clients were changed by someone else. "
+             "Review the refreshed rows and try again.")
+
+
+def render_duplicates():
+    """Scan for likely duplicate clients off the script thread and merge the groups picked"""
+    if not st.toggle("Scan for duplicates", key="dedup_scan",
+                     help="Compares clients sharing an email, company domain, contact person or similar name"):
+        return
+    store = get_client_store()
+    waiting = []
+    scan = background(("duplicates",), store.version, lambda: find_duplicates(store), waiting)
+    show_refresh_state(scan, "duplicates")
+    if waiting:
+        poll_background_results(waiting)
+    result = scan.value
+    if result is None:
+        return
+    st.caption(f"{len(result.groups):,} groups of likely duplicates among {result.candidates:,} candidate pairs, "
+               f"found in {result.seconds:.1f}s")
+    if not result.groups:
+        st.info("No likely duplicates found.")
+        return
+
+    for group in result.groups[:DUPLICATE_GROUPS_SHOWN]:
+        clients = store.fetch_clients_by_ids(group)
+        if len(clients) < 2:
+            # Already merged; the next scan drops the group
+            continue
+        key = group[0]
+        versions = seen_row_versions(clients.index)
+        pairs = result.pairs[result.pairs['Client ID'].isin(group)]
+        reasons = [label for column, label in (('Same Email', "same email"), ('Same Contact', "same contact"),
+                                               ('Same Domain', "same domain")) if pairs[column].any()]
+        st.caption(f"Match score {pairs['Score'].max():.2f}" + "".join(f" · {reason}" for reason in reasons))
+        st.dataframe(clients[['Client Name', 'Stage', 'Contact Person', 'Email', 'Deal Value', 'Owner']],
+                     use_container_width=True)
+        col1, col2 = st.columns([3, 1])
+        with col1:
+            labels = {client_id: f"#{client_id} {name}" for client_id, name in clients['Client Name'].items()}
+            keep = st.radio("Keep", list(labels), format_func=labels.get, key=f"dedup_keep_{key}", horizontal=True)
+        with col2:
+            if st.button("Merge", key=f"dedup_merge_{key}"):
+                try:
+                    merged = store.merge_clients(keep, [client_id for client_id in clients.index if client_id != keep],
+                                                 expected_versions=versions)
+                except ConflictError as error:
+                    warn_conflict(error)
+                else:
+                    st.toast(f"Merged {merged} duplicates into {clients.at[keep, 'Client Name']}")
+                st.rerun()
+        st.divider()
@@ -0,0 +1,184 @@
+import functools
+import os
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Histogram bucket upper bounds in milliseconds, exported in seconds
+LATENCY_BUCKETS_MS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1_000, 2_500, 5_000, 10_000)
+
+# Recent observations kept per span for the rolling quantiles
+ROLLING_WINDOW = 500
+
+# Shortest gap between two writes of the metrics file
+EXPORT_INTERVAL = 10.0
+
+METRIC_NAME = "funnel_span_duration_seconds"
+RECENT_METRIC_NAME = "funnel_span_recent_duration_seconds"
+QUANTILES = (0.5, 0.9, 0.99)
+
+
+def _escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _quantile(sorted_values, q):
+    if not sorted_values:
+        return float('nan')
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+class _Histogram:
+    __slots__ = ('buckets', 'count', 'total', 'last', 'recent')
+
+    def __init__(self, n_buckets, window):
+        self.buckets = [0] * (n_buckets + 1)
+        self.count = 0
+        self.total = 0.0
+        self.last = 0.0
+        self.recent = deque(maxlen=window)
+
+
+class SpanMetrics:
+    """Process-wide latency histograms for named sections of a dashboard run
+
+    Every span keeps cumulative bucket counts (exported as a Prometheus
+    histogram) and its most recent observations (exported as a summary of
+    rolling quantiles and shown in the debug panel). Recording a span is a
+    bisect and a few additions under a lock.
+    """
+
+    def __init__(self, buckets_ms=LATENCY_BUCKETS_MS, window=ROLLING_WINDOW):
+        self.buckets_ms = tuple(buckets_ms)
+        self.window = window
+        self._lock = threading.Lock()
+        self._spans = {}
+        self._last_export = 0.0
+
+    def observe(self, name, elapsed_ms):
+        with self._lock:
+            histogram = self._spans.get(name)
+            if histogram is None:
+                histogram = self._spans[name] = _Histogram(len(self.buckets_ms), self.window)
+            histogram.buckets[bisect_left(self.buckets_ms, elapsed_ms)] += 1
+            histogram.count += 1
+            histogram.total += elapsed_ms
+            histogram.last = elapsed_ms
+            histogram.recent.append(elapsed_ms)
+
+    @contextmanager
+    def span(self, name, sink=None):
+        """Time the block as name; the elapsed milliseconds are also stored in sink[name] when given"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            self.observe(name, elapsed_ms)
+            if sink is not None:
+                sink[name] = elapsed_ms
+
+    def timed(self, name=None):
+        """Decorator recording every call of the function as a span"""
+        def decorator(func):
+            span_name = name or func.__name__
+
+            @functools.wraps(func)
+            def run(*args, **kwargs):
+                with self.span(span_name):
+                    return func(*args, **kwargs)
+            return run
+        return decorator
+
+    def snapshot(self):
+        """One row per span: call count, last, rolling p50/p90/p99 and max, all in milliseconds"""
+        with self._lock:
+            spans = {name: (h.count, h.last, sorted(h.recent)) for name, h in self._spans.items()}
+        return [
+            {
+                'Span': name,
+                'Calls': count,
+                'Last ms': round(last, 1),
+                'p50 ms': round(_quantile(recent, 0.5), 1),
+                'p90 ms': round(_quantile(recent, 0.9), 1),
+                'p99 ms': round(_quantile(recent, 0.99), 1),
+                'Max ms': round(recent[-1], 1) if recent else float('nan'),
+            }
+            for name, (count, last, recent) in sorted(spans.items())
+        ]
+
+    def prometheus_text(self):
+        """All spans in the Prometheus text exposition format"""
+        with self._lock:
+            spans = {
+                name: (list(h.buckets), h.count, h.total, sorted(h.recent))
+                for name, h in self._spans.items()
+            }
+        lines = [
+            f"# HELP {METRIC_NAME} Duration of dashboard sections and helpers.",
+            f"# TYPE {METRIC_NAME} histogram",
+        ]
+        for name, (buckets, count, total, _) in sorted(spans.items()):
+            label = _escape_label(name)
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets_ms, buckets):
+                cumulative += bucket_count
+                lines.append(f'{METRIC_NAME}_bucket{{span="{label}",le="{bound / 1000:g}"}} {cumulative}')
+            lines.append(f'{METRIC_NAME}_bucket{{span="{label}",le="+Inf"}} {count}')
+            lines.append(f'{METRIC_NAME}_sum{{span="{label}"}} {total / 1000:.6f}')
+            lines.append(f'{METRIC_NAME}_count{{span="{label}"}} {count}')
+        lines += [
+            f"# HELP {RECENT_METRIC_NAME} Rolling quantiles over the last {self.window} observations of each span.",
+            f"# TYPE {RECENT_METRIC_NAME} summary",
+        ]
+        for name, (_, _, _, recent) in sorted(spans.items()):
+            label = _escape_label(name)
+            for q in QUANTILES:
+                lines.append(f'{RECENT_METRIC_NAME}{{span="{label}",quantile="{q:g}"}} '
+                             f'{_quantile(recent, q) / 1000:.6f}')
+            lines.append(f'{RECENT_METRIC_NAME}_sum{{span="{label}"}} {sum(recent) / 1000:.6f}')
+            lines.append(f'{RECENT_METRIC_NAME}_count{{span="{label}"}} {len(recent)}')
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path, min_interval=EXPORT_INTERVAL):
+        """Atomically replace path with the current metrics, at most once per min_interval seconds
+
+        The file suits the node exporter's textfile collector. Returns True when written.
+        """
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_export < min_interval:
+                return False
+            self._last_export = now
+        directory = os.path.dirname(os.path.abspath(path))
+        with tempfile.NamedTemporaryFile('w', dir=directory, suffix='.tmp', delete=False) as f:
+            f.write(self.prometheus_text())
+        os.replace(f.name, path)
+        return True
+
+    def serve(self, port, host="127.0.0.1"):
+        """Serve the metrics at http://host:port/metrics from a daemon thread and return the server"""
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] not in ('/', '/metrics'):
+                    self.send_error(404)
+                    return
+                body = metrics.prometheus_text().encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, name="span-metrics", daemon=True).start()
+        return server
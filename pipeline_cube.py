@@ -0,0 +1,199 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+from client_store import COLUMNS, DIMENSIONS
+from stage_aggregates import SUMMARY_COLUMNS, order_summary
+
+MIN_CAPACITY = 256
+
+INT64_MIN = np.iinfo('int64').min
+INT64_MAX = np.iinfo('int64').max
+
+
+class CubeSlice:
+    """Per-stage statistics of one filter combination, with the read interface of StageAggregates"""
+
+    def __init__(self, summary):
+        self._summary = summary
+
+    def summary(self, stage_order=None):
+        return order_summary(self._summary, stage_order)
+
+    def counts(self):
+        return self._summary['Client Count']
+
+    def values(self):
+        return self._summary['Total Value']
+
+    def total_clients(self):
+        return int(self._summary['Client Count'].sum())
+
+    def total_value(self):
+        return int(self._summary['Total Value'].sum())
+
+
+class PipelineCube:
+    """Deal statistics per stage and combination of owner, region, segment and quarter
+
+    Each cell holds the count, total, largest and smallest deal of the
+    clients sharing a stage and a set of dimension values. Cells live in
+    NumPy arrays with dimension members stored as small integer codes.
+
+    The cube is built with one grouped pass over the store and then
+    maintained from the store's change notifications, like StageAggregates.
+    A cell is only re-read, through a covering index, when a change removes
+    its largest or smallest deal. Slices for any filter combination are
+    computed from the cells alone, never from client rows.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self._lock = threading.RLock()
+        store.subscribe(self.apply, load=self._load)
+
+    def _load(self):
+        with self._lock:
+            self._cells = {}
+            self._stage_codes = {}
+            self._stage_names = []
+            self._members = [{} for _ in DIMENSIONS]
+            self._member_values = [[] for _ in DIMENSIONS]
+            self._size = 0
+            self._stage = np.zeros(MIN_CAPACITY, dtype='int32')
+            self._dims = np.zeros((MIN_CAPACITY, len(DIMENSIONS)), dtype='int32')
+            self._count = np.zeros(MIN_CAPACITY, dtype='int64')
+            self._total = np.zeros(MIN_CAPACITY, dtype='int64')
+            self._max = np.zeros(MIN_CAPACITY, dtype='int64')
+            self._min = np.zeros(MIN_CAPACITY, dtype='int64')
+            for stage, *rest in self.store.cube_summary():
+                dims, (count, total, max_value, min_value) = rest[:len(DIMENSIONS)], rest[len(DIMENSIONS):]
+                slot = self._slot(stage, dims)
+                self._count[slot] = count
+                self._total[slot] = total
+                self._max[slot] = max_value
+                self._min[slot] = min_value
+
+    def _slot(self, stage, dims):
+        """Cell index of a stage and dimension values, creating the cell when new"""
+        key = (stage, *dims)
+        slot = self._cells.get(key)
+        if slot is not None:
+            return slot
+        slot = self._size
+        if slot == len(self._count):
+            for name in ('_stage', '_dims', '_count', '_total', '_max', '_min'):
+                values = getattr(self, name)
+                grown = np.zeros((2 * len(values), *values.shape[1:]), dtype=values.dtype)
+                grown[:slot] = values
+                setattr(self, name, grown)
+        stage_code = self._stage_codes.get(stage)
+        if stage_code is None:
+            stage_code = self._stage_codes[stage] = len(self._stage_names)
+            self._stage_names.append(stage)
+        self._stage[slot] = stage_code
+        for i, value in enumerate(dims):
+            code = self._members[i].get(value)
+            if code is None:
+                code = self._members[i][value] = len(self._member_values[i])
+                self._member_values[i].append(value)
+            self._dims[slot, i] = code
+        self._count[slot] = 0
+        self._cells[key] = slot
+        self._size += 1
+        return slot
+
+    def apply(self, changes):
+        """Apply a batch of store changes"""
+        with self._lock:
+            if any(change.deal_value is None or change.dims is None for change in changes):
+                # Changes without their deal value or dimensions can't be applied in place
+                self._load()
+                return
+            slot = self._slot
+            removed = np.array([
+                (slot(change.old_stage, change.old_dims or change.dims),
+                 change.deal_value if change.old_deal_value is None else change.old_deal_value)
+                for change in changes if change.old_stage is not None
+            ], dtype='int64')
+            added = np.array([(slot(change.stage, change.dims), change.deal_value)
+                              for change in changes if change.stage is not None], dtype='int64')
+            stale = np.array([], dtype='int64')
+            if len(removed):
+                slots, values = removed.T
+                stale = slots[(values == self._max[slots]) | (values == self._min[slots])]
+                np.subtract.at(self._count, slots, 1)
+                np.subtract.at(self._total, slots, values)
+            if len(added):
+                slots, values = added.T
+                empty = slots[self._count[slots] == 0]
+                self._max[empty] = INT64_MIN
+                self._min[empty] = INT64_MAX
+                np.add.at(self._count, slots, 1)
+                np.add.at(self._total, slots, values)
+                np.maximum.at(self._max, slots, values)
+                np.minimum.at(self._min, slots, values)
+            # Called under the store lock, so the re-read sees exactly these changes applied
+            for slot in np.unique(stale).tolist():
+                if self._count[slot]:
+                    self._max[slot], self._min[slot] = self.store.cell_extremes(
+                        self._stage_names[self._stage[slot]], self._cell_dims(slot)
+                    )
+
+    def _cell_dims(self, slot):
+        return [self._member_values[i][code] for i, code in enumerate(self._dims[slot].tolist())]
+
+    def _mask(self, filters):
+        """Occupied cells whose members match filters ({dimension: values}; missing or empty means all)"""
+        size = self._size
+        mask = self._count[:size] > 0
+        for i, dimension in enumerate(DIMENSIONS):
+            values = (filters or {}).get(dimension)
+            if values:
+                codes = [self._members[i][value] for value in values if value in self._members[i]]
+                mask &= np.isin(self._dims[:size, i], codes)
+        return mask
+
+    def members(self, dimension):
+        """Sorted values of a dimension that at least one client has"""
+        i = DIMENSIONS.index(dimension)
+        with self._lock:
+            codes = np.unique(self._dims[:self._size, i][self._count[:self._size] > 0])
+            return sorted(self._member_values[i][code] for code in codes.tolist())
+
+    def slice(self, filters=None):
+        """Per-stage statistics of the clients matching filters"""
+        with self._lock:
+            mask = self._mask(filters)
+            stage = self._stage[:self._size][mask]
+            n_stages = len(self._stage_names)
+            counts = np.bincount(stage, weights=self._count[:self._size][mask], minlength=n_stages)
+            totals = np.bincount(stage, weights=self._total[:self._size][mask], minlength=n_stages)
+            maxes = np.full(n_stages, INT64_MIN)
+            mins = np.full(n_stages, INT64_MAX)
+            np.maximum.at(maxes, stage, self._max[:self._size][mask])
+            np.minimum.at(mins, stage, self._min[:self._size][mask])
+            names = np.array(self._stage_names, dtype=object)
+        present = counts > 0
+        summary = pd.DataFrame({
+            'Client Count': counts[present].astype('int64'),
+            'Total Value': totals[present].astype('int64'),
+            'Max Value': maxes[present],
+            'Min Value': mins[present],
+        }, index=pd.Index(names[present], name='Stage'))
+        summary['Avg Value'] = summary['Total Value'] / summary['Client Count']
+        return CubeSlice(summary[SUMMARY_COLUMNS])
+
+    def breakdown(self, dimension, filters=None):
+        """Client count and total deal value per stage and member of dimension, for the clients matching filters"""
+        i = DIMENSIONS.index(dimension)
+        with self._lock:
+            mask = self._mask(filters)
+            frame = pd.DataFrame({
+                'Stage': np.array(self._stage_names, dtype=object)[self._stage[:self._size][mask]],
+                COLUMNS[dimension]: np.array(self._member_values[i], dtype=object)[self._dims[:self._size, i][mask]],
+                'Client Count': self._count[:self._size][mask],
+                'Total Value': self._total[:self._size][mask],
+            })
+        return frame.groupby(['Stage', COLUMNS[dimension]], sort=False).sum().reset_index()
@@ -1,131 +1,131 @@
+import time
+
+# Taken before the other imports so cold-start mode can report what they cost
+RUN_START = time.perf_counter()
+
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-from datetime import datetime, date
-import json
+from datetime import date
+import os
+
+from client_store import COLUMNS, DIMENSIONS, ConflictError
+from exports import EXPORT_FORMATS, available_formats, export_clients
+from client_import import import_clients
+from funnel_core import (
+    ClientQuery, StartupTimer,
+    average_deal_chart, dashboard_deal_value_chart, dashboard_funnel_chart, pipeline_metrics, stage_distribution_chart,
+)
+from funnel_ui import (
+    METRICS_FILE, background, configure, create_pagination_controls, dimension_filters, forget_undrawn_versions,
+    get_client_store, get_event_log, get_figure_cache, get_funnel_analytics, get_pipeline_cube, get_pipeline_slice,
+    get_search_index, get_span_metrics, get_stage_index, poll_background_results, render_crm_sync,
+    render_debug_panel, render_dimension_filters, render_duplicates, report_startup, seen_row_versions,
+    show_refresh_state, slice_key, span, traced, warn_conflict,
+)
+
+startup = StartupTimer(RUN_START)
+startup.mark("imports")
 
 # Set page config
 st.set_page_config(page_title="Pre-Sales Funnel Dashboard", layout="wide")
 
-# Define funnel stages
-FUNNEL_STAGES = [
-    "Research",
-    "Initial Contact", 
-    "First Presentation",
-    "Interested",
-    "Multiple Presentations",
-    "Order Stage",
-    "Negotiation",
-    "Closed Won",
-    "Closed Lost"
-]
+# Sample data used to seed an empty client store
+SAMPLE_CLIENTS = pd.DataFrame({
+    'Client Name': [
+        'ABC Corp', 'XYZ Ltd', 'Tech Innovations', 'Global Solutions',
+        'StartUp Inc', 'Enterprise Co', 'Digital Agency', 'Manufacturing Ltd',
+        'Retail Chain', 'Finance Group', 'Healthcare Systems', 'Education Board'
+    ],
+    'Stage': [
+        'Research', 'Initial Contact', 'First Presentation', 'Interested',
+        'Multiple Presentations', 'Order Stage', 'Negotiation', 'Closed Won',
+        'Research', 'First Presentation', 'Interested', 'Closed Lost'
+    ],
+    'Contact Person': [
+        'John Doe', 'Jane Smith', 'Mike Johnson', 'Sarah Wilson',
+        'David Brown', 'Lisa Davis', 'Tom Anderson', 'Emily Clark',
+        'Robert Miller', 'Amanda Taylor', 'Chris Moore', 'Jessica White'
+    ],
+    'Email': [
+        'john@abc.com', 'jane@xyz.com', 'mike@tech.com', 'sarah@global.com',
+        'david@startup.com', 'lisa@enterprise.com', 'tom@digital.com', 'emily@mfg.com',
+        'robert@retail.com', 'amanda@finance.com', 'chris@health.com', 'jessica@edu.com'
+    ],
+    'Deal Value': [
+        50000, 75000, 120000, 200000, 30000, 500000, 80000, 150000,
+        45000, 90000, 300000, 25000
+    ],
+    'Last Updated': [date.today() for _ in range(12)]
+})
 
-# Color mapping for stages
-STAGE_COLORS = {
-    "Research": "#FF6B6B",
-    "Initial Contact": "#4ECDC4", 
-    "First Presentation": "#45B7D1",
-    "Interested": "#96CEB4",
-    "Multiple Presentations": "#FFEAA7",
-    "Order Stage": "#DDA0DD",
-    "Negotiation": "#98D8C8",
-    "Closed Won": "#6BCF7F",
-    "Closed Lost": "#FF7675"
-}
+# Client data lives in a local SQLite file shared by every session
+CLIENT_DB_PATH = os.environ.get("FUNNEL_DB_PATH", "presales_funnel.db")
+configure(CLIENT_DB_PATH, SAMPLE_CLIENTS)
 
-# Initialize session state
-if 'clients_data' not in st.session_state:
-    # Sample data
-    st.session_state.clients_data = pd.DataFrame({
-        'Client Name': [
-            'ABC Corp', 'XYZ Ltd', 'Tech Innovations', 'Global Solutions',
-            'StartUp Inc', 'Enterprise Co', 'Digital Agency', 'Manufacturing Ltd',
-            'Retail Chain', 'Finance Group', 'Healthcare Systems', 'Education Board'
-        ],
-        'Stage': [
-            'Research', 'Initial Contact', 'First Presentation', 'Interested',
-            'Multiple Presentations', 'Order Stage', 'Negotiation', 'Closed Won',
-            'Research', 'First Presentation', 'Interested', 'Closed Lost'
-        ],
-        'Contact Person': [
-            'John Doe', 'Jane Smith', 'Mike Johnson', 'Sarah Wilson',
-            'David Brown', 'Lisa Davis', 'Tom Anderson', 'Emily Clark',
-            'Robert Miller', 'Amanda Taylor', 'Chris Moore', 'Jessica White'
-        ],
-        'Email': [
-            'john@abc.com', 'jane@xyz.com', 'mike@tech.com', 'sarah@global.com',
-            'david@startup.com', 'lisa@enterprise.com', 'tom@digital.com', 'emily@mfg.com',
-            'robert@retail.com', 'amanda@finance.com', 'chris@health.com', 'jessica@edu.com'
-        ],
-        'Deal Value': [
-            50000, 75000, 120000, 200000, 30000, 500000, 80000, 150000,
-            45000, 90000, 300000, 25000
-        ],
-        'Last Updated': [date.today() for _ in range(12)]
-    })
+# Funnel stages, their order and colors come from the registry stored with the clients
+STAGES = get_client_store().stages
+FUNNEL_STAGES = STAGES.names()
+STAGE_COLORS = STAGES.colors()
 
-def create_funnel_chart(df):
-    """Create funnel visualization with click interactions"""
-    stage_counts = df['Stage'].value_counts()
+def create_bulk_stage_editor(store, page_df, query):
+    """Grid with row selection that moves the selected clients in one batched write"""
+    grid = page_df[['Client Name', 'Contact Person', 'Email', 'Deal Value', 'Stage']].copy()
+    grid.insert(0, 'Select', False)
     
-    # Reorder according to funnel stages
-    ordered_counts = []
-    ordered_stages = []
-    colors = []
+    # Keyed on the data version and page so selections never carry over to other rows
+    edited = st.data_editor(
+        grid,
+        column_config={'Select': st.column_config.CheckboxColumn("Select", default=False)},
+        disabled=[column for column in grid.columns if column != 'Select'],
+        use_container_width=True,
+        key=f"bulk_grid_{store.version}_{page_df.index[0]}"
+    )
+    selected_ids = edited.index[edited['Select']].tolist()
+    versions = seen_row_versions(page_df.index)
     
-    for stage in FUNNEL_STAGES:
-        if stage in stage_counts.index:
-            ordered_counts.append(stage_counts[stage])
-            ordered_stages.append(stage)
-            colors.append(STAGE_COLORS[stage])
+    col1, col2, col3 = st.columns([2, 2, 1])
     
-    fig = go.Figure(go.Funnel(
-        y=ordered_stages,
-        x=ordered_counts,
-        textinfo="value+percent initial",
-        marker=dict(color=colors),
-        connector=dict(line=dict(color="royalblue", dash="solid", width=2))
-    ))
+    with col1:
+        target_stage = st.selectbox("Move selected to stage", FUNNEL_STAGES, key="bulk_target_stage")
     
-    fig.update_layout(
-        title="Pre-Sales Funnel Overview (Click on a section to view clients)",
-        height=600,
-        font=dict(size=12),
-        clickmode='event+select'
-    )
+    with col2:
+        apply_to_all = st.checkbox(f"Apply to all {query.total:,} matching clients", key="bulk_apply_all")
     
-    # Make the chart interactive by adding custom data
-    for i, stage in enumerate(ordered_stages):
-        fig.data[0].customdata = ordered_stages
-        
-    return fig
+    with col3:
+        if st.button("Move", key="bulk_move", type="primary"):
+            if apply_to_all:
+                selected_ids = query.ids()
+                # Clients outside the visible page were never seen, so only page rows are version checked
+            if selected_ids:
+                try:
+                    moved = store.apply_changes(
+                        moves={client_id: target_stage for client_id in selected_ids},
+                        expected_versions={client_id: versions[client_id] for client_id in selected_ids
+                                           if client_id in versions}
+                    )
+                except ConflictError as error:
+                    warn_conflict(error)
+                else:
+                    st.toast(f"Moved {moved} clients to {target_stage}")
+                st.rerun()
+            else:
+                st.warning("Select at least one client to move.")
 
-def create_deal_value_chart(df):
+@traced()
+def create_funnel_chart(stage_counts):
+    """Create funnel visualization"""
+    return dashboard_funnel_chart(stage_counts, FUNNEL_STAGES, STAGE_COLORS)
+
+@traced()
+def create_deal_value_chart(stage_values):
     """Create deal value by stage chart"""
-    stage_values = df.groupby('Stage')['Deal Value'].sum().reset_index()
-    
-    fig = px.bar(
-        stage_values, 
-        x='Stage', 
-        y='Deal Value',
-        color='Stage',
-        color_discrete_map=STAGE_COLORS,
-        title="Total Deal Value by Stage"
-    )
-    
-    fig.update_layout(
-        xaxis_tickangle=-45,
-        height=400,
-        showlegend=False
-    )
-    
-    fig.update_traces(texttemplate='$%{y:,.0f}', textposition='outside')
-    
-    return fig
+    return dashboard_deal_value_chart(stage_values, STAGE_COLORS)
 
 def main():
     st.title("🎯 Pre-Sales Funnel Dashboard")
+    startup.mark("first paint")
+    # Edits are checked against the rows the previous run drew; older rows are forgotten
+    forget_undrawn_versions()
     
     # Sidebar for navigation
     st.sidebar.title("Navigation")
@@ -138,101 +138,114 @@ def main():
                                ["Dashboard", "Client Management", "Analytics"],
                                index=["Dashboard", "Client Management", "Analytics"].index(st.session_state.page))
     
-    df = st.session_state.clients_data
+    store = get_client_store()
+    render_dimension_filters()
+    aggregates = get_pipeline_slice()
+    # Attach the event log before any mutation so every stage change is recorded
+    get_event_log()
+    
+    # Charts are rebuilt only when their data or the stage/color configuration changes
+    figure_cache = get_figure_cache()
+    chart_config = (FUNNEL_STAGES, STAGE_COLORS)
     
     if page == "Dashboard":
         st.header("Funnel Overview")
         
-        # Key metrics
-        col1, col2, col3, col4 = st.columns(4)
-        
-        with col1:
-            st.metric("Total Clients", len(df))
-        
-        with col2:
-            total_value = df['Deal Value'].sum()
-            st.metric("Total Pipeline Value", f"${total_value:,.0f}")
-        
-        with col3:
-            closed_won = len(df[df['Stage'] == 'Closed Won'])
-            st.metric("Closed Won", closed_won)
-        
-        with col4:
-            if len(df) > 0:
-                conversion_rate = (closed_won / len(df)) * 100
-                st.metric("Conversion Rate", f"{conversion_rate:.1f}%")
+        stage_counts = aggregates.counts()
+        with span("metrics_row"):
+            metrics = pipeline_metrics(aggregates)
+            
+            # Key metrics
+            col1, col2, col3, col4 = st.columns(4)
+            
+            with col1:
+                st.metric("Total Clients", metrics.total_clients)
+            
+            with col2:
+                st.metric("Total Pipeline Value", f"${metrics.total_value:,.0f}")
+            
+            with col3:
+                st.metric("Closed Won", metrics.closed_won)
+            
+            with col4:
+                if metrics.conversion_rate is not None:
+                    st.metric("Conversion Rate", f"{metrics.conversion_rate:.1f}%")
         
         # Charts
-        col1, col2 = st.columns([2, 1])
-        
-        with col1:
-            funnel_fig = create_funnel_chart(df)
-            
-            # Create clickable funnel chart
-            selected_stage = None
-            clicked = st.plotly_chart(funnel_fig, use_container_width=True, key='funnel_chart')
+        with span("funnel_chart"):
+            col1, col2 = st.columns([2, 1])
             
-            # Handle click events using session state
-            if "selected_stage" not in st.session_state:
-                st.session_state.selected_stage = None
+            with col1:
+                funnel_fig = figure_cache.get(create_funnel_chart, stage_counts, config=chart_config)
+                
+                # Create clickable funnel chart
+                selected_stage = None
+                clicked = st.plotly_chart(funnel_fig, use_container_width=True, key='funnel_chart')
                 
-            # Get click data
-            chart_data = st.session_state.get('plotly_click_data')
-            if chart_data:
-                clicked_stage = chart_data['points'][0]['y']
-                if st.session_state.selected_stage == clicked_stage:
-                    # Toggle off if same stage is clicked again
+                # Handle click events using session state
+                if "selected_stage" not in st.session_state:
                     st.session_state.selected_stage = None
-                else:
-                    st.session_state.selected_stage = clicked_stage
                     
-                # Force a rerun to refresh the filtered clients
-                st.rerun()
-        
-        with col2:
-            st.subheader("Stage Distribution")
-            stage_counts = df['Stage'].value_counts()
-            for stage, count in stage_counts.items():
-                st.write(f"**{stage}:** {count}")
+                # Get click data
+                chart_data = st.session_state.get('plotly_click_data')
+                if chart_data:
+                    clicked_stage = chart_data['points'][0]['y']
+                    if st.session_state.selected_stage == clicked_stage:
+                        # Toggle off if same stage is clicked again
+                        st.session_state.selected_stage = None
+                    else:
+                        st.session_state.selected_stage = clicked_stage
+                        
+                    # Force a rerun to refresh the filtered clients
+                    st.rerun()
+            
+            with col2:
+                st.subheader("Stage Distribution")
+                for stage, count in stage_counts.sort_values(ascending=False).items():
+                    st.write(f"**{stage}:** {count}")
                 
         # Display filtered clients if a stage is selected
-        if st.session_state.selected_stage:
-            st.subheader(f"Clients in {st.session_state.selected_stage} Stage")
-            
-            filtered_clients = df[df['Stage'] == st.session_state.selected_stage]
-            
-            if not filtered_clients.empty:
-                for idx, row in filtered_clients.iterrows():
-                    with st.container():
-                        col1, col2, col3 = st.columns([2, 2, 1])
-                        
-                        with col1:
-                            st.write(f"**{row['Client Name']}**")
-                            st.write(f"Contact: {row['Contact Person']}")
-                        
-                        with col2:
-                            st.write(f"Email: {row['Email']}")
-                            st.write(f"Value: ${row['Deal Value']:,.0f}")
-                        
-                        with col3:
-                            if st.button("View Details", key=f"view_{idx}"):
-                                # Set session state to navigate to client management
-                                st.session_state.page = "Client Management"
-                                st.session_state.client_filter = row['Client Name']
-                                st.rerun()
-                        
-                        st.divider()
-            else:
-                st.info("No clients in this stage.")
+        with span("stage_clients"):
+            if st.session_state.selected_stage:
+                st.subheader(f"Clients in {st.session_state.selected_stage} Stage")
                 
-            # Add a button to clear selection
-            if st.button("Clear Selection"):
-                st.session_state.selected_stage = None
-                st.rerun()
+                stage_ids = get_stage_index().ids(st.session_state.selected_stage)
+                offset, limit = create_pagination_controls(len(stage_ids), "dashboard_stage")
+                filtered_clients = store.fetch_clients_by_ids(stage_ids[offset:offset + limit], stage_order=FUNNEL_STAGES)
+                
+                if not filtered_clients.empty:
+                    for idx, row in filtered_clients.iterrows():
+                        with st.container():
+                            col1, col2, col3 = st.columns([2, 2, 1])
+                            
+                            with col1:
+                                st.write(f"**{row['Client Name']}**")
+                                st.write(f"Contact: {row['Contact Person']}")
+                            
+                            with col2:
+                                st.write(f"Email: {row['Email']}")
+                                st.write(f"Value: ${row['Deal Value']:,.0f}")
+                            
+                            with col3:
+                                if st.button("View Details", key=f"view_{idx}"):
+                                    # Set session state to navigate to client management
+                                    st.session_state.page = "Client Management"
+                                    st.session_state.client_filter = row['Client Name']
+                                    st.rerun()
+                            
+                            st.divider()
+                else:
+                    st.info("No clients in this stage.")
+                    
+                # Add a button to clear selection
+                if st.button("Clear Selection"):
+                    st.session_state.selected_stage = None
+                    st.rerun()
         
         # Deal value chart
-        deal_fig = create_deal_value_chart(df)
-        st.plotly_chart(deal_fig, use_container_width=True)
+        with span("deal_value_chart"):
+            deal_fig = figure_cache.get(create_deal_value_chart, aggregates.values(), config=chart_config)
+            st.plotly_chart(deal_fig, use_container_width=True)
     
     elif page == "Client Management":
         st.header("Client Management")
@@ -251,20 +264,56 @@ def main():
                     new_stage = st.selectbox("Stage", FUNNEL_STAGES)
                     new_value = st.number_input("Deal Value ($)", min_value=0, value=0)
                 
+                col3, col4, col5 = st.columns(3)
+                with col3:
+                    new_owner = st.text_input("Owner")
+                with col4:
+                    new_region = st.text_input("Region")
+                with col5:
+                    new_segment = st.text_input("Segment")
+                
                 if st.form_submit_button("Add Client"):
                     if new_client and new_contact:
-                        new_row = pd.DataFrame({
-                            'Client Name': [new_client],
-                            'Stage': [new_stage],
-                            'Contact Person': [new_contact],
-                            'Email': [new_email],
-                            'Deal Value': [new_value],
-                            'Last Updated': [date.today()]
-                        })
-                        st.session_state.clients_data = pd.concat([df, new_row], ignore_index=True)
+                        store.add_client(new_client, new_stage, new_contact, new_email, new_value,
+                                         owner=new_owner.strip(), region=new_region.strip(),
+                                         segment=new_segment.strip())
                         st.success("Client added successfully!")
                         st.rerun()
         
+        # Bulk import from a file
+        with st.expander("Bulk Import Clients"):
+            st.caption("CSV, Parquet or Excel file with Client Name, Stage, Contact Person and Deal Value "
+                       "columns, plus optional Email, Last Updated, Owner, Region, Segment and Quarter.")
+            uploaded_file = st.file_uploader("Client file", type=["csv", "parquet", "xlsx", "xls"],
+                                             key="bulk_import_file")
+            
+            if uploaded_file is not None and st.button("Import Clients", key="bulk_import"):
+                try:
+                    st.session_state.import_result = import_clients(store, uploaded_file, FUNNEL_STAGES)
+                except (ValueError, ImportError) as error:
+                    st.error(f"Import failed: {error}")
+            
+            result = st.session_state.get("import_result")
+            if result is not None:
+                st.success(f"Imported {result.imported:,} clients.")
+                if result.rejected:
+                    st.warning(f"{result.rejected:,} rows were rejected.")
+                    st.dataframe(result.errors.head(1000), use_container_width=True)
+                    st.download_button(
+                        label="Download error report",
+                        data=result.errors.to_csv(index=False),
+                        file_name="import_errors.csv",
+                        mime="text/csv"
+                    )
+        
+        # Likely duplicates, merged into one client
+        with st.expander("🧬 Duplicate Clients"):
+            render_duplicates()
+        
+        # Pull changed accounts from the CRM
+        with st.expander("🔄 CRM Sync"):
+            render_crm_sync()
+        
         # Filter clients
         st.subheader("Client List")
         
@@ -284,61 +333,77 @@ def main():
             if "client_filter" in st.session_state and st.session_state.client_filter:
                 search_term = st.text_input("Search clients", 
                                            value=st.session_state.client_filter,
-                                           placeholder="Enter client name...")
+                                           placeholder="Enter client name, contact or email...")
                 # Clear the client filter after using it once
                 st.session_state.client_filter = None
             else:
                 search_term = st.text_input("Search clients", 
-                                           placeholder="Enter client name...")
+                                           placeholder="Enter client name, contact or email...")
         
-        # Apply filters
-        filtered_df = df[df['Stage'].isin(stage_filter)]
-        if search_term:
-            filtered_df = filtered_df[filtered_df['Client Name'].str.contains(search_term, case=False, na=False)]
+        # Apply filters, fetching only the visible page; searches go through the search index
+        query = ClientQuery(store, stage_filter, search_term,
+                            stage_index=get_stage_index(), search_index=get_search_index())
+        offset, limit = create_pagination_controls(query.total, "client_list")
+        filtered_df = query.page(offset, limit, stage_order=FUNNEL_STAGES)
         
-        # Display and edit clients
-        if not filtered_df.empty:
-            for idx, row in filtered_df.iterrows():
-                with st.container():
-                    col1, col2, col3, col4, col5 = st.columns([2, 2, 2, 2, 1])
-                    
-                    with col1:
-                        st.write(f"**{row['Client Name']}**")
-                        st.write(f"Contact: {row['Contact Person']}")
-                    
-                    with col2:
-                        st.write(f"Email: {row['Email']}")
-                        st.write(f"Value: ${row['Deal Value']:,.0f}")
-                    
-                    with col3:
-                        current_stage = row['Stage']
-                        stage_color = STAGE_COLORS.get(current_stage, "#000000")
-                        st.markdown(f"<span style='color: {stage_color}; font-weight: bold;'>●</span> {current_stage}", 
-                                  unsafe_allow_html=True)
-                    
-                    with col4:
-                        new_stage = st.selectbox(
-                            "Change Stage", 
-                            FUNNEL_STAGES, 
-                            index=FUNNEL_STAGES.index(current_stage),
-                            key=f"stage_{idx}"
-                        )
-                    
-                    with col5:
-                        if st.button("Update", key=f"update_{idx}"):
-                            st.session_state.clients_data.loc[idx, 'Stage'] = new_stage
-                            st.session_state.clients_data.loc[idx, 'Last Updated'] = date.today()
-                            st.success(f"Updated {row['Client Name']}")
-                            st.rerun()
+        bulk_edit = st.toggle("Bulk edit", key="bulk_edit_mode",
+                              help="Select many clients and move them to a stage in one update")
+        
+        with span("client_list_rows"):
+            # Display and edit clients
+            if not filtered_df.empty and bulk_edit:
+                create_bulk_stage_editor(store, filtered_df, query)
+            elif not filtered_df.empty:
+                versions = seen_row_versions(filtered_df.index)
+                for idx, row in filtered_df.iterrows():
+                    with st.container():
+                        col1, col2, col3, col4, col5 = st.columns([2, 2, 2, 2, 1])
                         
-                        if st.button("Delete", key=f"delete_{idx}"):
-                            st.session_state.clients_data = st.session_state.clients_data.drop(idx).reset_index(drop=True)
-                            st.success(f"Deleted {row['Client Name']}")
-                            st.rerun()
-                
-                st.divider()
-        else:
-            st.info("No clients found matching the criteria.")
+                        with col1:
+                            st.write(f"**{row['Client Name']}**")
+                            st.write(f"Contact: {row['Contact Person']}")
+                        
+                        with col2:
+                            st.write(f"Email: {row['Email']}")
+                            st.write(f"Value: ${row['Deal Value']:,.0f}")
+                        
+                        with col3:
+                            current_stage = row['Stage']
+                            stage_color = STAGE_COLORS.get(current_stage, "#000000")
+                            st.markdown(f"<span style='color: {stage_color}; font-weight: bold;'>●</span> {current_stage}", 
+                                      unsafe_allow_html=True)
+                        
+                        with col4:
+                            new_stage = st.selectbox(
+                                "Change Stage", 
+                                FUNNEL_STAGES, 
+                                index=STAGES.index(current_stage),
+                                key=f"stage_{idx}"
+                            )
+                        
+                        with col5:
+                            if st.button("Update", key=f"update_{idx}"):
+                                try:
+                                    store.apply_changes(moves={idx: new_stage},
+                                                        expected_versions={idx: versions.get(idx)})
+                                except ConflictError as error:
+                                    warn_conflict(error)
+                                else:
+                                    st.success(f"Updated {row['Client Name']}")
+                                st.rerun()
+                            
+                            if st.button("Delete", key=f"delete_{idx}"):
+                                try:
+                                    store.apply_changes(deletes=[idx], expected_versions={idx: versions.get(idx)})
+                                except ConflictError as error:
+                                    warn_conflict(error)
+                                else:
+                                    st.success(f"Deleted {row['Client Name']}")
+                                st.rerun()
+                    
+                    st.divider()
+            else:
+                st.info("No clients found matching the criteria.")
     
     elif page == "Analytics":
         st.header("Analytics & Insights")
@@ -346,67 +411,101 @@ def main():
         # Stage progression analysis
         st.subheader("Pipeline Health")
         
-        col1, col2 = st.columns(2)
-        
-        with col1:
-            # Average deal value by stage
-            avg_deal_by_stage = df.groupby('Stage')['Deal Value'].mean().reset_index()
-            fig = px.bar(
-                avg_deal_by_stage,
-                x='Stage',
-                y='Deal Value',
-                title="Average Deal Value by Stage",
-                color='Stage',
-                color_discrete_map=STAGE_COLORS
-            )
-            fig.update_layout(xaxis_tickangle=-45, showlegend=False)
-            st.plotly_chart(fig, use_container_width=True)
+        stats_df = aggregates.summary(FUNNEL_STAGES).reset_index()
+        # Charts and conversion are rebuilt on worker threads when the data or stages change
+        data_version = (store.version, STAGES.version)
+        waiting = []
         
-        with col2:
-            # Client distribution pie chart
-            fig = px.pie(
-                df, 
-                names='Stage', 
-                title="Client Distribution by Stage",
-                color='Stage',
-                color_discrete_map=STAGE_COLORS
+        with span("analytics_charts"):
+            colors = dict(STAGE_COLORS)
+            charts = background(
+                ("analytics_charts", slice_key()), data_version,
+                lambda: (average_deal_chart(stats_df, colors), stage_distribution_chart(stats_df, colors)),
+                waiting
             )
-            st.plotly_chart(fig, use_container_width=True)
+            if charts.value is not None:
+                col1, col2 = st.columns(2)
+                
+                with col1:
+                    # Average deal value by stage
+                    st.plotly_chart(charts.value[0], use_container_width=True)
+                
+                with col2:
+                    # Client distribution pie chart
+                    st.plotly_chart(charts.value[1], use_container_width=True)
+            show_refresh_state(charts, "charts")
         
         # Detailed statistics
         st.subheader("Detailed Statistics")
         
-        stats_df = df.groupby('Stage').agg({
-            'Client Name': 'count',
-            'Deal Value': ['sum', 'mean', 'max', 'min']
-        }).round(2)
+        st.dataframe(stats_df.round(2), use_container_width=True)
+        
+        # Stage by dimension breakdown, read from the cube
+        with span("dimension_breakdown"):
+            st.subheader("Breakdown by Owner, Region, Segment or Quarter")
+            dimension = st.selectbox("Break down by", DIMENSIONS, format_func=COLUMNS.get, key="breakdown_dimension")
+            breakdown = get_pipeline_cube().breakdown(dimension, dimension_filters())
+            if breakdown.empty:
+                st.info("No clients match the current slice.")
+            else:
+                table = breakdown.pivot_table(index='Stage', columns=COLUMNS[dimension], values='Client Count',
+                                              aggfunc='sum', fill_value=0)
+                table = table.rename(columns={'': "Unassigned"})
+                table = table.reindex([stage for stage in FUNNEL_STAGES if stage in table.index])
+                st.dataframe(table, use_container_width=True)
         
-        stats_df.columns = ['Client Count', 'Total Value', 'Avg Value', 'Max Value', 'Min Value']
-        stats_df = stats_df.reset_index()
+        # Conversion and velocity from the stage transition history
+        st.subheader("Stage Conversion & Time in Stage")
         
-        st.dataframe(stats_df, use_container_width=True)
+        with span("conversion_table"):
+            analytics, stages = get_funnel_analytics(), list(FUNNEL_STAGES)
+            conversion = background(("conversion", tuple(stages)), data_version,
+                                    lambda: analytics.stage_conversion(stages), waiting)
+            conversion_df = conversion.value
+            show_refresh_state(conversion, "conversion")
+            if conversion_df is not None and conversion_df.empty:
+                st.info("No stage transitions recorded yet.")
+            elif conversion_df is not None:
+                # The result is shared with other sessions, so scale a copy
+                conversion_df = conversion_df.copy()
+                conversion_df[['Conversion Rate', 'Drop-off Rate']] *= 100
+                st.dataframe(
+                    conversion_df,
+                    column_config={
+                        'Conversion Rate': st.column_config.NumberColumn(format="%.1f%%"),
+                        'Drop-off Rate': st.column_config.NumberColumn(format="%.1f%%"),
+                        'Median Days': st.column_config.NumberColumn(format="%.1f"),
+                        'P90 Days': st.column_config.NumberColumn(format="%.1f"),
+                    },
+                    hide_index=True,
+                    use_container_width=True
+                )
+                st.caption("Conversion counts clients who later reached a further stage; "
+                           "time in stage covers completed stays only.")
         
-        # Export functionality
+        # Export functionality, streamed in chunks and only generated when a download is clicked
         st.subheader("Export Data")
         col1, col2 = st.columns(2)
         
         with col1:
-            csv = df.to_csv(index=False)
-            st.download_button(
-                label="Download as CSV",
-                data=csv,
-                file_name=f"clients_data_{date.today()}.csv",
-                mime="text/csv"
-            )
+            export_format = st.selectbox("Export format", available_formats(), key="export_format")
         
         with col2:
-            json_data = df.to_json(orient='records', date_format='iso')
+            extension, mime = EXPORT_FORMATS[export_format]
             st.download_button(
-                label="Download as JSON",
-                data=json_data,
-                file_name=f"clients_data_{date.today()}.json",
-                mime="application/json"
+                label=f"Download as {export_format}",
+                data=lambda: export_clients(store, export_format),
+                file_name=f"clients_data_{date.today()}.{extension}",
+                mime=mime
             )
+        
+        if waiting:
+            poll_background_results(waiting)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    with span("rerun"):
+        main()
+    report_startup(startup)
+    render_debug_panel()
+    if METRICS_FILE:
+        get_span_metrics().write_prometheus(METRICS_FILE)
\ No newline at end of file
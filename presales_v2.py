@@ -1,52 +1,40 @@
+import time
+
+# Taken before the other imports so cold-start mode can report what they cost
+RUN_START = time.perf_counter()
+
 import streamlit as st
+from streamlit.errors import StreamlitAPIException
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-from datetime import datetime, date
-import json
+from datetime import date
+import contextlib
+import functools
+import os
+
+from client_store import COLUMNS, DIMENSIONS, ConflictError
+from session_overlay import SessionOverlay
+from exports import EXPORT_FORMATS, available_formats, export_clients
+from client_import import import_clients
+from change_feed import ChangeFeed
+from funnel_core import (
+    ClientQuery, StartupTimer, average_deal_chart, dashboard_deal_value_chart, dashboard_funnel_chart,
+    pipeline_metrics, stage_distribution_chart,
+)
+from funnel_ui import (
+    METRICS_FILE, background, configure, create_pagination_controls, dimension_filters, forget_undrawn_versions,
+    get_client_store, get_event_log, get_figure_cache, get_funnel_analytics, get_pipeline_cube, get_pipeline_slice,
+    get_search_index, get_span_metrics, get_stage_aggregates, get_stage_index, poll_background_results,
+    render_crm_sync, render_debug_panel, render_dimension_filters, render_duplicates, report_startup,
+    seen_row_versions, show_refresh_state, slice_key, span, traced, warn_conflict,
+)
+
+startup = StartupTimer(RUN_START)
+startup.mark("imports")
 
 # Set page config
 st.set_page_config(page_title="Pre-Sales Funnel Dashboard", layout="wide")
 
-# Define funnel stages
-DEFAULT_FUNNEL_STAGES = [
-    "Research",
-    "Initial Contact", 
-    "First Presentation",
-    "Interested",
-    "Multiple Presentations",
-    "Order Stage",
-    "Negotiation",
-    "Closed Won",
-    "Closed Lost"
-]
-
-# Initialize custom stages in session state
-if 'custom_stages' not in st.session_state:
-    st.session_state.custom_stages = [
-        "Government Approval",
-        "Legal Review",
-        "Compliance Check",
-        "Budget Approval"
-    ]
-
-# Combine default and custom stages
-FUNNEL_STAGES = DEFAULT_FUNNEL_STAGES + st.session_state.custom_stages
-
-# Color mapping for stages
-DEFAULT_STAGE_COLORS = {
-    "Research": "#FF6B6B",
-    "Initial Contact": "#4ECDC4", 
-    "First Presentation": "#45B7D1",
-    "Interested": "#96CEB4",
-    "Multiple Presentations": "#FFEAA7",
-    "Order Stage": "#DDA0DD",
-    "Negotiation": "#98D8C8",
-    "Closed Won": "#6BCF7F",
-    "Closed Lost": "#FF7675"
-}
-
-# Custom stage colors
+# Custom stages registered with a new client store; more can be added from Client Management
 CUSTOM_STAGE_COLORS = {
     "Government Approval": "#FF8C42",
     "Legal Review": "#6C5CE7",
@@ -54,59 +42,61 @@ CUSTOM_STAGE_COLORS = {
     "Budget Approval": "#FD79A8"
 }
 
-# Generate colors for any additional custom stages
+# Sample data used to seed an empty client store
+SAMPLE_CLIENTS = pd.DataFrame({
+    'Client Name': [
+        'ABC Corp', 'XYZ Ltd', 'Tech Innovations', 'Global Solutions',
+        'StartUp Inc', 'Enterprise Co', 'Digital Agency', 'Manufacturing Ltd',
+        'Retail Chain', 'Finance Group', 'Healthcare Systems', 'Education Board',
+        'Alpha Industries', 'Beta Solutions', 'Gamma Corp'
+    ],
+    'Stage': [
+        'Research', 'Initial Contact', 'First Presentation', 'Interested',
+        'Multiple Presentations', 'Order Stage', 'Negotiation', 'Closed Won',
+        'Research', 'First Presentation', 'Interested', 'Closed Lost',
+        'Initial Contact', 'Multiple Presentations', 'Order Stage'
+    ],
+    'Contact Person': [
+        'John Doe', 'Jane Smith', 'Mike Johnson', 'Sarah Wilson',
+        'David Brown', 'Lisa Davis', 'Tom Anderson', 'Emily Clark',
+        'Robert Miller', 'Amanda Taylor', 'Chris Moore', 'Jessica White',
+        'Mark Thompson', 'Rachel Green', 'Steve Rogers'
+    ],
+    'Email': [
+        'john@abc.com', 'jane@xyz.com', 'mike@tech.com', 'sarah@global.com',
+        'david@startup.com', 'lisa@enterprise.com', 'tom@digital.com', 'emily@mfg.com',
+        'robert@retail.com', 'amanda@finance.com', 'chris@health.com', 'jessica@edu.com',
+        'mark@alpha.com', 'rachel@beta.com', 'steve@gamma.com'
+    ],
+    'Deal Value': [
+        50000, 75000, 120000, 200000, 30000, 500000, 80000, 150000,
+        45000, 90000, 300000, 25000, 60000, 180000, 350000
+    ],
+    'Last Updated': [date.today() for _ in range(15)]
+})
+
+# Client data lives in a local SQLite file shared by every session
+CLIENT_DB_PATH = os.environ.get("FUNNEL_DB_PATH", "presales_v2.db")
+# Seconds between checks of the change feed for edits made in other sessions
+LIVE_UPDATE_INTERVAL = 5
+
+configure(CLIENT_DB_PATH, SAMPLE_CLIENTS, CUSTOM_STAGE_COLORS)
+
+# Stage order, codes and colors come from the registry stored with the clients, so custom
+# stages persist and are shared by every session
+STAGES = get_client_store().stages
+FUNNEL_STAGES = STAGES.names()
+STAGE_COLORS = STAGES.colors()
+
 def get_stage_color(stage):
-    if stage in DEFAULT_STAGE_COLORS:
-        return DEFAULT_STAGE_COLORS[stage]
-    elif stage in CUSTOM_STAGE_COLORS:
-        return CUSTOM_STAGE_COLORS[stage]
-    else:
-        # Generate a color based on stage name hash
-        import hashlib
-        hash_object = hashlib.md5(stage.encode())
-        hex_dig = hash_object.hexdigest()
-        return f"#{hex_dig[:6]}"
-
-STAGE_COLORS = {**DEFAULT_STAGE_COLORS, **CUSTOM_STAGE_COLORS}
-# Add colors for any additional custom stages
-for stage in st.session_state.custom_stages:
-    if stage not in STAGE_COLORS:
-        STAGE_COLORS[stage] = get_stage_color(stage)
-
-# Initialize session state
-if 'clients_data' not in st.session_state:
-    # Sample data
-    st.session_state.clients_data = pd.DataFrame({
-        'Client Name': [
-            'ABC Corp', 'XYZ Ltd', 'Tech Innovations', 'Global Solutions',
-            'StartUp Inc', 'Enterprise Co', 'Digital Agency', 'Manufacturing Ltd',
-            'Retail Chain', 'Finance Group', 'Healthcare Systems', 'Education Board',
-            'Alpha Industries', 'Beta Solutions', 'Gamma Corp'
-        ],
-        'Stage': [
-            'Research', 'Initial Contact', 'First Presentation', 'Interested',
-            'Multiple Presentations', 'Order Stage', 'Negotiation', 'Closed Won',
-            'Research', 'First Presentation', 'Interested', 'Closed Lost',
-            'Initial Contact', 'Multiple Presentations', 'Order Stage'
-        ],
-        'Contact Person': [
-            'John Doe', 'Jane Smith', 'Mike Johnson', 'Sarah Wilson',
-            'David Brown', 'Lisa Davis', 'Tom Anderson', 'Emily Clark',
-            'Robert Miller', 'Amanda Taylor', 'Chris Moore', 'Jessica White',
-            'Mark Thompson', 'Rachel Green', 'Steve Rogers'
-        ],
-        'Email': [
-            'john@abc.com', 'jane@xyz.com', 'mike@tech.com', 'sarah@global.com',
-            'david@startup.com', 'lisa@enterprise.com', 'tom@digital.com', 'emily@mfg.com',
-            'robert@retail.com', 'amanda@finance.com', 'chris@health.com', 'jessica@edu.com',
-            'mark@alpha.com', 'rachel@beta.com', 'steve@gamma.com'
-        ],
-        'Deal Value': [
-            50000, 75000, 120000, 200000, 30000, 500000, 80000, 150000,
-            45000, 90000, 300000, 25000, 60000, 180000, 350000
-        ],
-        'Last Updated': [date.today() for _ in range(15)]
-    })
+    return STAGES.color(stage)
+
+@st.cache_resource
+def get_change_feed():
+    """Feed of client deltas published by every session's edits"""
+    change_feed = ChangeFeed()
+    change_feed.attach(get_client_store())
+    return change_feed
 
 if 'selected_stage' not in st.session_state:
     st.session_state.selected_stage = None
@@ -114,6 +104,90 @@ if 'selected_stage' not in st.session_state:
 if 'current_page' not in st.session_state:
     st.session_state.current_page = "Dashboard"
 
+def timed_fragment(func):
+    """Run the decorated function as an independently rerunnable fragment, timing each run as a span"""
+    @functools.wraps(func)
+    def run(*args, **kwargs):
+        with span(func.__name__):
+            result = func(*args, **kwargs)
+        if st.session_state.get("debug_timings"):
+            st.caption(f"⏱ {func.__name__}: {st.session_state.span_timings[func.__name__]:.1f} ms")
+        return result
+    return st.fragment(run)
+
+def rerun_fragment():
+    """Rerun only the current fragment, or the whole app when not inside a fragment rerun"""
+    try:
+        st.rerun(scope="fragment")
+    except StreamlitAPIException:
+        st.rerun()
+
+def get_session_overlay():
+    """This session's unsaved edits over the shared client store"""
+    return st.session_state.setdefault("overlay", SessionOverlay())
+
+@contextlib.contextmanager
+def own_writes():
+    """Mark the feed deltas of the writes made in the block as this session's own"""
+    with get_change_feed().recording() as recorded:
+        yield
+    st.session_state.setdefault("own_deltas", set()).update(recorded)
+
+def move_clients(client_ids, stage, versions=None):
+    """Move clients to a stage, keeping the edit in the session overlay while draft mode is on"""
+    if st.session_state.get("draft_mode"):
+        get_session_overlay().move(client_ids, stage, versions)
+        return len(client_ids)
+    try:
+        with own_writes():
+            return get_client_store().apply_changes(
+                moves={client_id: stage for client_id in client_ids},
+                expected_versions={client_id: versions[client_id] for client_id in client_ids
+                                   if client_id in versions} if versions else None
+            )
+    except ConflictError as error:
+        warn_conflict(error)
+        return 0
+
+def remove_client(client_id, version=None):
+    """Delete a client, keeping the edit in the session overlay while draft mode is on"""
+    if st.session_state.get("draft_mode"):
+        get_session_overlay().delete(client_id, version)
+        return True
+    try:
+        with own_writes():
+            return bool(get_client_store().apply_changes(
+                deletes=[client_id], expected_versions={client_id: version} if version is not None else None
+            ))
+    except ConflictError as error:
+        warn_conflict(error)
+        return False
+
+@st.fragment(run_every=LIVE_UPDATE_INTERVAL)
+def watch_change_feed():
+    """Rerun the page when other sessions have changed clients since it was last drawn"""
+    deltas = get_change_feed().since(st.session_state.get("feed_cursor", 0))
+    if deltas:
+        # This session's own writes were redrawn by the fragment that made them
+        own = st.session_state.setdefault("own_deltas", set())
+        theirs = [delta for delta in deltas if delta.seq not in own]
+        own.difference_update(delta.seq for delta in deltas)
+        if not theirs:
+            st.session_state.feed_cursor = deltas[-1].seq
+        deltas = theirs
+    if deltas is None or deltas:
+        pending = get_session_overlay()
+        if deltas and any(pending.is_pending(delta.client_id) for delta in deltas):
+            st.toast("⚠️ Clients in your draft were changed by someone else")
+        st.rerun()
+    st.caption(f"🟢 Live · change #{st.session_state.get('feed_cursor', 0)}")
+
+def rerun_after_edit():
+    """Draft edits rerun the whole page so the sidebar's pending count stays current"""
+    if st.session_state.get("draft_mode"):
+        st.rerun()
+    rerun_fragment()
+
 def create_stage_selector_with_custom(key_suffix="", current_stage=None):
     """Create a stage selector with custom stage option"""
     col1, col2 = st.columns([2, 1])
@@ -122,8 +196,8 @@ def create_stage_selector_with_custom(key_suffix="", current_stage=None):
         # Add "Add Custom Stage" option to the list
         stage_options = FUNNEL_STAGES + ["➕ Add Custom Stage"]
         
-        if current_stage and current_stage in FUNNEL_STAGES:
-            default_index = FUNNEL_STAGES.index(current_stage)
+        if current_stage and current_stage in STAGE_COLORS:
+            default_index = STAGES.index(current_stage)
         else:
             default_index = 0
             
@@ -144,9 +218,8 @@ def create_stage_selector_with_custom(key_suffix="", current_stage=None):
             )
             
             if custom_stage and st.button(f"Add '{custom_stage}'", key=f"add_custom_{key_suffix}"):
-                if custom_stage not in st.session_state.custom_stages:
-                    st.session_state.custom_stages.append(custom_stage)
-                    STAGE_COLORS[custom_stage] = get_stage_color(custom_stage)
+                if custom_stage not in STAGE_COLORS:
+                    STAGES.ensure(custom_stage)
                     st.success(f"Added new stage: {custom_stage}")
                     st.rerun()
                 else:
@@ -157,41 +230,51 @@ def create_stage_selector_with_custom(key_suffix="", current_stage=None):
     else:
         return selected_option
 
-def create_interactive_funnel_chart(df):
-    """Create interactive funnel visualization"""
-    stage_counts = df['Stage'].value_counts()
-    
-    # Reorder according to funnel stages
-    ordered_counts = []
-    ordered_stages = []
-    colors = []
-    
-    for stage in FUNNEL_STAGES:
-        count = stage_counts.get(stage, 0)
-        ordered_counts.append(count)
-        ordered_stages.append(f"{stage}<br>({count} clients)")
-        colors.append(STAGE_COLORS[stage])
-    
-    fig = go.Figure(go.Funnel(
-        y=ordered_stages,
-        x=ordered_counts,
-        textinfo="value+percent initial",
-        marker=dict(color=colors),
-        connector=dict(line=dict(color="royalblue", dash="solid", width=2)),
-        hovertemplate="<b>%{y}</b><br>Click to view clients<extra></extra>"
-    ))
-    
-    fig.update_layout(
-        title="Pre-Sales Funnel Overview (Click on any stage to view clients)",
-        height=600,
-        font=dict(size=12)
+def create_bulk_stage_editor(page_df, query):
+    """Grid with row selection that moves the selected clients in one batched write"""
+    grid = page_df[['Client Name', 'Contact Person', 'Email', 'Deal Value', 'Stage']].copy()
+    grid.insert(0, 'Select', False)
+    
+    # Keyed on the page's clients so a selection survives data changes but never carries over to other rows
+    edited = st.data_editor(
+        grid,
+        column_config={'Select': st.column_config.CheckboxColumn("Select", default=False)},
+        disabled=[column for column in grid.columns if column != 'Select'],
+        use_container_width=True,
+        key=f"bulk_grid_{hash(tuple(page_df.index))}"
     )
+    selected_ids = edited.index[edited['Select']].tolist()
+    versions = seen_row_versions(page_df.index)
+    
+    col1, col2, col3 = st.columns([2, 2, 1])
+    
+    with col1:
+        target_stage = st.selectbox("Move selected to stage", FUNNEL_STAGES, key="bulk_target_stage")
     
-    return fig
+    with col2:
+        apply_to_all = st.checkbox(f"Apply to all {query.total:,} matching clients", key="bulk_apply_all")
+    
+    with col3:
+        if st.button("Move", key="bulk_move", type="primary"):
+            if apply_to_all:
+                selected_ids = query.ids()
+                # Clients outside the visible page were never seen, so only page rows are version checked
+            if selected_ids:
+                moved = move_clients(selected_ids, target_stage, versions)
+                st.toast(f"Moved {moved} clients to {target_stage}")
+                rerun_after_edit()
+            else:
+                st.warning("Select at least one client to move.")
 
-def create_stage_cards(df):
+@traced()
+def create_funnel_chart(stage_counts):
+    """Create interactive funnel visualization"""
+    return dashboard_funnel_chart(stage_counts, FUNNEL_STAGES, STAGE_COLORS, clickable=True)
+
+@timed_fragment
+def create_stage_cards():
     """Create clickable stage cards"""
-    stage_counts = df['Stage'].value_counts()
+    stage_counts = get_stage_aggregates().counts()
     
     st.markdown("### 🎯 Quick Stage Navigation")
     st.markdown("Click on any stage below to view clients in that stage:")
@@ -221,59 +304,52 @@ def create_stage_cards(df):
                     unsafe_allow_html=True
                 )
 
-def create_deal_value_chart(df):
+@traced()
+def create_deal_value_chart(stage_values):
     """Create deal value by stage chart"""
-    stage_values = df.groupby('Stage')['Deal Value'].sum().reset_index()
-    
-    fig = px.bar(
-        stage_values, 
-        x='Stage', 
-        y='Deal Value',
-        color='Stage',
-        color_discrete_map=STAGE_COLORS,
-        title="Total Deal Value by Stage (Click bars to view clients)"
-    )
-    
-    fig.update_layout(
-        xaxis_tickangle=-45,
-        height=400,
-        showlegend=False
-    )
-    
-    fig.update_traces(
-        texttemplate='$%{y:,.0f}', 
-        textposition='outside',
-        hovertemplate="<b>%{x}</b><br>Total Value: $%{y:,.0f}<br>Click to view clients<extra></extra>"
-    )
-    
-    return fig
+    return dashboard_deal_value_chart(stage_values, STAGE_COLORS, clickable=True)
 
-def display_stage_clients(df, stage):
+@timed_fragment
+def display_stage_clients(stage):
     """Display clients for a specific stage"""
-    stage_clients = df[df['Stage'] == stage]
+    store = get_client_store()
+    aggregates = get_stage_aggregates()
+    stage_ids = get_stage_index().ids(stage)
+    summary = aggregates.summary()
+    if stage in summary.index:
+        stage_stats = summary.loc[stage]
+    else:
+        stage_stats = pd.Series({'Client Count': 0, 'Total Value': 0})
     
     st.markdown(f"## 📋 Clients in: {stage}")
-    st.markdown(f"**{len(stage_clients)} clients** • **Total Value: ${stage_clients['Deal Value'].sum():,.0f}**")
+    st.markdown(f"**{int(stage_stats['Client Count'])} clients** • **Total Value: ${stage_stats['Total Value']:,.0f}**")
     
     if st.button("← Back to Dashboard", key="back_to_dashboard"):
         st.session_state.current_page = "Dashboard"
         st.session_state.selected_stage = None
         st.rerun()
     
-    if not stage_clients.empty:
+    if stage_ids:
         # Quick stats for this stage
         col1, col2, col3, col4 = st.columns(4)
         with col1:
-            st.metric("Clients", len(stage_clients))
+            st.metric("Clients", int(stage_stats['Client Count']))
         with col2:
-            st.metric("Total Value", f"${stage_clients['Deal Value'].sum():,.0f}")
+            st.metric("Total Value", f"${stage_stats['Total Value']:,.0f}")
         with col3:
-            st.metric("Avg Deal Size", f"${stage_clients['Deal Value'].mean():,.0f}")
+            st.metric("Avg Deal Size", f"${stage_stats['Avg Value']:,.0f}")
         with col4:
-            st.metric("Largest Deal", f"${stage_clients['Deal Value'].max():,.0f}")
+            st.metric("Largest Deal", f"${stage_stats['Max Value']:,.0f}")
         
         st.markdown("---")
         
+        offset, limit = create_pagination_controls(len(stage_ids), f"stage_view_{stage}")
+        stage_clients = get_session_overlay().apply(
+            store.fetch_clients_by_ids(stage_ids[offset:offset + limit], stage_order=FUNNEL_STAGES)
+        )
+        
+        versions = seen_row_versions(stage_clients.index)
+        
         # Display clients with edit capabilities
         for idx, row in stage_clients.iterrows():
             with st.container():
@@ -292,7 +368,9 @@ def display_stage_clients(df, stage):
                     stage_color = STAGE_COLORS.get(current_stage, "#000000")
                     st.markdown(f"<span style='color: {stage_color}; font-weight: bold; font-size: 16px;'>●</span> {current_stage}", 
                               unsafe_allow_html=True)
-                    st.write(f"Updated: {row['Last Updated']}")
+                    st.write(f"Updated: {row['Last Updated']:%Y-%m-%d}")
+                    if get_session_overlay().is_pending(idx):
+                        st.caption("✏️ Unsaved")
                 
                 with col4:
                     st.write("**Move to Stage:**")
@@ -301,18 +379,16 @@ def display_stage_clients(df, stage):
                         new_stage = current_stage  # Keep current stage if no selection made
                 
                 with col5:
+                    # Row actions only rerun this fragment, not the whole page
                     if st.button("Update", key=f"update_stage_{idx}"):
-                        st.session_state.clients_data.loc[idx, 'Stage'] = new_stage
-                        st.session_state.clients_data.loc[idx, 'Last Updated'] = date.today()
-                        st.success(f"Moved {row['Client Name']} to {new_stage}")
-                        if new_stage != stage:
-                            st.info("Client moved to different stage. Refreshing...")
-                        st.rerun()
+                        if move_clients([idx], new_stage, versions):
+                            st.toast(f"Moved {row['Client Name']} to {new_stage}")
+                        rerun_after_edit()
                     
                     if st.button("Delete", key=f"delete_stage_{idx}"):
-                        st.session_state.clients_data = st.session_state.clients_data.drop(idx).reset_index(drop=True)
-                        st.success(f"Deleted {row['Client Name']}")
-                        st.rerun()
+                        if remove_client(idx, versions.get(idx)):
+                            st.toast(f"Deleted {row['Client Name']}")
+                        rerun_after_edit()
             
             st.divider()
     else:
@@ -321,8 +397,127 @@ def display_stage_clients(df, stage):
             st.session_state.current_page = "Client Management"
             st.rerun()
 
+@timed_fragment
+def render_funnel_section():
+    """Funnel chart with the clickable stage summary beside it"""
+    stage_counts = get_pipeline_slice().counts()
+    
+    col1, col2 = st.columns([2, 1])
+    
+    with col1:
+        funnel_fig = get_figure_cache().get(create_funnel_chart, stage_counts,
+                                            config=(FUNNEL_STAGES, STAGE_COLORS))
+        st.plotly_chart(funnel_fig, use_container_width=True)
+        
+        # Note about interactivity
+        st.info("💡 **Tip**: Click on funnel stages above or use the stage cards to view clients in each stage!")
+    
+    with col2:
+        st.subheader("Stage Summary")
+        for stage in FUNNEL_STAGES:
+            count = stage_counts.get(stage, 0)
+            if count > 0:
+                color = STAGE_COLORS[stage]
+                if st.button(f"● {stage}: {count}", key=f"summary_{stage}"):
+                    st.session_state.selected_stage = stage
+                    st.session_state.current_page = "Stage View"
+                    st.rerun()
+
+@timed_fragment
+def render_deal_value_section():
+    """Deal value bar chart; selecting a bar opens that stage"""
+    deal_fig = get_figure_cache().get(create_deal_value_chart, get_pipeline_slice().values(),
+                                      config=(FUNNEL_STAGES, STAGE_COLORS))
+    # A bar selection reruns only this fragment until it navigates away
+    selected_points = st.plotly_chart(deal_fig, use_container_width=True, on_select="rerun")
+    
+    # Handle chart clicks
+    if selected_points and hasattr(selected_points, 'selection') and selected_points.selection.points:
+        clicked_stage = selected_points.selection.points[0]['x']
+        st.session_state.selected_stage = clicked_stage
+        st.session_state.current_page = "Stage View"
+        st.rerun()
+
+@timed_fragment
+def render_client_list():
+    """Filterable, paginated client list; filtering and row actions rerun only this fragment"""
+    store = get_client_store()
+    
+    # Filter clients
+    st.subheader("All Clients")
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        stage_filter = st.multiselect("Filter by Stage", FUNNEL_STAGES, default=FUNNEL_STAGES)
+    with col2:
+        search_term = st.text_input("Search clients", placeholder="Enter client name, contact or email...")
+    
+    # Apply filters, fetching only the visible page; searches go through the search index
+    query = ClientQuery(store, stage_filter, search_term,
+                        stage_index=get_stage_index(), search_index=get_search_index())
+    offset, limit = create_pagination_controls(query.total, "client_list")
+    filtered_df = query.page(offset, limit, stage_order=FUNNEL_STAGES)
+    # Show this session's unsaved edits over the shared rows
+    filtered_df = get_session_overlay().apply(filtered_df)
+    
+    bulk_edit = st.toggle("Bulk edit", key="bulk_edit_mode",
+                          help="Select many clients and move them to a stage in one update")
+    
+    with span("client_list_rows"):
+        # Display and edit clients
+        if not filtered_df.empty and bulk_edit:
+            create_bulk_stage_editor(filtered_df, query)
+        elif not filtered_df.empty:
+            versions = seen_row_versions(filtered_df.index)
+            for idx, row in filtered_df.iterrows():
+                with st.container():
+                    col1, col2, col3, col4, col5 = st.columns([2, 2, 2, 2, 1])
+                    
+                    with col1:
+                        st.write(f"**{row['Client Name']}**")
+                        st.write(f"Contact: {row['Contact Person']}")
+                    
+                    with col2:
+                        st.write(f"Email: {row['Email']}")
+                        st.write(f"Value: ${row['Deal Value']:,.0f}")
+                    
+                    with col3:
+                        current_stage = row['Stage']
+                        stage_color = STAGE_COLORS.get(current_stage, "#000000")
+                        st.markdown(f"<span style='color: {stage_color}; font-weight: bold;'>●</span> {current_stage}", 
+                                  unsafe_allow_html=True)
+                        if get_session_overlay().is_pending(idx):
+                            st.caption("✏️ Unsaved")
+                    
+                    with col4:
+                        new_stage = st.selectbox(
+                            "Change Stage", 
+                            FUNNEL_STAGES, 
+                            index=STAGES.index(current_stage),
+                            key=f"stage_{idx}"
+                        )
+                    
+                    with col5:
+                        # Row actions only rerun the client list fragment
+                        if st.button("Update", key=f"update_{idx}"):
+                            if move_clients([idx], new_stage, versions):
+                                st.toast(f"Updated {row['Client Name']}")
+                            rerun_after_edit()
+                        
+                        if st.button("Delete", key=f"delete_{idx}"):
+                            if remove_client(idx, versions.get(idx)):
+                                st.toast(f"Deleted {row['Client Name']}")
+                            rerun_after_edit()
+                
+                st.divider()
+        else:
+            st.info("No clients found matching the criteria.")
+
 def main():
     st.title("🎯 Interactive Pre-Sales Funnel Dashboard")
+    startup.mark("first paint")
+    # Edits are checked against the rows the previous run drew; older rows are forgotten
+    forget_undrawn_versions()
     
     # Sidebar for navigation
     st.sidebar.title("Navigation")
@@ -345,72 +540,80 @@ def main():
         if page != "Stage View":
             st.session_state.selected_stage = None
     
-    df = st.session_state.clients_data
+    store = get_client_store()
+    render_dimension_filters()
+    aggregates = get_pipeline_slice()
+    # Attach the event log before any mutation so every stage change is recorded
+    get_event_log()
+    # This run draws everything published so far; later deltas trigger a live rerun
+    st.session_state.feed_cursor = get_change_feed().cursor
+    st.session_state.own_deltas = {
+        seq for seq in st.session_state.get("own_deltas", ()) if seq > st.session_state.feed_cursor
+    }
+    with st.sidebar:
+        watch_change_feed()
     
-    if st.session_state.current_page == "Dashboard":
-        st.header("Funnel Overview")
-        
-        # Key metrics
-        col1, col2, col3, col4 = st.columns(4)
-        
+    # Draft edits stay in this session until saved to the shared store
+    overlay = get_session_overlay()
+    st.sidebar.toggle("Draft mode", key="draft_mode",
+                      help="Keep stage moves and deletes private to this session until you save them")
+    if len(overlay):
+        st.sidebar.caption(f"✏️ {len(overlay)} unsaved edits")
+        col1, col2 = st.sidebar.columns(2)
         with col1:
-            st.metric("Total Clients", len(df))
-        
+            if st.button("Save", key="overlay_save", type="primary"):
+                try:
+                    changed = overlay.merge(store)
+                    st.toast(f"Saved {changed} changes")
+                except ConflictError as error:
+                    # Keep the rest of the draft; the conflicting edits are dropped and reported
+                    overlay.drop(error.client_ids)
+                    changed = overlay.merge(store)
+                    st.toast(f"Saved {changed} changes; dropped {len(error.client_ids)} edits "
+                             "to clients changed by someone else")
+                st.rerun()
         with col2:
-            total_value = df['Deal Value'].sum()
-            st.metric("Total Pipeline Value", f"${total_value:,.0f}")
-        
-        with col3:
-            closed_won = len(df[df['Stage'] == 'Closed Won'])
-            st.metric("Closed Won", closed_won)
+            if st.button("Discard", key="overlay_discard"):
+                overlay.discard()
+                st.rerun()
+    
+    if st.session_state.current_page == "Dashboard":
+        st.header("Funnel Overview")
         
-        with col4:
-            if len(df) > 0:
-                conversion_rate = (closed_won / len(df)) * 100
-                st.metric("Conversion Rate", f"{conversion_rate:.1f}%")
+        with span("metrics_row"):
+            metrics = pipeline_metrics(aggregates)
+            
+            # Key metrics
+            col1, col2, col3, col4 = st.columns(4)
+            
+            with col1:
+                st.metric("Total Clients", metrics.total_clients)
+            
+            with col2:
+                st.metric("Total Pipeline Value", f"${metrics.total_value:,.0f}")
+            
+            with col3:
+                st.metric("Closed Won", metrics.closed_won)
+            
+            with col4:
+                if metrics.conversion_rate is not None:
+                    st.metric("Conversion Rate", f"{metrics.conversion_rate:.1f}%")
         
         st.markdown("---")
         
         # Interactive stage cards
-        create_stage_cards(df)
+        create_stage_cards()
         
         st.markdown("---")
         
         # Charts
-        col1, col2 = st.columns([2, 1])
-        
-        with col1:
-            funnel_fig = create_interactive_funnel_chart(df)
-            st.plotly_chart(funnel_fig, use_container_width=True)
-            
-            # Note about interactivity
-            st.info("💡 **Tip**: Click on funnel stages above or use the stage cards to view clients in each stage!")
-        
-        with col2:
-            st.subheader("Stage Summary")
-            stage_counts = df['Stage'].value_counts()
-            for stage in FUNNEL_STAGES:
-                count = stage_counts.get(stage, 0)
-                if count > 0:
-                    color = STAGE_COLORS[stage]
-                    if st.button(f"● {stage}: {count}", key=f"summary_{stage}"):
-                        st.session_state.selected_stage = stage
-                        st.session_state.current_page = "Stage View"
-                        st.rerun()
+        render_funnel_section()
         
         # Deal value chart
-        deal_fig = create_deal_value_chart(df)
-        selected_points = st.plotly_chart(deal_fig, use_container_width=True, on_select="rerun")
-        
-        # Handle chart clicks
-        if selected_points and hasattr(selected_points, 'selection') and selected_points.selection.points:
-            clicked_stage = selected_points.selection.points[0]['x']
-            st.session_state.selected_stage = clicked_stage
-            st.session_state.current_page = "Stage View"
-            st.rerun()
+        render_deal_value_section()
     
     elif st.session_state.current_page == "Stage View" and st.session_state.selected_stage:
-        display_stage_clients(df, st.session_state.selected_stage)
+        display_stage_clients(st.session_state.selected_stage)
     
     elif st.session_state.current_page == "Client Management":
         st.header("Client Management")
@@ -419,10 +622,11 @@ def main():
         with st.expander("🎯 Manage Custom Stages"):
             st.subheader("Current Custom Stages")
             
-            if st.session_state.custom_stages:
+            custom_stages = STAGES.custom_names()
+            if custom_stages:
                 col1, col2 = st.columns([3, 1])
                 with col1:
-                    for i, stage in enumerate(st.session_state.custom_stages):
+                    for i, stage in enumerate(custom_stages):
                         col_stage, col_delete = st.columns([4, 1])
                         with col_stage:
                             stage_color = get_stage_color(stage)
@@ -431,18 +635,16 @@ def main():
                         with col_delete:
                             if st.button("🗑️", key=f"delete_stage_{i}", help=f"Delete {stage}"):
                                 # Check if any clients are in this stage
-                                clients_in_stage = len(df[df['Stage'] == stage])
+                                clients_in_stage = get_stage_index().count(stage)
                                 if clients_in_stage > 0:
                                     st.error(f"Cannot delete '{stage}' - {clients_in_stage} clients are currently in this stage.")
                                 else:
-                                    st.session_state.custom_stages.remove(stage)
-                                    if stage in STAGE_COLORS:
-                                        del STAGE_COLORS[stage]
+                                    STAGES.remove(stage)
                                     st.success(f"Deleted stage: {stage}")
                                     st.rerun()
                 
                 with col2:
-                    st.info(f"**{len(st.session_state.custom_stages)}** custom stages")
+                    st.info(f"**{len(custom_stages)}** custom stages")
             else:
                 st.info("No custom stages added yet.")
             
@@ -459,8 +661,7 @@ def main():
                 if st.button("Add Stage", key="add_new_custom_stage"):
                     if new_custom_stage:
                         if new_custom_stage not in FUNNEL_STAGES:
-                            st.session_state.custom_stages.append(new_custom_stage)
-                            STAGE_COLORS[new_custom_stage] = get_stage_color(new_custom_stage)
+                            STAGES.ensure(new_custom_stage)
                             st.success(f"Added new stage: {new_custom_stage}")
                             st.rerun()
                         else:
@@ -485,79 +686,60 @@ def main():
                     new_stage = create_stage_selector_with_custom("add_form")
                     new_value = st.number_input("Deal Value ($)", min_value=0, value=0)
                 
+                col3, col4, col5 = st.columns(3)
+                with col3:
+                    new_owner = st.text_input("Owner")
+                with col4:
+                    new_region = st.text_input("Region")
+                with col5:
+                    new_segment = st.text_input("Segment")
+                
                 if st.form_submit_button("Add Client"):
                     if new_client and new_contact and new_stage:
-                        new_row = pd.DataFrame({
-                            'Client Name': [new_client],
-                            'Stage': [new_stage],
-                            'Contact Person': [new_contact],
-                            'Email': [new_email],
-                            'Deal Value': [new_value],
-                            'Last Updated': [date.today()]
-                        })
-                        st.session_state.clients_data = pd.concat([df, new_row], ignore_index=True)
+                        store.add_client(new_client, new_stage, new_contact, new_email, new_value,
+                                         owner=new_owner.strip(), region=new_region.strip(),
+                                         segment=new_segment.strip())
                         st.success("Client added successfully!")
                         st.rerun()
                     else:
                         st.error("Please fill in all required fields including stage selection.")
         
-        # Filter clients
-        st.subheader("All Clients")
-        
-        col1, col2 = st.columns(2)
-        with col1:
-            stage_filter = st.multiselect("Filter by Stage", FUNNEL_STAGES, default=FUNNEL_STAGES)
-        with col2:
-            search_term = st.text_input("Search clients", placeholder="Enter client name...")
-        
-        # Apply filters
-        filtered_df = df[df['Stage'].isin(stage_filter)]
-        if search_term:
-            filtered_df = filtered_df[filtered_df['Client Name'].str.contains(search_term, case=False, na=False)]
+        # Bulk import from a file
+        with st.expander("Bulk Import Clients"):
+            st.caption("CSV, Parquet or Excel file with Client Name, Stage, Contact Person and Deal Value "
+                       "columns, plus optional Email, Last Updated, Owner, Region, Segment and Quarter.")
+            uploaded_file = st.file_uploader("Client file", type=["csv", "parquet", "xlsx", "xls"],
+                                             key="bulk_import_file")
+            
+            if uploaded_file is not None and st.button("Import Clients", key="bulk_import"):
+                try:
+                    st.session_state.import_result = import_clients(store, uploaded_file, FUNNEL_STAGES)
+                except (ValueError, ImportError) as error:
+                    st.error(f"Import failed: {error}")
+            
+            result = st.session_state.get("import_result")
+            if result is not None:
+                st.success(f"Imported {result.imported:,} clients.")
+                if result.rejected:
+                    st.warning(f"{result.rejected:,} rows were rejected.")
+                    st.dataframe(result.errors.head(1000), use_container_width=True)
+                    st.download_button(
+                        label="Download error report",
+                        data=result.errors.to_csv(index=False),
+                        file_name="import_errors.csv",
+                        mime="text/csv"
+                    )
+        
+        # Likely duplicates, merged into one client
+        with st.expander("🧬 Duplicate Clients"):
+            render_duplicates()
+        
+        # Pull changed accounts from the CRM
+        with st.expander("🔄 CRM Sync"):
+            render_crm_sync()
         
-        # Display and edit clients
-        if not filtered_df.empty:
-            for idx, row in filtered_df.iterrows():
-                with st.container():
-                    col1, col2, col3, col4, col5 = st.columns([2, 2, 2, 2, 1])
-                    
-                    with col1:
-                        st.write(f"**{row['Client Name']}**")
-                        st.write(f"Contact: {row['Contact Person']}")
-                    
-                    with col2:
-                        st.write(f"Email: {row['Email']}")
-                        st.write(f"Value: ${row['Deal Value']:,.0f}")
-                    
-                    with col3:
-                        current_stage = row['Stage']
-                        stage_color = STAGE_COLORS.get(current_stage, "#000000")
-                        st.markdown(f"<span style='color: {stage_color}; font-weight: bold;'>●</span> {current_stage}", 
-                                  unsafe_allow_html=True)
-                    
-                    with col4:
-                        new_stage = st.selectbox(
-                            "Change Stage", 
-                            FUNNEL_STAGES, 
-                            index=FUNNEL_STAGES.index(current_stage),
-                            key=f"stage_{idx}"
-                        )
-                    
-                    with col5:
-                        if st.button("Update", key=f"update_{idx}"):
-                            st.session_state.clients_data.loc[idx, 'Stage'] = new_stage
-                            st.session_state.clients_data.loc[idx, 'Last Updated'] = date.today()
-                            st.success(f"Updated {row['Client Name']}")
-                            st.rerun()
-                        
-                        if st.button("Delete", key=f"delete_{idx}"):
-                            st.session_state.clients_data = st.session_state.clients_data.drop(idx).reset_index(drop=True)
-                            st.success(f"Deleted {row['Client Name']}")
-                            st.rerun()
-                
-                st.divider()
-        else:
-            st.info("No clients found matching the criteria.")
+        # Filter clients
+        render_client_list()
     
     elif st.session_state.current_page == "Analytics":
         st.header("Analytics & Insights")
@@ -565,67 +747,101 @@ def main():
         # Stage progression analysis
         st.subheader("Pipeline Health")
         
-        col1, col2 = st.columns(2)
-        
-        with col1:
-            # Average deal value by stage
-            avg_deal_by_stage = df.groupby('Stage')['Deal Value'].mean().reset_index()
-            fig = px.bar(
-                avg_deal_by_stage,
-                x='Stage',
-                y='Deal Value',
-                title="Average Deal Value by Stage",
-                color='Stage',
-                color_discrete_map=STAGE_COLORS
-            )
-            fig.update_layout(xaxis_tickangle=-45, showlegend=False)
-            st.plotly_chart(fig, use_container_width=True)
-        
-        with col2:
-            # Client distribution pie chart
-            fig = px.pie(
-                df, 
-                names='Stage', 
-                title="Client Distribution by Stage",
-                color='Stage',
-                color_discrete_map=STAGE_COLORS
+        stats_df = aggregates.summary(FUNNEL_STAGES).reset_index()
+        # Charts and conversion are rebuilt on worker threads when the data or stages change
+        data_version = (store.version, STAGES.version)
+        waiting = []
+        
+        with span("analytics_charts"):
+            colors = dict(STAGE_COLORS)
+            charts = background(
+                ("analytics_charts", slice_key()), data_version,
+                lambda: (average_deal_chart(stats_df, colors), stage_distribution_chart(stats_df, colors)),
+                waiting
             )
-            st.plotly_chart(fig, use_container_width=True)
+            if charts.value is not None:
+                col1, col2 = st.columns(2)
+                
+                with col1:
+                    # Average deal value by stage
+                    st.plotly_chart(charts.value[0], use_container_width=True)
+                
+                with col2:
+                    # Client distribution pie chart
+                    st.plotly_chart(charts.value[1], use_container_width=True)
+            show_refresh_state(charts, "charts")
         
         # Detailed statistics
         st.subheader("Detailed Statistics")
         
-        stats_df = df.groupby('Stage').agg({
-            'Client Name': 'count',
-            'Deal Value': ['sum', 'mean', 'max', 'min']
-        }).round(2)
-        
-        stats_df.columns = ['Client Count', 'Total Value', 'Avg Value', 'Max Value', 'Min Value']
-        stats_df = stats_df.reset_index()
+        st.dataframe(stats_df.round(2), use_container_width=True)
         
-        st.dataframe(stats_df, use_container_width=True)
+        # Stage by dimension breakdown, read from the cube
+        with span("dimension_breakdown"):
+            st.subheader("Breakdown by Owner, Region, Segment or Quarter")
+            dimension = st.selectbox("Break down by", DIMENSIONS, format_func=COLUMNS.get, key="breakdown_dimension")
+            breakdown = get_pipeline_cube().breakdown(dimension, dimension_filters())
+            if breakdown.empty:
+                st.info("No clients match the current slice.")
+            else:
+                table = breakdown.pivot_table(index='Stage', columns=COLUMNS[dimension], values='Client Count',
+                                              aggfunc='sum', fill_value=0)
+                table = table.rename(columns={'': "Unassigned"})
+                table = table.reindex([stage for stage in FUNNEL_STAGES if stage in table.index])
+                st.dataframe(table, use_container_width=True)
+        
+        # Conversion and velocity from the stage transition history
+        st.subheader("Stage Conversion & Time in Stage")
+        
+        with span("conversion_table"):
+            analytics, stages = get_funnel_analytics(), list(FUNNEL_STAGES)
+            conversion = background(("conversion", tuple(stages)), data_version,
+                                    lambda: analytics.stage_conversion(stages), waiting)
+            conversion_df = conversion.value
+            show_refresh_state(conversion, "conversion")
+            if conversion_df is not None and conversion_df.empty:
+                st.info("No stage transitions recorded yet.")
+            elif conversion_df is not None:
+                # The result is shared with other sessions, so scale a copy
+                conversion_df = conversion_df.copy()
+                conversion_df[['Conversion Rate', 'Drop-off Rate']] *= 100
+                st.dataframe(
+                    conversion_df,
+                    column_config={
+                        'Conversion Rate': st.column_config.NumberColumn(format="%.1f%%"),
+                        'Drop-off Rate': st.column_config.NumberColumn(format="%.1f%%"),
+                        'Median Days': st.column_config.NumberColumn(format="%.1f"),
+                        'P90 Days': st.column_config.NumberColumn(format="%.1f"),
+                    },
+                    hide_index=True,
+                    use_container_width=True
+                )
+                st.caption("Conversion counts clients who later reached a further stage; "
+                           "time in stage covers completed stays only.")
         
-        # Export functionality
+        # Export functionality, streamed in chunks and only generated when a download is clicked
         st.subheader("Export Data")
         col1, col2 = st.columns(2)
         
         with col1:
-            csv = df.to_csv(index=False)
-            st.download_button(
-                label="Download as CSV",
-                data=csv,
-                file_name=f"clients_data_{date.today()}.csv",
-                mime="text/csv"
-            )
+            export_format = st.selectbox("Export format", available_formats(), key="export_format")
         
         with col2:
-            json_data = df.to_json(orient='records', date_format='iso')
+            extension, mime = EXPORT_FORMATS[export_format]
             st.download_button(
-                label="Download as JSON",
-                data=json_data,
-                file_name=f"clients_data_{date.today()}.json",
-                mime="application/json"
+                label=f"Download as {export_format}",
+                data=lambda: export_clients(store, export_format),
+                file_name=f"clients_data_{date.today()}.{extension}",
+                mime=mime
             )
+        
+        if waiting:
+            poll_background_results(waiting)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    with span("rerun"):
+        main()
+    report_startup(startup)
+    render_debug_panel()
+    if METRICS_FILE:
+        get_span_metrics().write_prometheus(METRICS_FILE)
\ No newline at end of file
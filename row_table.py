@@ -0,0 +1,159 @@
+"""Growable NumPy row buffers keyed by client
+
+Only FunnelAnalytics keeps its stage stints and reach flags here. Client rows
+themselves stay in SQLite, which already handles single-row edits in place.
+"""
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+# Tombstoned rows are dropped once they, or the unsorted rows appended since the last
+# compaction, pass this share of the buffer
+COMPACT_RATIO = 0.25
+# Tombstones are also dropped when they are older than this many seconds
+COMPACT_INTERVAL = 60.0
+
+MIN_CAPACITY = 1_024
+
+
+class RowTable:
+    """Rows grouped by an integer key, held in growable NumPy column buffers
+
+    Appends write into spare capacity that doubles when it runs out, so adding
+    rows costs amortized O(1) per row instead of a copy of the table. Removing
+    a key only marks its rows as tombstones. Compaction drops the tombstones
+    and re-sorts the buffers by key. It runs once they pass a share of the
+    buffer or have waited longer than an interval.
+
+    The rows of a key are found by binary search in the key-sorted part of
+    the buffer. Rows appended since the last compaction are found through a
+    small dictionary instead. The frame of live rows is built once and
+    shared by every read until the next append, removal or compaction.
+    """
+
+    def __init__(self, dtypes, key, compact_ratio=COMPACT_RATIO, compact_interval=COMPACT_INTERVAL):
+        self.dtypes = {name: np.dtype(dtype) for name, dtype in dtypes.items()}
+        self.key = key
+        self.compact_ratio = compact_ratio
+        self.compact_interval = compact_interval
+        self.compactions = 0
+        self._lock = threading.RLock()
+        self._allocate(MIN_CAPACITY)
+        self._size = 0
+        # Rows [0, _sorted) are ordered by key; later rows are listed in _tail by key
+        self._sorted = 0
+        self._tail = {}
+        self._dead = 0
+        self._last_compaction = time.monotonic()
+        self._frame = None
+
+    def _allocate(self, capacity):
+        self._columns = {name: np.empty(capacity, dtype) for name, dtype in self.dtypes.items()}
+        self._live = np.zeros(capacity, dtype=bool)
+
+    def __len__(self):
+        return self._size - self._dead
+
+    @property
+    def capacity(self):
+        return len(self._live)
+
+    def append(self, rows):
+        """Append a frame (or mapping of arrays) with a column for every dtype"""
+        columns = {name: np.asarray(rows[name], dtype=dtype) for name, dtype in self.dtypes.items()}
+        n = len(columns[self.key])
+        if not n:
+            return
+        with self._lock:
+            start, end = self._size, self._size + n
+            if end > self.capacity:
+                self._grow(end)
+            for name, values in columns.items():
+                self._columns[name][start:end] = values
+            self._live[start:end] = True
+            keys = columns[self.key]
+            # Rows arriving in key order after a sorted buffer extend the sorted part
+            in_order = self._sorted == start and bool(np.all(keys[1:] >= keys[:-1])) and (
+                not start or keys[0] >= self._columns[self.key][start - 1]
+            )
+            if in_order:
+                self._sorted = end
+            else:
+                tail = self._tail
+                for slot, key in enumerate(keys.tolist(), start):
+                    tail.setdefault(key, []).append(slot)
+            self._size = end
+            self._frame = None
+            self._maybe_compact()
+
+    def _grow(self, needed):
+        capacity = self.capacity
+        while capacity < needed:
+            capacity *= 2
+        old_columns, old_live = self._columns, self._live
+        self._allocate(capacity)
+        for name, values in old_columns.items():
+            self._columns[name][:self._size] = values[:self._size]
+        self._live[:self._size] = old_live[:self._size]
+
+    def remove(self, keys):
+        """Tombstone every row of the given keys and return how many of the keys had rows"""
+        keys = np.unique(np.asarray(keys, dtype=self.dtypes[self.key]))
+        if not len(keys):
+            return 0
+        with self._lock:
+            live = self._live
+            sorted_keys = self._columns[self.key][:self._sorted]
+            lows = np.searchsorted(sorted_keys, keys, side='left')
+            highs = np.searchsorted(sorted_keys, keys, side='right')
+            removed = 0
+            for key, low, high in zip(keys.tolist(), lows.tolist(), highs.tolist()):
+                slots = [slot for slot in self._tail.pop(key, ()) if live[slot]]
+                dead = int(live[low:high].sum()) + len(slots)
+                if dead:
+                    live[low:high] = False
+                    live[slots] = False
+                    self._dead += dead
+                    removed += 1
+            if removed:
+                self._frame = None
+            self._maybe_compact()
+            return removed
+
+    def _maybe_compact(self):
+        unsorted = self._size - self._sorted
+        overdue = self._dead and time.monotonic() - self._last_compaction >= self.compact_interval
+        if overdue or max(self._dead, unsorted) > self.compact_ratio * max(self._size, MIN_CAPACITY):
+            self.compact()
+
+    def compact(self):
+        """Drop tombstoned rows and sort the buffers by key"""
+        with self._lock:
+            live = np.flatnonzero(self._live[:self._size])
+            order = live[np.argsort(self._columns[self.key][live], kind='stable')]
+            old_columns = self._columns
+            size = len(order)
+            self._allocate(max(MIN_CAPACITY, 2 * size))
+            for name, values in old_columns.items():
+                self._columns[name][:size] = values[order]
+            self._live[:size] = True
+            self._size = self._sorted = size
+            self._tail = {}
+            self._dead = 0
+            self._last_compaction = time.monotonic()
+            self._frame = None
+            self.compactions += 1
+
+    def frame(self):
+        """Live rows as a frame, shared between reads until the table changes; do not modify it"""
+        with self._lock:
+            if self._frame is None:
+                if self._dead:
+                    live = self._live[:self._size]
+                    columns = {name: values[:self._size][live] for name, values in self._columns.items()}
+                else:
+                    columns = {name: values[:self._size].copy() for name, values in self._columns.items()}
+                self._frame = pd.DataFrame(columns)
+            return self._frame
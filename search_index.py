@@ -0,0 +1,150 @@
+import threading
+from array import array
+
+import numpy as np
+
+# Sentinels mark the start and end of each field so short and prefix queries map onto trigrams
+FIELD_START = '\x02'
+FIELD_END = '\x03'
+FIELD_SEPARATOR = '\x1f'
+
+# Compact the posting lists once this share of their entries is stale, i.e. belongs to a
+# deleted client or to a trigram an edit took out of the client's text
+COMPACT_RATIO = 0.2
+
+
+def _fold(value):
+    return str(value).casefold() if value is not None else ''
+
+
+def _document(fields):
+    """Case-folded, sentinel-padded text of a client's searchable fields"""
+    return FIELD_SEPARATOR.join(FIELD_START + _fold(field) + FIELD_END for field in fields)
+
+
+def _trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class ClientSearchIndex:
+    """Case-folded trigram index over client name, contact person and email
+
+    Substring queries of three or more characters intersect the posting lists
+    of their trigrams, starting from the shortest, and only verify the
+    surviving candidates. Adds, edits and deletes are applied incrementally
+    from the store's change notifications. An edit appends the client to the
+    lists of trigrams its new text gained and marks its entries for the
+    trigrams it lost as stale, so an id is in a posting list at most once;
+    stale entries are dropped in a periodic compaction.
+    """
+
+    def __init__(self, store):
+        self._store = store
+        self._lock = threading.Lock()
+        self._documents = {}
+        self._postings = {}
+        # trigram -> ids whose entry in that posting list is stale
+        self._stale = {}
+        self._stale_count = 0
+        self._entries = 0
+        store.subscribe(self.apply, load=self._load)
+
+    def _load(self):
+        self._add(self._store.search_fields())
+
+    def _add(self, rows):
+        for client_id, *fields in rows:
+            self._index(client_id, _document(fields))
+
+    def _index(self, client_id, text):
+        """Make text the client's indexed document, or remove the client when text is None"""
+        old = self._documents.pop(client_id, None)
+        if text is not None:
+            self._documents[client_id] = text
+        trigrams = _trigrams(text) if text is not None else set()
+        if old is not None:
+            old_trigrams = _trigrams(old)
+            lost = old_trigrams - trigrams
+            for trigram in lost:
+                self._stale.setdefault(trigram, set()).add(client_id)
+            self._stale_count += len(lost)
+            trigrams -= old_trigrams
+        if self._stale:
+            # Entries left by an earlier edit or delete are still in their lists and become current again
+            revived = {trigram for trigram in trigrams if client_id in self._stale.get(trigram, ())}
+            for trigram in revived:
+                self._stale[trigram].remove(client_id)
+            self._stale_count -= len(revived)
+            trigrams -= revived
+        for trigram in trigrams:
+            postings = self._postings.get(trigram)
+            if postings is None:
+                postings = self._postings[trigram] = array('q')
+            postings.append(client_id)
+        self._entries += len(trigrams)
+
+    def apply(self, changes):
+        """Apply a batch of store changes"""
+        # Added and edited clients are re-read
+        added = [change.client_id for change in changes if change.op in ('add', 'edit')]
+        deleted = [change.client_id for change in changes if change.op == 'delete']
+        rows = self._store.search_fields(added) if added else []
+        with self._lock:
+            self._add(rows)
+            for client_id in deleted:
+                self._index(client_id, None)
+            if self._stale_count > COMPACT_RATIO * max(self._entries, 1):
+                self._compact()
+
+    def _compact(self):
+        """Drop the stale entries from their posting lists"""
+        for trigram, stale in self._stale.items():
+            if not stale:
+                continue
+            ids = np.frombuffer(self._postings[trigram], dtype='int64')
+            kept = ids[~np.isin(ids, np.fromiter(stale, dtype='int64', count=len(stale)))]
+            if len(kept):
+                self._postings[trigram] = array('q', kept.tobytes())
+            else:
+                del self._postings[trigram]
+        self._entries -= self._stale_count
+        self._stale = {}
+        self._stale_count = 0
+
+    def search(self, term, prefix=False):
+        """Sorted ids of clients with a field containing term (or starting with it when prefix=True)"""
+        needle = _fold(term).strip()
+        if not needle:
+            return []
+        if prefix:
+            needle = FIELD_START + needle
+        with self._lock:
+            if len(needle) >= 3:
+                candidates = self._intersect(_trigrams(needle))
+            else:
+                # Short needles: union the postings of every trigram that contains them
+                matching = [postings for trigram, postings in self._postings.items() if needle in trigram]
+                candidates = np.unique(np.concatenate(
+                    [np.frombuffer(postings, dtype='int64') for postings in matching]
+                )) if matching else []
+            documents = self._documents
+            return [
+                int(client_id) for client_id in candidates
+                if needle in documents.get(int(client_id), '')
+            ]
+
+    def _intersect(self, trigrams):
+        postings = []
+        for trigram in trigrams:
+            ids = self._postings.get(trigram)
+            if ids is None:
+                return []
+            postings.append(ids)
+        postings.sort(key=len)
+        result = np.frombuffer(postings[0], dtype='int64')
+        for ids in postings[1:]:
+            if not len(result):
+                break
+            # An id is never in a posting list twice (see _index), so the lists need no deduplication
+            result = np.intersect1d(result, np.frombuffer(ids, dtype='int64'), assume_unique=True)
+        return np.unique(result)
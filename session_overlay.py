@@ -0,0 +1,86 @@
+import pandas as pd
+
+
+class SessionOverlay:
+    """A session's unsaved stage moves and deletes layered over the shared client store
+
+    The store and its indexes are shared by every session; a session only
+    holds the edits it has not saved yet, so memory grows with pending edits
+    rather than with sessions. Frames read from the store are copied only when
+    the overlay touches one of their rows.
+    """
+
+    def __init__(self):
+        self.moves = {}
+        self.deletes = set()
+        # Row version each edited client had when the edit was made
+        self.expected = {}
+
+    def __len__(self):
+        return len(self.moves) + len(self.deletes)
+
+    def move(self, client_ids, stage, versions=None):
+        """Stage a move of the given clients to stage
+
+        versions maps client ids to the row version the edit was based on;
+        saving fails for clients whose row has changed since.
+        """
+        for client_id in client_ids:
+            client_id = int(client_id)
+            if client_id not in self.deletes:
+                self.moves[client_id] = stage
+                self._expect(client_id, versions)
+
+    def delete(self, client_id, version=None):
+        """Stage a delete of a client, dropping any pending move for it"""
+        client_id = int(client_id)
+        self.moves.pop(client_id, None)
+        self.deletes.add(client_id)
+        self._expect(client_id, {client_id: version} if version is not None else None)
+
+    def _expect(self, client_id, versions):
+        # The first edit of a client fixes the version the whole draft is based on
+        if versions and client_id in versions and client_id not in self.expected:
+            self.expected[client_id] = versions[client_id]
+
+    def drop(self, client_ids):
+        """Forget the pending edits of the given clients"""
+        for client_id in client_ids:
+            self.moves.pop(client_id, None)
+            self.deletes.discard(client_id)
+            self.expected.pop(client_id, None)
+
+    def is_pending(self, client_id):
+        return client_id in self.moves or client_id in self.deletes
+
+    def apply(self, df):
+        """Return a client frame (indexed by client id) as this session sees it"""
+        if not len(self) or df.empty:
+            return df
+        if self.deletes:
+            df = df[~df.index.isin(self.deletes)]
+        moved = df.index[df.index.isin(self.moves.keys())]
+        if len(moved):
+            df = df.copy()
+            stages = [self.moves[client_id] for client_id in moved]
+            if isinstance(df['Stage'].dtype, pd.CategoricalDtype):
+                missing = [stage for stage in dict.fromkeys(stages) if stage not in df['Stage'].cat.categories]
+                if missing:
+                    df['Stage'] = df['Stage'].cat.add_categories(missing)
+            df.loc[moved, 'Stage'] = stages
+        return df
+
+    def merge(self, store):
+        """Write the pending edits to the shared store in one transaction and clear them
+
+        Raises ConflictError, keeping the edits, when another session has
+        changed any of the edited clients since they were read.
+        """
+        changed = store.apply_changes(moves=self.moves, deletes=self.deletes, expected_versions=self.expected)
+        self.discard()
+        return changed
+
+    def discard(self):
+        self.moves = {}
+        self.deletes = set()
+        self.expected = {}
@@ -0,0 +1,108 @@
+import threading
+
+import pandas as pd
+
+SUMMARY_COLUMNS = ['Client Count', 'Total Value', 'Avg Value', 'Max Value', 'Min Value']
+
+
+def order_summary(summary, stage_order=None):
+    """Rows of a stage summary in stage_order, followed by any stages it does not list"""
+    if stage_order is None:
+        return summary
+    known = set(stage_order)
+    present = [stage for stage in stage_order if stage in summary.index]
+    extra = [stage for stage in summary.index if stage not in known]
+    return summary.loc[present + extra]
+
+
+class StageAggregates:
+    """Per-stage deal value statistics shared by every chart and page
+
+    Built with one grouped pass over the store and then maintained from the
+    store's change notifications: counts and totals are adjusted per change,
+    and a stage is only re-read when a change removes its current largest or
+    smallest deal.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self._lock = threading.Lock()
+        # stage -> [count, total, max, min]
+        self._stats = {}
+        self._summary = None
+        store.subscribe(self.apply, load=self._load)
+
+    def _load(self):
+        self._reload(None)
+
+    def _reload(self, stages):
+        """Replace the statistics of the given stages (all when None) from the store"""
+        rows = self.store.stage_summary(stages)
+        if stages is None:
+            self._stats = {}
+        else:
+            for stage in stages:
+                self._stats.pop(stage, None)
+        for stage, count, total, _, max_value, min_value in rows:
+            self._stats[stage] = [count, total, max_value, min_value]
+        self._summary = None
+
+    def apply(self, changes):
+        """Apply a batch of store changes"""
+        stale = set()
+        with self._lock:
+            for change in changes:
+                if change.deal_value is None:
+                    # A change without its deal value can't be applied in place
+                    stale.update(stage for stage in (change.stage, change.old_stage) if stage is not None)
+                    continue
+                value = change.deal_value
+                if change.old_stage is not None and change.old_stage not in stale:
+                    old_value = value if change.old_deal_value is None else change.old_deal_value
+                    stats = self._stats.get(change.old_stage)
+                    if stats is None or stats[0] <= 1:
+                        self._stats.pop(change.old_stage, None)
+                    else:
+                        stats[0] -= 1
+                        stats[1] -= old_value
+                        if old_value in (stats[2], stats[3]):
+                            stale.add(change.old_stage)
+                if change.stage is not None and change.stage not in stale:
+                    stats = self._stats.get(change.stage)
+                    if stats is None:
+                        self._stats[change.stage] = [1, value, value, value]
+                    else:
+                        stats[0] += 1
+                        stats[1] += value
+                        stats[2] = max(stats[2], value)
+                        stats[3] = min(stats[3], value)
+            if stale:
+                # Called under the store lock, so the re-read sees exactly these changes applied
+                self._reload(sorted(stale))
+            self._summary = None
+
+    def summary(self, stage_order=None):
+        """Return the per-stage statistics, ordered by stage_order when given"""
+        with self._lock:
+            if self._summary is None:
+                summary = pd.DataFrame.from_dict(
+                    self._stats, orient='index', columns=['Client Count', 'Total Value', 'Max Value', 'Min Value']
+                ).rename_axis('Stage')
+                summary['Avg Value'] = summary['Total Value'] / summary['Client Count']
+                self._summary = summary[SUMMARY_COLUMNS].astype({'Client Count': 'int64', 'Total Value': 'int64'})
+            summary = self._summary
+        return order_summary(summary, stage_order)
+
+    def counts(self):
+        """Number of clients per stage"""
+        return self.summary()['Client Count']
+
+    def values(self):
+        """Total deal value per stage"""
+        return self.summary()['Total Value']
+
+    def total_clients(self):
+        return int(self.summary()['Client Count'].sum())
+
+    def total_value(self):
+        return int(self.summary()['Total Value'].sum())
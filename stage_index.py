@@ -0,0 +1,57 @@
+import threading
+
+
+class StageIndex:
+    """Maps each stage to the ids of its clients
+
+    Built once from the store and then maintained incrementally from the
+    store's change notifications, so a stage drill-down costs time
+    proportional to the size of that stage rather than the whole pipeline.
+    """
+
+    def __init__(self, store):
+        self._lock = threading.Lock()
+        self._members = {}
+        self._stage_of = {}
+        store.subscribe(self.apply, load=lambda: self._load(store))
+
+    def _load(self, store):
+        for client_id, stage in store.stage_memberships():
+            self._members.setdefault(stage, set()).add(client_id)
+            self._stage_of[client_id] = stage
+
+    def apply(self, changes):
+        """Apply a batch of store changes"""
+        with self._lock:
+            for change in changes:
+                if change.old_stage is not None:
+                    members = self._members.get(change.old_stage)
+                    if members is not None:
+                        members.discard(change.client_id)
+                        if not members:
+                            del self._members[change.old_stage]
+                if change.stage is not None:
+                    self._members.setdefault(change.stage, set()).add(change.client_id)
+                    self._stage_of[change.client_id] = change.stage
+                else:
+                    self._stage_of.pop(change.client_id, None)
+
+    def ids(self, stage):
+        """Sorted client ids in a stage"""
+        with self._lock:
+            return sorted(self._members.get(stage, ()))
+
+    def filter(self, client_ids, stages):
+        """Keep the ids whose client is in one of the given stages, preserving order"""
+        stages = set(stages)
+        with self._lock:
+            stage_of = self._stage_of
+            return [client_id for client_id in client_ids if stage_of.get(client_id) in stages]
+
+    def count(self, stage):
+        with self._lock:
+            return len(self._members.get(stage, ()))
+
+    def stages(self):
+        with self._lock:
+            return list(self._members)
@@ -0,0 +1,140 @@
+import threading
+from collections import namedtuple
+
+import numpy as np
+
+from funnel_core import DEFAULT_FUNNEL_STAGES, DEFAULT_STAGE_COLORS, stage_color
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS stages (
+    code INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    position INTEGER NOT NULL,
+    color TEXT NOT NULL,
+    custom INTEGER NOT NULL DEFAULT 0,
+    active INTEGER NOT NULL DEFAULT 1
+);
+"""
+
+Stage = namedtuple('Stage', ['code', 'name', 'position', 'color', 'custom', 'active'])
+
+
+class StageRegistry:
+    """Funnel stages with stable integer codes, display order and colors
+
+    Stages live in the client database so custom stages persist and are
+    shared by every session. Codes are never reused: removing a custom stage
+    only deactivates it, and adding the name back restores its old code.
+    Name, code, color and position lookups are dictionary reads.
+    """
+
+    def __init__(self, conn, lock=None, defaults=DEFAULT_FUNNEL_STAGES, colors=DEFAULT_STAGE_COLORS):
+        self._conn = conn
+        self._lock = lock or threading.RLock()
+        # Bumped whenever stages are added, removed or reordered
+        self.version = 0
+        with self._lock:
+            self._conn.executescript(SCHEMA)
+            if self._conn.execute("SELECT 1 FROM stages LIMIT 1").fetchone() is None:
+                with self._conn:
+                    self._conn.executemany(
+                        "INSERT INTO stages (code, name, position, color, custom) VALUES (?, ?, ?, ?, 0)",
+                        [(code, name, code, stage_color(name, colors), ) for code, name in enumerate(defaults)]
+                    )
+            self._load()
+
+    def _load(self):
+        stages = [Stage(*row) for row in self._conn.execute(
+            "SELECT code, name, position, color, custom, active FROM stages ORDER BY position, code"
+        )]
+        self._by_name = {stage.name: stage for stage in stages}
+        self._by_code = {stage.code: stage for stage in stages}
+        self._names = [stage.name for stage in stages if stage.active]
+        self._index = {name: i for i, name in enumerate(self._names)}
+        self._colors = {stage.name: stage.color for stage in stages if stage.active}
+        # Code -> name array for turning a column of codes into names in one take
+        self._lookup = np.empty(max(self._by_code, default=-1) + 1, dtype=object)
+        for stage in stages:
+            self._lookup[stage.code] = stage.name
+        self.version += 1
+
+    # Lookups
+
+    def code(self, name):
+        """Code of a stage, or None when the name has never been registered"""
+        stage = self._by_name.get(name)
+        return stage.code if stage is not None else None
+
+    def name(self, code):
+        return self._by_code[code].name
+
+    def color(self, name):
+        """Color of a stage; unregistered names get a color derived from the name"""
+        stage = self._by_name.get(name)
+        return stage.color if stage is not None else stage_color(name, {})
+
+    def index(self, name):
+        """Position of an active stage in names()"""
+        return self._index[name]
+
+    def names(self):
+        """Active stage names in funnel order"""
+        return list(self._names)
+
+    def colors(self):
+        """Color of every active stage"""
+        return dict(self._colors)
+
+    def custom_names(self):
+        return [name for name in self._names if self._by_name[name].custom]
+
+    def is_custom(self, name):
+        stage = self._by_name.get(name)
+        return stage is not None and bool(stage.custom)
+
+    def codes(self, names):
+        """Codes of the registered names, skipping unknown ones"""
+        by_name = self._by_name
+        return [by_name[name].code for name in names if name in by_name]
+
+    def names_for(self, codes):
+        """Stage names for an array of codes"""
+        return self._lookup[np.asarray(codes, dtype='int64')]
+
+    # Changes
+
+    def ensure(self, name, color=None):
+        """Code of a stage, registering it as an active custom stage at the end of the funnel if needed"""
+        stage = self._by_name.get(name)
+        if stage is not None and stage.active:
+            return stage.code
+        with self._lock:
+            stage = self._by_name.get(name)
+            with self._conn:
+                if stage is None:
+                    self._conn.execute(
+                        "INSERT INTO stages (code, name, position, color, custom) VALUES ("
+                        "(SELECT COALESCE(MAX(code), -1) + 1 FROM stages), ?, "
+                        "(SELECT COALESCE(MAX(position), -1) + 1 FROM stages), ?, 1)",
+                        (name, color or stage_color(name, {}))
+                    )
+                elif not stage.active:
+                    self._conn.execute(
+                        "UPDATE stages SET active = 1, "
+                        "position = (SELECT MAX(position) + 1 FROM stages) WHERE code = ?",
+                        (stage.code,)
+                    )
+            self._load()
+            return self._by_name[name].code
+
+    def remove(self, name):
+        """Deactivate a custom stage; its code stays reserved for it"""
+        stage = self._by_name.get(name)
+        if stage is None or not stage.active:
+            return
+        if not stage.custom:
+            raise ValueError(f"{name!r} is a built-in stage and cannot be removed")
+        with self._lock:
+            with self._conn:
+                self._conn.execute("UPDATE stages SET active = 0 WHERE code = ?", (stage.code,))
+            self._load()
@@ -0,0 +1,166 @@
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+from funnel_core import DEFAULT_FUNNEL_STAGES
+
+# Share of clients in each stage: a narrowing funnel with a long closed-lost tail
+DEFAULT_STAGE_WEIGHTS = {
+    "Research": 0.20,
+    "Initial Contact": 0.16,
+    "First Presentation": 0.12,
+    "Interested": 0.10,
+    "Multiple Presentations": 0.07,
+    "Order Stage": 0.05,
+    "Negotiation": 0.04,
+    "Closed Won": 0.07,
+    "Closed Lost": 0.13,
+}
+
+# Custom stages are rarer; together they take the remaining share
+DEFAULT_CUSTOM_STAGES = ["Government Approval", "Legal Review", "Compliance Check", "Budget Approval"]
+
+# Typical deal size grows as a deal moves down the funnel
+STAGE_VALUE_FACTOR = {
+    "Research": 0.6,
+    "Initial Contact": 0.7,
+    "First Presentation": 0.8,
+    "Interested": 0.9,
+    "Multiple Presentations": 1.1,
+    "Order Stage": 1.3,
+    "Negotiation": 1.4,
+    "Closed Won": 1.2,
+    "Closed Lost": 0.9,
+}
+
+MEDIAN_DEAL_VALUE = 60_000
+MIN_DEAL_VALUE = 1_000
+MAX_DEAL_VALUE = 5_000_000
+
+# Last Updated spans this many days back from the end date, weighted towards recent activity.
+# The end date is fixed so a seed gives the same pipeline on any day.
+DATE_SPAN_DAYS = 730
+DEFAULT_END_DATE = "2025-12-31"
+
+COMPANY_WORDS = np.array([
+    "Apex", "Blue", "Bright", "Cedar", "Core", "Delta", "Echo", "Evergreen", "First", "Global",
+    "Granite", "Harbor", "Horizon", "Iron", "Keystone", "Lumen", "Maple", "Meridian", "North", "Nova",
+    "Oak", "Omni", "Pacific", "Peak", "Pioneer", "Prime", "Quantum", "River", "Silver", "Summit",
+    "Terra", "Union", "Vector", "Vertex", "West", "Zenith",
+], dtype=object)
+COMPANY_KINDS = np.array([
+    "Analytics", "Bank", "Capital", "Consulting", "Dynamics", "Energy", "Foods", "Health",
+    "Industries", "Logistics", "Manufacturing", "Media", "Networks", "Retail", "Software", "Systems",
+], dtype=object)
+COMPANY_SUFFIXES = np.array(["Inc", "Ltd", "LLC", "Corp", "Group", "Co"], dtype=object)
+FIRST_NAMES = np.array([
+    "Aisha", "Amanda", "Carlos", "Chen", "Chris", "David", "Emily", "Fatima", "Hiro", "Jane",
+    "Jessica", "John", "Kofi", "Lisa", "Maria", "Mike", "Olga", "Priya", "Robert", "Sarah",
+    "Tom", "Wei", "Yusuf", "Zoe",
+], dtype=object)
+# Slicing dimensions; quarter is left to the store, which derives it from Last Updated
+OWNERS = np.array([
+    "Alex Morgan", "Bianca Ruiz", "Daniel Osei", "Grace Liu", "Ivan Petrov", "Meera Shah",
+    "Noah Fischer", "Sofia Romano", "Tariq Aziz", "Yuki Tanaka",
+], dtype=object)
+REGIONS = np.array(["North America", "Latin America", "Europe", "Middle East", "Africa", "Asia Pacific"], dtype=object)
+SEGMENTS = np.array([
+    "Banking", "Education", "Energy", "Government", "Healthcare", "Manufacturing", "Retail", "Technology",
+], dtype=object)
+LAST_NAMES = np.array([
+    "Anderson", "Brown", "Clark", "Davis", "Garcia", "Ivanova", "Johnson", "Kim", "Kumar", "Lee",
+    "Miller", "Moore", "Nakamura", "Okafor", "Patel", "Rossi", "Smith", "Taylor", "White", "Wilson",
+], dtype=object)
+
+
+def stage_weights(stage_order=DEFAULT_FUNNEL_STAGES, custom_stages=DEFAULT_CUSTOM_STAGES, custom_share=0.06):
+    """Probability of each stage, with custom_share spread evenly over the custom stages"""
+    weights = {stage: DEFAULT_STAGE_WEIGHTS.get(stage, 0.05) for stage in stage_order}
+    scale = (1 - custom_share) / sum(weights.values()) if custom_stages else 1 / sum(weights.values())
+    weights = {stage: weight * scale for stage, weight in weights.items()}
+    for stage in custom_stages:
+        weights[stage] = custom_share / len(custom_stages)
+    return weights
+
+
+def generate_clients(n_rows, seed=0, start_id=0, stage_order=DEFAULT_FUNNEL_STAGES,
+                     custom_stages=DEFAULT_CUSTOM_STAGES, end_date=DEFAULT_END_DATE):
+    """Synthetic client frame with dashboard column names
+
+    The same seed and start_id always give the same rows; start_id keeps
+    company names unique across chunks of a larger pipeline.
+    """
+    rng = np.random.default_rng([seed, start_id])
+    weights = stage_weights(stage_order, custom_stages)
+    stages = np.array(list(weights), dtype=object)
+    stage = stages[rng.choice(len(stages), size=n_rows, p=list(weights.values()))]
+
+    factors = pd.Series(stage).map(STAGE_VALUE_FACTOR).fillna(1.0).to_numpy()
+    values = rng.lognormal(np.log(MEDIAN_DEAL_VALUE), 0.9, n_rows) * factors
+    values = (np.clip(values, MIN_DEAL_VALUE, MAX_DEAL_VALUE) // 500 * 500).astype('int64')
+
+    end_date = pd.Timestamp(end_date).normalize()
+    days_ago = np.minimum(rng.exponential(DATE_SPAN_DAYS / 4, n_rows), DATE_SPAN_DAYS).astype('int64')
+    last_updated = end_date - pd.to_timedelta(days_ago, unit='D')
+
+    ids = pd.Series(np.arange(start_id, start_id + n_rows)).astype(str).to_numpy(dtype=object)
+    word = COMPANY_WORDS[rng.integers(0, len(COMPANY_WORDS), n_rows)]
+    kind = COMPANY_KINDS[rng.integers(0, len(COMPANY_KINDS), n_rows)]
+    suffix = COMPANY_SUFFIXES[rng.integers(0, len(COMPANY_SUFFIXES), n_rows)]
+    first = FIRST_NAMES[rng.integers(0, len(FIRST_NAMES), n_rows)]
+    last = LAST_NAMES[rng.integers(0, len(LAST_NAMES), n_rows)]
+    domain = pd.Series(word + kind).str.lower().to_numpy(dtype=object) + ids + '.com'
+    # Drawn last so the other columns match pipelines generated before these existed
+    owner = OWNERS[rng.integers(0, len(OWNERS), n_rows)]
+    region = REGIONS[rng.integers(0, len(REGIONS), n_rows)]
+    segment = SEGMENTS[rng.integers(0, len(SEGMENTS), n_rows)]
+
+    return pd.DataFrame({
+        'Client Name': word + ' ' + kind + ' ' + suffix + ' ' + ids,
+        'Stage': stage,
+        'Contact Person': first + ' ' + last,
+        'Email': pd.Series(first).str.lower().to_numpy(dtype=object) + '.'
+                 + pd.Series(last).str.lower().to_numpy(dtype=object) + '@' + domain,
+        'Deal Value': values,
+        'Last Updated': last_updated,
+        'Owner': owner,
+        'Region': region,
+        'Segment': segment,
+    })
+
+
+def iter_clients(n_rows, chunk_size=500_000, seed=0, **options):
+    """Yield a large synthetic pipeline as frames of at most chunk_size rows"""
+    for start in range(0, n_rows, chunk_size):
+        yield generate_clients(min(chunk_size, n_rows - start), seed=seed, start_id=start, **options)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write a seeded synthetic client pipeline to CSV or Parquet")
+    parser.add_argument("output", help="destination file ending in .csv or .parquet")
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    extension = os.path.splitext(args.output)[1].lower()
+    if extension == ".parquet":
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        writer = None
+        for chunk in iter_clients(args.rows, seed=args.seed):
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(args.output, table.schema, compression='zstd')
+            writer.write_table(table)
+        if writer is not None:
+            writer.close()
+    elif extension == ".csv":
+        for i, chunk in enumerate(iter_clients(args.rows, seed=args.seed)):
+            chunk.to_csv(args.output, mode='w' if i == 0 else 'a', header=i == 0, index=False,
+                         date_format='%Y-%m-%d')
+    else:
+        parser.error("output must end in .csv or .parquet")
+    print(f"Wrote {args.rows:,} clients to {args.output}")
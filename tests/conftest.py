@@ -0,0 +1,57 @@
+import os
+import sys
+from datetime import date
+
+import pandas as pd
+import pytest
+import streamlit as st
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from client_store import ClientStore  # noqa: E402
+
+
+@pytest.fixture
+def app_path(tmp_path, monkeypatch):
+    """Path of an app script, run against a fresh client database"""
+    monkeypatch.setenv("FUNNEL_DB_PATH", str(tmp_path / "clients.db"))
+    # Shared resources are cached per process, so each test opens its own
+    st.cache_resource.clear()
+    yield lambda name: os.path.join(ROOT, name)
+    st.cache_resource.clear()
+
+
+@pytest.fixture
+def store(tmp_path):
+    """A client store seeded with three clients, ids 1 to 3"""
+    store = ClientStore(str(tmp_path / "clients.db"))
+    store.add_clients(pd.DataFrame({
+        'Client Name': ['ABC Corp', 'XYZ Ltd', 'Tech Innovations'],
+        'Stage': ['Research', 'Initial Contact', 'Research'],
+        'Contact Person': ['John Doe', 'Jane Smith', 'Mike Johnson'],
+        'Email': ['john@abc.com', 'jane@xyz.com', 'mike@tech.com'],
+        'Deal Value': [50_000, 75_000, 100_000],
+        'Last Updated': [date(2024, 1, 15), date(2024, 2, 15), date(2024, 3, 15)],
+    }))
+    yield store
+    store.close()
+
+
+def pytest_addoption(parser):
+    parser.addoption("--run-slow", action="store_true", help="also run the tests marked slow")
+
+
+def pytest_configure(config):
+    config.addinivalue_line(
+        "markers", "slow: takes tens of seconds or about a gigabyte; skipped unless --run-slow is given"
+    )
+
+
+def pytest_collection_modifyitems(config, items):
+    if config.getoption("--run-slow"):
+        return
+    skip = pytest.mark.skip(reason="slow; run with --run-slow")
+    for item in items:
+        if "slow" in item.keywords:
+            item.add_marker(skip)
@@ -0,0 +1,24 @@
+import time
+
+from background_results import BackgroundResults
+
+
+def wait(results, name, version):
+    while results.running(name, version):
+        time.sleep(0.01)
+
+
+def test_results_keep_the_most_recently_used_names():
+    results = BackgroundResults(max_results=2)
+    for name in ('a', 'b'):
+        results.get(name, 1, lambda: name)
+        wait(results, name, 1)
+    # Reading a refreshes it, so b is the least recently used
+    assert results.get('a', 1, lambda: 'a').value == 'a'
+
+    results.get('c', 1, lambda: 'c')
+    wait(results, 'c', 1)
+
+    assert list(results._results) == ['a', 'c']
+    assert results.get('b', 1, lambda: 'b') == (None, None, True, None)
+    results.shutdown()
@@ -0,0 +1,28 @@
+import pytest
+
+from benchmarks import payload_growth, run_size
+
+FIGURES = {
+    "figure.funnel", "figure.funnel_clickable", "figure.deal_value", "figure.deal_value_clickable",
+    "figure.average_deal", "figure.stage_distribution",
+}
+
+
+@pytest.mark.parametrize("rows", [
+    100_000,
+    # The request's full range; about 40 s and 1 GB of memory, so only run with --run-slow
+    pytest.param(1_000_000, marks=pytest.mark.slow),
+])
+def test_figure_payloads_do_not_grow_with_the_pipeline(tmp_path, rows):
+    """Every figure's JSON, numbers aside, is exactly as large at rows clients as at 1k"""
+    results = []
+    for size in (1_000, rows):
+        results += run_size(size, str(tmp_path), repeat=1, figures_only=True)
+
+    sizes = {}
+    for result in results:
+        if result['operation'].startswith("figure."):
+            sizes.setdefault(result['operation'], []).append(result['shape_bytes'])
+    assert set(sizes) == FIGURES
+    assert all(len(payloads) == 2 for payloads in sizes.values())
+    assert payload_growth(results) == []
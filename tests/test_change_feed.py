@@ -0,0 +1,44 @@
+import threading
+
+import pandas as pd
+
+from change_feed import ChangeFeed
+from client_store import Change, ClientStore
+
+
+def test_recording_collects_only_the_calling_threads_deltas(tmp_path):
+    store = ClientStore(str(tmp_path / "clients.db"))
+    store.add_clients(pd.DataFrame({
+        'Client Name': ['ABC Corp', 'XYZ Ltd'],
+        'Stage': ['Research', 'Research'],
+        'Contact Person': ['John Doe', 'Jane Smith'],
+        'Email': ['john@abc.com', 'jane@xyz.com'],
+        'Deal Value': [50_000, 75_000],
+    }))
+    feed = ChangeFeed()
+    feed.attach(store)
+
+    with feed.recording() as recorded:
+        store.update_stage(1, 'Negotiation')
+        other = threading.Thread(target=store.update_stage, args=(2, 'Negotiation'))
+        other.start()
+        other.join()
+        store.delete_client(1)
+    store.update_stage(2, 'Research')
+
+    deltas = feed.since(0)
+    assert [(delta.op, delta.client_id) for delta in deltas] == [
+        ('update', 1), ('update', 2), ('delete', 1), ('update', 2)
+    ]
+    assert recorded == [deltas[0].seq, deltas[2].seq]
+    store.close()
+
+
+def test_since_returns_none_once_the_cursor_falls_out_of_the_ring():
+    feed = ChangeFeed(max_deltas=2)
+    feed.publish([Change('add', client_id, 'Research', None, 0, ()) for client_id in (1, 2, 3)])
+
+    assert feed.cursor == 3
+    assert [delta.client_id for delta in feed.since(1)] == [2, 3]
+    assert feed.since(3) == []
+    assert feed.since(0) is None
@@ -0,0 +1,39 @@
+import io
+
+import pytest
+
+from client_import import import_clients
+
+STAGES = ['Research', 'Initial Contact', 'Negotiation']
+
+CSV = """Client Name,Stage,Contact Person,Email,Deal Value,Last Updated,Quarter
+ABC Corp,research,John Doe,john@abc.com,"$50,000",2024-01-15,
+XYZ Ltd,Negotiation,Jane Smith,,75000,,2024-q2
+,Research,Nobody,,1000,,
+Ghost Inc,Haunted,Casper,casper@ghost,-5,not a date,2024-Q9
+Tech Innovations,Initial Contact,Mike Johnson,mike@tech.com,100000,2024-03-15,
+"""
+
+
+def test_import_keeps_valid_rows_and_reports_rejects(store):
+    result = import_clients(store, io.StringIO(CSV), STAGES, file_format='csv', chunk_size=2)
+
+    assert (result.imported, result.rejected) == (3, 2)
+    assert result.errors['Row'].tolist() == [3, 4]
+    assert result.errors['Error'].tolist() == [
+        'Missing client name',
+        'Unknown stage; Invalid email; Invalid deal value; Invalid last updated date; Invalid quarter',
+    ]
+
+    imported = store.fetch_clients().iloc[3:]
+    assert imported['Client Name'].tolist() == ['ABC Corp', 'XYZ Ltd', 'Tech Innovations']
+    # Stages are matched case-insensitively and values are parsed from currency text
+    assert imported['Stage'].astype(str).tolist() == ['Research', 'Negotiation', 'Initial Contact']
+    assert imported['Deal Value'].tolist() == [50_000, 75_000, 100_000]
+    assert imported['Quarter'].tolist()[:2] == ['2024-Q1', '2024-Q2']
+
+
+def test_import_requires_the_core_columns(store):
+    with pytest.raises(ValueError, match="Contact Person, Deal Value"):
+        import_clients(store, io.StringIO("Client Name,Stage\nABC Corp,Research\n"), STAGES, file_format='csv')
+    assert store.count_clients() == 3
@@ -0,0 +1,28 @@
+import pytest
+
+from client_store import ConflictError
+
+
+def stages(store):
+    return store.fetch_clients()['Stage'].astype(str).to_dict()
+
+
+def test_apply_changes_rejects_stale_versions_without_writing(store):
+    versions = store.row_versions([1, 2, 3])
+    # Another session moves client 2 after this one read it
+    store.update_stage(2, 'Negotiation')
+
+    with pytest.raises(ConflictError) as conflict:
+        store.apply_changes(moves={1: 'Closed Won', 2: 'Closed Lost'}, deletes=[3], expected_versions=versions)
+    assert conflict.value.client_ids == [2]
+    assert stages(store) == {1: 'Research', 2: 'Negotiation', 3: 'Research'}
+
+    # A deleted row is a conflict too
+    store.delete_client(3)
+    with pytest.raises(ConflictError) as conflict:
+        store.apply_changes(moves={3: 'Closed Won'}, expected_versions={3: versions[3]})
+    assert conflict.value.client_ids == [3]
+
+    assert store.apply_changes(moves={1: 'Closed Won'}, expected_versions={1: versions[1]}) == 1
+    assert store.row_versions([1])[1] == versions[1] + 1
+    assert stages(store) == {1: 'Closed Won', 2: 'Negotiation'}
@@ -0,0 +1,100 @@
+from datetime import date
+
+import pandas as pd
+import pytest
+
+from client_store import ClientStore
+from crm_standin import CrmStandIn
+from crm_sync import CrmClient, CrmSync, accounts_frame
+from synthetic_pipeline import DEFAULT_CUSTOM_STAGES
+
+
+def account(crm_id, stage, **fields):
+    return {'id': crm_id, 'name': f"Client {crm_id}", 'stage': stage, 'amount': 1_000, **fields}
+
+
+def test_accounts_in_unknown_stages_are_rejected():
+    accounts = [
+        account('a', 'research'),
+        account('b', 'Reserch'),
+        account('c', 'Negotiation'),
+        account('d', ''),
+        account('e', 'Ghost', deleted=True),
+    ]
+    upserts, deleted_ids, skipped, rejected = accounts_frame(accounts, ['Research', 'Negotiation'])
+
+    assert upserts['CRM ID'].tolist() == ['a', 'c']
+    assert upserts['Stage'].tolist() == ['Research', 'Negotiation']
+    assert deleted_ids == ['e']
+    assert skipped == 1
+    assert rejected[['CRM ID', 'Stage', 'Error']].values.tolist() == [['b', 'Reserch', 'Unknown stage']]
+
+
+def test_upsert_never_registers_a_stage(tmp_path):
+    store = ClientStore(str(tmp_path / "clients.db"))
+    stages = store.stages.names()
+    batch = pd.DataFrame({
+        'CRM ID': ['a', 'b'],
+        'Client Name': ['ABC Corp', 'XYZ Ltd'],
+        'Stage': ['Research', 'Reserch'],
+        'Contact Person': ['', ''],
+        'Email': ['', ''],
+        'Deal Value': [1_000, 2_000],
+    })
+
+    with pytest.raises(ValueError, match="Reserch"):
+        store.upsert_clients(batch, source='crm', cursor='1')
+    assert store.stages.names() == stages
+    assert store.is_empty()
+    assert store.sync_cursor('crm') is None
+    store.close()
+
+
+def test_sync_reports_accounts_in_stages_the_funnel_lacks(tmp_path):
+    store = ClientStore(str(tmp_path / "clients.db"))
+    stages = store.stages.names()
+    crm = CrmStandIn(2_000, seed=1)
+    server = crm.serve()
+    sync = CrmSync(store, CrmClient(f"http://127.0.0.1:{server.server_address[1]}"))
+    try:
+        report = sync.run()
+    finally:
+        server.shutdown()
+
+    # The stand-in puts some accounts in custom stages this store never registered
+    assert report.rejected > 0
+    assert set(sync.rejected()['Stage']) <= set(DEFAULT_CUSTOM_STAGES)
+    assert report.added + report.rejected == len(crm)
+    assert store.stages.names() == stages
+    store.close()
+
+
+def test_upsert_inserts_rewrites_and_deletes_by_crm_id(tmp_path):
+    store = ClientStore(str(tmp_path / "clients.db"))
+    changes = []
+    store.subscribe(changes.extend)
+
+    def batch(*rows):
+        return pd.DataFrame(rows, columns=['CRM ID', 'Client Name', 'Stage', 'Deal Value']).assign(
+            **{'Contact Person': '', 'Email': '', 'Last Updated': date(2024, 5, 1)}
+        )
+
+    first = batch(('a', 'ABC Corp', 'Research', 1_000), ('b', 'XYZ Ltd', 'Research', 2_000),
+                  ('c', 'Tech Innovations', 'Research', 3_000))
+    assert store.upsert_clients(first, source='crm', cursor='1') == (3, 0, 0)
+    versions = store.row_versions([1, 2])
+
+    # An unchanged row is left alone; a changed one is rewritten in place, keeping its id
+    second = batch(('a', 'ABC Corp', 'Research', 1_000), ('b', 'XYZ Ltd', 'Negotiation', 2_500),
+                   ('d', 'New Co', 'Research', 500))
+    assert store.upsert_clients(second, deleted=['c'], source='crm', cursor='2') == (1, 1, 1)
+    clients = store.fetch_clients()
+    assert clients['Client Name'].to_dict() == {1: 'ABC Corp', 2: 'XYZ Ltd', 4: 'New Co'}
+    assert clients.at[2, 'Stage'] == 'Negotiation' and clients.at[2, 'Deal Value'] == 2_500
+    assert store.row_versions([1, 2]) == {1: versions[1], 2: versions[2] + 1}
+    assert store.sync_cursor('crm') == '2'
+    assert [(change.op, change.client_id) for change in changes] == [
+        ('add', 1), ('add', 2), ('add', 3), ('edit', 2), ('add', 4), ('delete', 3)
+    ]
+    assert changes[3].old_stage == 'Research' and changes[3].old_deal_value == 2_000
+    store.close()
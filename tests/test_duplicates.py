@@ -0,0 +1,62 @@
+import pytest
+
+from client_store import ConflictError
+from duplicates import PAIR_COLUMNS, find_duplicates
+
+
+def add_duplicates(store):
+    """Clients 4 to 7: two copies of ABC Corp, one of XYZ Ltd and an unrelated client"""
+    store.add_client('ABC Corporation', 'Negotiation', '', '', 60_000, owner='Ann')
+    store.add_client('ABC Corp Inc.', 'Research', 'John Doe', 'sales@abc.com', 0, region='EMEA')
+    store.add_client('Xyz Limited', 'Research', 'Someone Else', 'jane@xyz.com', 0)
+    store.add_client('Globex', 'Research', 'Hank Scorpio', 'hank@globex.com', 0)
+
+
+def test_scan_groups_clients_that_are_the_same_company(store):
+    add_duplicates(store)
+    scan = find_duplicates(store)
+
+    assert scan.pairs.columns.tolist() == PAIR_COLUMNS
+    assert scan.pairs['Score'].is_monotonic_decreasing
+    assert sorted(scan.groups) == [[1, 4, 5], [2, 6]]
+    assert scan.skipped_blocks == 0
+    pairs = scan.pairs.set_index(['Client ID', 'Duplicate ID'])
+    # Matching on the email alone is enough, whatever the name
+    assert pairs.loc[(2, 6), 'Same Email']
+    assert pairs.loc[(1, 5), 'Same Contact'] and pairs.loc[(1, 5), 'Same Domain']
+    assert 7 not in set(scan.pairs['Client ID']) | set(scan.pairs['Duplicate ID'])
+
+
+def test_scan_of_a_store_without_duplicates_is_empty(store):
+    scan = find_duplicates(store)
+    assert scan.pairs.empty
+    assert scan.groups == []
+
+
+def test_merge_fills_blank_fields_and_deletes_the_duplicates(store):
+    add_duplicates(store)
+    changes = []
+    store.subscribe(changes.extend)
+
+    assert store.merge_clients(4, [5, 1, 4]) == 2
+    clients = store.fetch_clients()
+    assert sorted(clients.index) == [2, 3, 4, 6, 7]
+    kept = clients.loc[4]
+    # Blanks are filled from the duplicates in id order; the rest is the kept client's own
+    assert (kept['Contact Person'], kept['Email']) == ('John Doe', 'john@abc.com')
+    assert (kept['Owner'], kept['Region']) == ('Ann', 'EMEA')
+    assert (kept['Stage'], kept['Deal Value']) == ('Negotiation', 60_000)
+    assert [(change.op, change.client_id) for change in changes] == [('edit', 4), ('delete', 1), ('delete', 5)]
+
+
+def test_merge_rejects_stale_versions_without_writing(store):
+    add_duplicates(store)
+    versions = store.row_versions([1, 4, 5])
+    # Another session edits a duplicate after this one scanned it
+    store.update_stage(5, 'Closed Won')
+
+    with pytest.raises(ConflictError) as conflict:
+        store.merge_clients(1, [4, 5], expected_versions=versions)
+    assert conflict.value.client_ids == [5]
+    assert store.count_clients() == 7
+    assert store.fetch_clients().at[1, 'Owner'] == ''
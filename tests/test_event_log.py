@@ -0,0 +1,58 @@
+import atexit
+from datetime import date
+
+from client_store import MAX_PARAMS
+from event_log import CREATE, DELETE, MOVE, NO_STAGE, StageEventLog
+
+
+def test_closing_a_log_drops_its_exit_flush(tmp_path, monkeypatch):
+    registered = []
+    monkeypatch.setattr(atexit, "register", registered.append)
+    monkeypatch.setattr(atexit, "unregister", registered.remove)
+
+    logs = [StageEventLog(str(tmp_path / f"events_{i}.db")) for i in range(3)]
+    assert registered == [log.flush for log in logs]
+
+    logs[1].close()
+    assert registered == [logs[0].flush, logs[2].flush]
+    for log in (logs[0], logs[2]):
+        log.close()
+    assert registered == []
+
+
+def test_attach_backfills_existing_clients_once(store, tmp_path):
+    log = StageEventLog(str(tmp_path / "events.db"))
+    log.attach(store)
+
+    events = log.read_events()
+    names = log.stage_names()
+    assert events['client_id'].tolist() == [1, 2, 3]
+    assert (events['kind'] == CREATE).all() and (events['from_code'] == NO_STAGE).all()
+    assert [names[code] for code in events['to_code']] == ['Research', 'Initial Contact', 'Research']
+    assert events['ts'].dt.date.tolist() == [date(2024, 1, 15), date(2024, 2, 15), date(2024, 3, 15)]
+
+    # A log that already has events is not backfilled again
+    log.attach(store)
+    assert len(log.read_events()) == 3
+    log.close()
+
+
+def test_read_events_scans_ranges_clients_and_cursors(store, tmp_path):
+    log = StageEventLog(str(tmp_path / "events.db"))
+    log.attach(store)
+    store.update_stage(1, 'Negotiation')
+    store.delete_client(2)
+
+    events = log.read_events(client_ids=[1, 2])
+    assert events[['client_id', 'kind']].values.tolist() == [[1, CREATE], [2, CREATE], [1, MOVE], [2, DELETE]]
+    move = events.iloc[2]
+    assert log.stage_names()[move['from_code']] == 'Research'
+    assert log.stage_names()[move['to_code']] == 'Negotiation'
+
+    # Ranges are half open: [start, end)
+    assert log.read_events(start=date(2024, 2, 15), end=date(2024, 3, 15))['client_id'].tolist() == [2]
+    assert log.read_events(start=date(2024, 3, 16))['kind'].tolist() == [MOVE, DELETE]
+    assert log.read_events(after_event_id=3)['event_id'].tolist() == [4, 5]
+    # Client filters longer than SQLite's parameter limit are read in chunks
+    assert log.read_events(client_ids=range(1, MAX_PARAMS * 2))['event_id'].tolist() == [1, 2, 3, 4, 5]
+    log.close()
@@ -0,0 +1,14 @@
+import pandas as pd
+
+from funnel_core import DEFAULT_STAGE_COLORS, dashboard_funnel_chart
+
+
+def test_clickable_funnel_labels_each_stage_with_its_count():
+    counts = pd.Series({'Research': 2, 'Negotiation': 1})
+    stages = ['Research', 'Initial Contact', 'Negotiation']
+
+    clickable = dashboard_funnel_chart(counts, stages, DEFAULT_STAGE_COLORS, clickable=True)
+    assert list(clickable.data[0].y) == [
+        'Research<br>(2 clients)', 'Initial Contact<br>(0 clients)', 'Negotiation<br>(1 clients)'
+    ]
+    assert list(dashboard_funnel_chart(counts, stages, DEFAULT_STAGE_COLORS).data[0].y) == stages
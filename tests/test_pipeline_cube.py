@@ -0,0 +1,32 @@
+from datetime import date
+
+import pandas as pd
+
+from client_store import ClientStore, quarter_label
+from pipeline_cube import PipelineCube
+
+
+def test_stage_move_moves_client_to_current_quarter(tmp_path):
+    store = ClientStore(str(tmp_path / "clients.db"))
+    store.add_clients(pd.DataFrame({
+        'Client Name': ['ABC Corp', 'XYZ Ltd'],
+        'Stage': ['Research', 'Research'],
+        'Contact Person': ['John Doe', 'Jane Smith'],
+        'Email': ['john@abc.com', 'jane@xyz.com'],
+        'Deal Value': [50_000, 75_000],
+        'Last Updated': [date(2024, 3, 31), date(2024, 3, 31)],
+    }))
+    cube = PipelineCube(store)
+    current = quarter_label([date.today()])[0]
+    assert cube.members('quarter') == ['2024-Q1']
+
+    store.update_stage(1, 'Negotiation')
+
+    assert store.fetch_clients_by_ids([1]).at[1, 'Quarter'] == current
+    old_quarter = cube.slice({'quarter': ['2024-Q1']}).summary()
+    assert old_quarter['Client Count'].to_dict() == {'Research': 1}
+    new_quarter = cube.slice({'quarter': [current]}).summary()
+    assert new_quarter['Client Count'].to_dict() == {'Negotiation': 1}
+    assert new_quarter.at['Negotiation', 'Total Value'] == 50_000
+    pd.testing.assert_frame_equal(cube.slice().summary(), PipelineCube(store).slice().summary())
+    store.close()
@@ -0,0 +1,24 @@
+from row_table import RowTable
+
+DTYPES = {'client_id': 'int64', 'value': 'float64'}
+
+
+def test_frame_is_reused_until_the_table_changes():
+    table = RowTable(DTYPES, key='client_id')
+    table.append({'client_id': [1, 2, 3], 'value': [1.0, 2.0, 3.0]})
+    frame = table.frame()
+    assert table.frame() is frame
+
+    table.append({'client_id': [4], 'value': [4.0]})
+    assert table.frame()['client_id'].tolist() == [1, 2, 3, 4]
+
+    frame = table.frame()
+    table.remove([9])
+    assert table.frame() is frame
+    table.remove([2])
+    assert table.frame()['client_id'].tolist() == [1, 3, 4]
+
+    frame = table.frame()
+    table.compact()
+    assert table.frame() is not frame
+    assert table.frame()['value'].tolist() == [1.0, 3.0, 4.0]
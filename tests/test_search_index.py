@@ -0,0 +1,57 @@
+from datetime import date
+
+import pandas as pd
+
+from client_store import ClientStore
+from funnel_core import ClientQuery
+from search_index import ClientSearchIndex
+from stage_index import StageIndex
+
+
+def crm_clients(name):
+    return pd.DataFrame({
+        'CRM ID': ['crm-1', 'crm-2'],
+        'Client Name': [name, 'XYZ Ltd'],
+        'Stage': ['Research', 'Research'],
+        'Contact Person': ['John Doe', 'Jane Smith'],
+        'Email': ['john@abc.com', 'jane@xyz.com'],
+        'Deal Value': [50_000, 75_000],
+        'Last Updated': [date(2024, 3, 31), date(2024, 3, 31)],
+    })
+
+
+def test_repeated_edits_keep_postings_unique(tmp_path):
+    store = ClientStore(str(tmp_path / "clients.db"))
+    store.upsert_clients(crm_clients('ABC Corp'))
+    index = ClientSearchIndex(store)
+
+    for step in range(20):
+        store.upsert_clients(crm_clients('Acme Holdings' if step % 2 else 'ABC Corp'))
+
+        current, former = ('acme', 'abc corp') if step % 2 else ('abc corp', 'acme')
+        assert index.search(current) == [1]
+        assert index.search(former) == []
+        assert index.search('xyz') == [2]
+        for postings in index._postings.values():
+            assert len(set(postings)) == len(postings)
+
+    store.upsert_clients(crm_clients('ABC Corp'), deleted=['crm-2'])
+    fresh = ClientSearchIndex(store)
+    for term in ('abc', 'acme', 'xyz', 'jane', 'john', 'co', '@'):
+        assert index.search(term) == fresh.search(term), term
+        assert index.search(term, prefix=True) == fresh.search(term, prefix=True), term
+    store.close()
+
+
+def test_sql_fallback_matches_the_index(tmp_path):
+    store = ClientStore(str(tmp_path / "clients.db"))
+    store.upsert_clients(crm_clients('ABC Corp'))
+    stages = ['Research', 'Negotiation']
+    stage_index, search_index = StageIndex(store), ClientSearchIndex(store)
+
+    for term in ('abc', 'JANE', 'xyz.com', ' smith ', '@', 'corp', 'nobody', '   '):
+        indexed = ClientQuery(store, stages, term, stage_index=stage_index, search_index=search_index)
+        fallback = ClientQuery(store, stages, term)
+        assert list(indexed.ids()) == list(fallback.ids()), term
+        assert indexed.total == fallback.total, term
+    store.close()
@@ -0,0 +1,39 @@
+import pytest
+
+from client_store import ConflictError
+from session_overlay import SessionOverlay
+
+
+def test_overlay_edits_stay_private_until_merged(store):
+    overlay = SessionOverlay()
+    shared = store.fetch_clients()
+    versions = store.row_versions(shared.index)
+    overlay.move([1, 2], 'Negotiation', versions)
+    overlay.delete(2, versions[2])
+
+    seen = overlay.apply(shared)
+    assert seen['Stage'].astype(str).to_dict() == {1: 'Negotiation', 3: 'Research'}
+    # The shared frame and store are untouched
+    assert shared['Stage'].astype(str).tolist() == ['Research', 'Initial Contact', 'Research']
+    assert store.count_clients() == 3
+
+    assert overlay.merge(store) == 2
+    assert len(overlay) == 0
+    assert store.fetch_clients()['Stage'].astype(str).to_dict() == {1: 'Negotiation', 3: 'Research'}
+
+
+def test_overlay_merge_keeps_the_draft_on_conflict(store):
+    overlay = SessionOverlay()
+    versions = store.row_versions([1, 3])
+    overlay.move([1, 3], 'Closed Won', versions)
+    store.update_stage(3, 'Closed Lost')
+
+    with pytest.raises(ConflictError) as conflict:
+        overlay.merge(store)
+    assert conflict.value.client_ids == [3]
+    assert overlay.moves == {1: 'Closed Won', 3: 'Closed Won'}
+
+    overlay.drop(conflict.value.client_ids)
+    assert overlay.merge(store) == 1
+    assert store.fetch_clients()['Stage'].astype(str).to_dict() == {1: 'Closed Won', 2: 'Initial Contact',
+                                                                     3: 'Closed Lost'}